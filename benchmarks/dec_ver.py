@@ -0,0 +1,86 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Micro-benchmark of the trial decryption of Zigbee payloads
+"""
+
+import argparse
+import os
+import random
+import timeit
+
+from zigator import crypto
+
+
+def make_trial(num_sources, num_keys, payload_length):
+    # Secure a payload with the last candidate source and key
+    sources = [random.getrandbits(64) for _ in range(num_sources)]
+    keys = [os.urandom(16) for _ in range(num_keys)]
+    candidates = [(source_addr, key)
+                  for source_addr in sources
+                  for key in keys]
+    frame_counter = random.getrandbits(32)
+    sec_control = 0x28
+    header = os.urandom(8)
+    key_seqnum = 0
+    enc_payload, mic = crypto.zigbee_enc_mic(
+        keys[-1], sources[-1], frame_counter, sec_control, header,
+        key_seqnum, os.urandom(payload_length))
+    return (candidates, frame_counter, sec_control, header, key_seqnum,
+            enc_payload, mic)
+
+
+def sequential_trial(candidates, frame_counter, sec_control, header,
+                     key_seqnum, enc_payload, mic):
+    for source_addr, key in candidates:
+        dec_payload, auth_payload = crypto.zigbee_dec_ver(
+            key, source_addr, frame_counter, sec_control, header,
+            key_seqnum, enc_payload, mic)
+        if auth_payload:
+            return source_addr, key, dec_payload
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the sequential and the batched trial "
+                    "decryption of Zigbee payloads")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--payload_length", type=int, default=48)
+    args = parser.parse_args()
+
+    print("sources\tkeys\tsequential (us)\tbatched (us)\tspeedup")
+    for num_sources, num_keys in [(1, 1), (1, 4), (8, 1), (32, 2),
+                                  (128, 4)]:
+        trial = make_trial(num_sources, num_keys, args.payload_length)
+        if (sequential_trial(*trial)
+                != crypto.zigbee_batch_dec_ver(*trial)):
+            raise ValueError("The decryption results do not match")
+        sequential_time = timeit.timeit(
+            lambda: sequential_trial(*trial), number=args.repeat)
+        batched_time = timeit.timeit(
+            lambda: crypto.zigbee_batch_dec_ver(*trial), number=args.repeat)
+        print("{}\t{}\t{:.1f}\t\t{:.1f}\t\t{:.1f}x".format(
+            num_sources,
+            num_keys,
+            1e6*sequential_time/args.repeat,
+            1e6*batched_time/args.repeat,
+            sequential_time/batched_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,7 @@ IGNORED_COLUMNS = set([
     "pkt_num",
     "pkt_time",
     "pkt_bytes",
+    "pkt_linktype",
     "pkt_show",
     "mac_fcs",
     "mac_seqnum",
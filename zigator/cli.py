@@ -91,7 +91,7 @@ def init(derived_version):
         "PCAP_DIRECTORY",
         type=str,
         action="store",
-        help="directory with pcap files")
+        help="directory with pcap files, or the live source in live mode")
     parser_parse.add_argument(
         "DATABASE_FILEPATH",
         type=str,
@@ -103,6 +103,94 @@ def init(derived_version):
         action="store",
         help="the number of workers that will parse pcap files",
         default=None)
+    parser_parse.add_argument(
+        "--shards",
+        action="store_true",
+        help="write packets into per-worker shard databases and merge them")
+    parser_parse.add_argument(
+        "--store_show",
+        action="store_true",
+        help="store the output of Scapy's show function, which requires "
+             "Scapy to dissect every packet and slows down the parsing")
+    parser_parse.add_argument(
+        "--max_attempts",
+        type=int,
+        action="store",
+        help="the maximum number of decryption attempts for each payload",
+        default=None)
+    parser_parse.add_argument(
+        "--incremental",
+        action="store_true",
+        help="parse only new or modified pcap files")
+    parser_parse.add_argument(
+        "--hash_files",
+        action="store_true",
+        help="compare the SHA-256 digests of pcap files to detect changes")
+    parser_parse.add_argument(
+        "--skip_split",
+        action="store_true",
+        help="do not split large pcap files into byte ranges")
+    parser_parse.add_argument(
+        "--bulk_load",
+        action="store_true",
+        help="synchronize the database with the disk only after parsing")
+    parser_parse.add_argument(
+        "--encode_columns",
+        action="store_true",
+        help="store text columns with repeated values as integer codes")
+    parser_parse.add_argument(
+        "--partition_layers",
+        action="store_true",
+        help="store the columns of each layer in a separate table")
+    parser_parse.add_argument(
+        "--live",
+        action="store_true",
+        help="parse packets as they are received from a UDP socket, "
+             "specified as \"udp:[IPADDR:]PORTNUM\", or a named pipe")
+    parser_parse.add_argument(
+        "--batch_size",
+        type=int,
+        action="store",
+        help="the maximum number of live packets per committed batch",
+        default=1000)
+    parser_parse.add_argument(
+        "--batch_interval",
+        type=float,
+        action="store",
+        help="the maximum number of seconds between committed batches",
+        default=1.0)
+
+    parser_show = subparsers.add_parser(
+        "show",
+        help="show the dissection of packets from a database")
+    parser_show.add_argument(
+        "DATABASE_FILEPATH",
+        type=str,
+        action="store",
+        help="path of the database file")
+    parser_show.add_argument(
+        "PCAP_FILENAME",
+        type=str,
+        action="store",
+        help="name of the pcap file that contained the packet")
+    parser_show.add_argument(
+        "PKT_NUM",
+        type=int,
+        action="store",
+        help="number of the packet in the pcap file")
+
+    parser_index = subparsers.add_parser(
+        "index",
+        help="index the packets of a database")
+    parser_index.add_argument(
+        "DATABASE_FILEPATH",
+        type=str,
+        action="store",
+        help="path of the database file")
+    parser_index.add_argument(
+        "--drop",
+        action="store_true",
+        help="drop the indexes instead of creating them")
 
     parser_analyze = subparsers.add_parser(
         "analyze",
@@ -24,6 +24,7 @@ import string
 
 from scapy.all import conf
 
+from . import crypto
 from . import db
 from . import fs
 
@@ -35,6 +36,7 @@ CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "zigator")
 NETWORK_FILEPATH = os.path.join(CONFIG_DIR, "network-keys.tsv")
 LINK_FILEPATH = os.path.join(CONFIG_DIR, "link-keys.tsv")
 INSTALL_FILEPATH = os.path.join(CONFIG_DIR, "install-codes.tsv")
+INSTALL_CACHE_FILEPATH = os.path.join(CONFIG_DIR, "install-codes.cache")
 
 # Define different types of messages
 RETURN_MSG = 0
@@ -51,17 +53,35 @@ NETWORKS_MSG = 10
 DEVICES_MSG = 11
 ADDRESSES_MSG = 12
 PAIRS_MSG = 13
+PKTS_MSG = 14
+KEY_HINTS_MSG = 15
+
+# Define the messages that derive APS keys from link keys
+DERIVED_KEY_MESSAGES = {
+    "Key-Transport Key": bytes.fromhex("00"),
+    "Key-Load Key": bytes.fromhex("02"),
+}
+
+# Data entries of a packet without any values, in the order of the columns
+EMPTY_ENTRY = {column_name: None for column_name in db.PKT_COLUMN_NAMES}
 
 # Initialize the global variables
 version = "0+unknown"
 network_keys = {}
 link_keys = {}
+derived_keys = {}
 install_codes = {}
 networks = {}
 devices = {}
 addresses = {}
+address_history = {}
+pan_addresses = {}
 pairs = {}
-entry = {column_name: None for column_name in db.PKT_COLUMN_NAMES}
+address_changes = []
+device_changes = []
+store_show = False
+max_dec_attempts = None
+entry = EMPTY_ENTRY.copy()
 
 
 def init(derived_version):
@@ -103,8 +123,10 @@ def load_config_files():
     logging.debug("Loaded {} link keys".format(len(link_keys)))
 
     # Load install codes and derive link keys from them
-    install_codes, derived_keys = fs.load_install_codes(INSTALL_FILEPATH,
-                                                        optional=True)
+    install_codes, derived_keys = fs.load_install_codes(
+        INSTALL_FILEPATH,
+        optional=True,
+        cache_filepath=INSTALL_CACHE_FILEPATH)
     logging.debug("Loaded {} install codes".format(len(install_codes)))
 
     # Add link keys, derived from install codes, that are not already loaded
@@ -125,17 +147,47 @@ def load_config_files():
     logging.debug("Added {} link keys that were derived from install codes"
                   "".format(added_keys))
 
+    # The derived APS keys have to be recomputed from the loaded link keys
+    invalidate_derived_keys()
+
+
+def get_derived_keys(key_type):
+    # Derive the APS keys of the specified type from the link keys only
+    # if they were not derived since the link keys were last changed
+    if key_type not in derived_keys.keys():
+        derived_keys[key_type] = set(
+            [crypto.zigbee_hmac(DERIVED_KEY_MESSAGES[key_type], key)
+             for key in link_keys.values()])
+    return derived_keys[key_type]
+
+
+def invalidate_derived_keys():
+    global derived_keys
+
+    # The AES contexts of the previously derived keys are discarded too
+    derived_keys = {}
+    crypto.clear_ecb_ciphers()
+
 
 def reset_entries(keep=[]):
     global entry
 
-    # Reset all data entries in the dictionary except
-    # the ones that were requested to maintain their values
-    if keep is None:
-        keep = []
-    for column_name in db.PKT_COLUMN_NAMES:
-        if column_name not in keep:
-            entry[column_name] = None
+    # Replace the dictionary with a copy of the empty one, which is faster
+    # than resetting its data entries, except the ones that were requested
+    # to maintain their values
+    prev_entry = entry
+    entry = EMPTY_ENTRY.copy()
+    if keep:
+        for column_name in keep:
+            entry[column_name] = prev_entry[column_name]
+
+
+def entry_row():
+    # The data entries were inserted in the order of the columns and new
+    # data entries are never inserted, so their values form a table row
+    if len(entry) != len(EMPTY_ENTRY):
+        raise ValueError("Unexpected data entries in the dictionary")
+    return tuple(entry.values())
 
 
 def custom_sorter(var_value):
@@ -154,6 +206,7 @@ def custom_sorter(var_value):
 
 def update_devices(extendedaddr, macdevtype, nwkdevtype):
     global devices
+    global device_changes
 
     # Sanity checks
     if extendedaddr is None:
@@ -172,7 +225,9 @@ def update_devices(extendedaddr, macdevtype, nwkdevtype):
             "nwkdevtype": nwkdevtype,
         }
     else:
-        # Check whether the device's information should be updated or not
+        # Check whether the device's information should be updated or not,
+        # keeping track of the known devices whose information changed
+        init_devtypes = dict(devices[extendedaddr])
         if macdevtype is not None:
             if devices[extendedaddr]["macdevtype"] is None:
                 devices[extendedaddr]["macdevtype"] = macdevtype
@@ -185,6 +240,9 @@ def update_devices(extendedaddr, macdevtype, nwkdevtype):
             elif devices[extendedaddr]["nwkdevtype"] != nwkdevtype:
                 devices[extendedaddr]["nwkdevtype"] = "Conflicting Data"
 
+        if devices[extendedaddr] != init_devtypes:
+            device_changes.append(extendedaddr)
+
 
 def update_pairs(srcaddr, dstaddr, panid, time):
     global pairs
@@ -222,6 +280,7 @@ def update_pairs(srcaddr, dstaddr, panid, time):
 
 def map_addresses(shortaddr, panid, extendedaddr):
     global addresses
+    global address_changes
 
     # Sanity checks
     if panid is None:
@@ -235,11 +294,35 @@ def map_addresses(shortaddr, panid, extendedaddr):
         # Ignore invalid device short addresses
         return
 
-    # Update the dictionary of addresses
+    # Update the dictionary of addresses, keeping track of the mappings
+    # that made a known mapping conflicting
     if (shortaddr, panid) not in addresses.keys():
         addresses[(shortaddr, panid)] = extendedaddr
-    elif addresses[(shortaddr, panid)] != extendedaddr:
+    elif addresses[(shortaddr, panid)] not in {extendedaddr,
+                                               "Conflicting Data"}:
         addresses[(shortaddr, panid)] = "Conflicting Data"
+        address_changes.append((shortaddr, panid, extendedaddr))
+    update_address_history(shortaddr, panid, extendedaddr)
+
+
+def update_address_history(shortaddr, panid, extendedaddr):
+    global address_history
+    global pan_addresses
+
+    # Keep track of the extended addresses that were used in each PAN,
+    # in the order in which they were first observed
+    if panid not in pan_addresses.keys():
+        pan_addresses[panid] = {}
+    pan_addresses[panid].setdefault(extendedaddr)
+
+    # Keep track of the extended addresses that used each short address,
+    # with the most recently used extended address at the end of the list
+    if (shortaddr, panid) not in address_history.keys():
+        address_history[(shortaddr, panid)] = [extendedaddr]
+    elif address_history[(shortaddr, panid)][-1] != extendedaddr:
+        if extendedaddr in address_history[(shortaddr, panid)]:
+            address_history[(shortaddr, panid)].remove(extendedaddr)
+        address_history[(shortaddr, panid)].append(extendedaddr)
 
 
 def map_networks(epid, panid):
@@ -283,6 +366,8 @@ def add_sniffed_key(key_bytes, key_type, key_name):
                               loaded_keys[key_name].hex()))
         else:
             loaded_keys[key_name] = key_bytes
+            if loaded_keys is link_keys:
+                invalidate_derived_keys()
     return None
 
 
@@ -357,6 +442,8 @@ def add_config_entry(entry_type, entry_value, entry_name):
 
     # Save the provided configuration entry
     config_entries[entry_name] = entry_bytes
+    if config_entries is link_keys:
+        invalidate_derived_keys()
     with open(config_filepath, "a") as fp:
         fp.write("{}\t{}\n".format(config_entries[entry_name].hex(),
                                    entry_name))
@@ -392,6 +479,8 @@ def rm_config_entry(entry_type, entry_name):
 
     # Update the corresponding configuration file
     del config_entries[entry_name]
+    if config_entries is link_keys:
+        invalidate_derived_keys()
     with open(config_filepath, "w") as fp:
         for tmp_name in config_entries.keys():
             if not tmp_name.startswith("_"):
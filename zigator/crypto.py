@@ -18,44 +18,58 @@
 Cryptographic module for the zigator package
 """
 
+import collections
+
 from Cryptodome.Cipher import AES
 
 
 # The block size is measured in bytes
 ZIGBEE_BLOCK_SIZE = 16
 
+# Maximum number of keys whose AES contexts are kept
+ECB_CIPHER_LIMIT = 256
+
+# AES contexts in ECB mode for the keys that were most recently used for
+# decryption, in the order that they were last used
+ecb_ciphers = collections.OrderedDict()
+
 
 def zigbee_mmo_hash(message):
-    # Initial value for the digest of the message
-    digest = bytearray.fromhex("00000000000000000000000000000000")
+    return zigbee_bulk_mmo_hash([message])[0]
 
-    # Pad the message
-    padding = bytearray([0x80])
-    while (len(message) + len(padding) + 2) % ZIGBEE_BLOCK_SIZE != 0:
-        padding.append(0x00)
-    padding.append((8*len(message)) >> 8)
-    padding.append((8*len(message)) & 0xff)
-    padded_message = message + padding
 
-    # Sanity check
-    if len(padded_message) % ZIGBEE_BLOCK_SIZE != 0:
-        raise ValueError("The length of the padded message ({}) is "
-                         "not a multiple of the block size ({})"
-                         "".format(len(padded_message), ZIGBEE_BLOCK_SIZE))
-
-    # Compute the digest of the message
-    plaintext = bytearray()
-    for i in range(len(padded_message)):
-        plaintext.append(padded_message[i])
-        if len(plaintext) == ZIGBEE_BLOCK_SIZE:
+def zigbee_bulk_mmo_hash(messages):
+    """Compute the Matyas-Meyer-Oseas hash of each provided message.
+
+    Each message is padded in a single step and then hashed one block,
+    instead of one byte, at a time.
+    """
+    digests = []
+    for message in messages:
+        # Pad the message
+        padding = bytearray([0x80])
+        padding.extend(bytes(-(len(message) + 3) % ZIGBEE_BLOCK_SIZE))
+        padding.append((8*len(message)) >> 8)
+        padding.append((8*len(message)) & 0xff)
+        padded_message = bytes(message) + padding
+
+        # Sanity check
+        if len(padded_message) % ZIGBEE_BLOCK_SIZE != 0:
+            raise ValueError("The length of the padded message ({}) is "
+                             "not a multiple of the block size ({})"
+                             "".format(len(padded_message),
+                                       ZIGBEE_BLOCK_SIZE))
+
+        # Compute the digest of the message, starting from an initial
+        # value that consists of zeros
+        digest = bytes(ZIGBEE_BLOCK_SIZE)
+        for i in range(0, len(padded_message), ZIGBEE_BLOCK_SIZE):
+            plaintext = padded_message[i:i+ZIGBEE_BLOCK_SIZE]
             cipher = AES.new(key=digest, mode=AES.MODE_ECB)
-            ciphertext = cipher.encrypt(plaintext)
-            digest = bytearray(ciphertext)
-            for j in range(ZIGBEE_BLOCK_SIZE):
-                digest[j] ^= plaintext[j]
-            plaintext = bytearray()
+            digest = xor_bytes(cipher.encrypt(plaintext), plaintext)
+        digests.append(digest)
 
-    return bytes(digest)
+    return digests
 
 
 def zigbee_hmac(message, key):
@@ -169,3 +183,135 @@ def zigbee_dec_ver(key, source_addr, frame_counter, sec_control, header,
         return dec_payload, True
     except ValueError:
         return dec_payload, False
+
+
+def zigbee_ecb_cipher(key):
+    # Reuse the AES context of each recently used key in ECB mode,
+    # discarding the context of the least recently used key if needed
+    if key in ecb_ciphers.keys():
+        ecb_ciphers.move_to_end(key)
+        return ecb_ciphers[key]
+    ecb_ciphers[key] = AES.new(key=key, mode=AES.MODE_ECB)
+    if len(ecb_ciphers) > ECB_CIPHER_LIMIT:
+        ecb_ciphers.popitem(last=False)
+    return ecb_ciphers[key]
+
+
+def clear_ecb_ciphers():
+    # Discard the AES contexts of keys that may no longer be used
+    ecb_ciphers.clear()
+
+
+def xor_bytes(x, y):
+    return (int.from_bytes(x, byteorder="big")
+            ^ int.from_bytes(y, byteorder="big")).to_bytes(len(x),
+                                                           byteorder="big")
+
+
+def zigbee_batch_dec_ver(candidates, frame_counter, sec_control, header,
+                         key_seqnum, enc_payload, mic):
+    """Decrypt and verify a payload with each candidate source and key.
+
+    The counter and CBC-MAC blocks of all the candidates that share a key
+    are processed together by a cached AES context of that key in ECB
+    mode. The source address, the key, and the decrypted payload of the
+    first candidate that verifies the payload are returned, or None if
+    none of the candidates verifies the payload.
+    """
+    le_framecounter = frame_counter.to_bytes(4, byteorder="little")
+    fixed_sec_control = (sec_control & 0b11111000) | 0b101
+
+    # Sanity check
+    if len(mic) != 4:
+        raise ValueError("Expected a 32-bit message integrity code, "
+                         "not a {}-bit one".format(8*len(mic)))
+
+    # Both the nonce and the authentication data depend on the source
+    auth_prefix = bytearray(header)
+    auth_prefix.append(fixed_sec_control)
+    auth_prefix.extend(le_framecounter)
+    auth_suffix = bytearray()
+    if key_seqnum is not None:
+        auth_suffix.append(key_seqnum)
+    auth_length = len(auth_prefix) + len(auth_suffix)
+    if sec_control & 0b00100000:
+        auth_length += 8
+
+    # Determine the number of blocks of the CCM computations
+    payload_length = len(enc_payload)
+    ctr_blocks = 1 + -(-payload_length // ZIGBEE_BLOCK_SIZE)
+    auth_padding = bytes(-(2+auth_length) % ZIGBEE_BLOCK_SIZE)
+    payload_padding = bytes(-payload_length % ZIGBEE_BLOCK_SIZE)
+    mac_blocks = (1 + (2+auth_length+len(auth_padding)) // ZIGBEE_BLOCK_SIZE
+                  + (payload_length+len(payload_padding)) // ZIGBEE_BLOCK_SIZE)
+
+    # Group the candidates by key, keeping track of their order
+    key_groups = {}
+    for index, (source_addr, key) in enumerate(candidates):
+        if key not in key_groups.keys():
+            key_groups[key] = []
+        key_groups[key].append((index, source_addr))
+
+    verified_candidate = None
+    for key, group in key_groups.items():
+        cipher = zigbee_ecb_cipher(key)
+        nonces = []
+        for _, source_addr in group:
+            le_srcaddr = source_addr.to_bytes(8, byteorder="little")
+            nonces.append((le_srcaddr, le_srcaddr + le_framecounter
+                           + bytes([fixed_sec_control])))
+
+        # Compute the keystream of all the nonces with a single call
+        keystream = cipher.encrypt(b"".join(
+            b"\x01" + nonce + i.to_bytes(2, byteorder="big")
+            for _, nonce in nonces
+            for i in range(ctr_blocks)))
+
+        # Decrypt the payload with each keystream and format the blocks
+        # that will be authenticated with the CBC-MAC
+        dec_payloads = []
+        mac_inputs = []
+        for i, (le_srcaddr, nonce) in enumerate(nonces):
+            offset = i*ctr_blocks*ZIGBEE_BLOCK_SIZE
+            dec_payload = xor_bytes(
+                enc_payload,
+                keystream[offset+ZIGBEE_BLOCK_SIZE:
+                          offset+ZIGBEE_BLOCK_SIZE+payload_length])
+            dec_payloads.append(dec_payload)
+            mac_input = bytearray(b"\x49")
+            mac_input.extend(nonce)
+            mac_input.extend(payload_length.to_bytes(2, byteorder="big"))
+            mac_input.extend(auth_length.to_bytes(2, byteorder="big"))
+            mac_input.extend(auth_prefix)
+            if sec_control & 0b00100000:
+                mac_input.extend(le_srcaddr)
+            mac_input.extend(auth_suffix)
+            mac_input.extend(auth_padding)
+            mac_input.extend(dec_payload)
+            mac_input.extend(payload_padding)
+            mac_inputs.append(mac_input)
+
+        # Compute the CBC-MAC of all the nonces one block at a time
+        mac_state = bytes(len(group)*ZIGBEE_BLOCK_SIZE)
+        for j in range(mac_blocks):
+            mac_state = cipher.encrypt(xor_bytes(
+                mac_state,
+                b"".join(mac_input[j*ZIGBEE_BLOCK_SIZE:
+                                   (j+1)*ZIGBEE_BLOCK_SIZE]
+                         for mac_input in mac_inputs)))
+
+        # Compare the encrypted CBC-MAC with the message integrity code
+        for i, (index, source_addr) in enumerate(group):
+            offset = i*ctr_blocks*ZIGBEE_BLOCK_SIZE
+            tag = xor_bytes(
+                mac_state[i*ZIGBEE_BLOCK_SIZE:i*ZIGBEE_BLOCK_SIZE+4],
+                keystream[offset:offset+4])
+            if tag == bytes(mic):
+                if verified_candidate is None or index < verified_candidate[0]:
+                    verified_candidate = (index, source_addr, key,
+                                          dec_payloads[i])
+                break
+
+    if verified_candidate is None:
+        return None
+    return verified_candidate[1:]
@@ -29,7 +29,8 @@ PKT_COLUMNS = [
     ("pcap_filename", "TEXT"),
     ("pkt_num", "INTEGER"),
     ("pkt_time", "REAL"),
-    ("pkt_bytes", "TEXT"),
+    ("pkt_bytes", "BLOB"),
+    ("pkt_linktype", "INTEGER"),
     ("pkt_show", "TEXT"),
     ("phy_length", "INTEGER"),
     ("mac_fcs", "TEXT"),
@@ -115,7 +116,7 @@ PKT_COLUMNS = [
     ("nwk_aux_keyseqnum", "INTEGER"),
     ("nwk_aux_deckey", "TEXT"),
     ("nwk_aux_decsrc", "TEXT"),
-    ("nwk_aux_decpayload", "TEXT"),
+    ("nwk_aux_decpayload", "BLOB"),
     ("nwk_aux_decshow", "TEXT"),
     ("nwk_cmd_id", "TEXT"),
     ("nwk_cmd_payloadlength", "INTEGER"),
@@ -195,7 +196,7 @@ PKT_COLUMNS = [
     ("aps_aux_keyseqnum", "INTEGER"),
     ("aps_aux_deckey", "TEXT"),
     ("aps_aux_decsrc", "TEXT"),
-    ("aps_aux_decpayload", "TEXT"),
+    ("aps_aux_decpayload", "BLOB"),
     ("aps_aux_decshow", "TEXT"),
     ("aps_cmd_id", "TEXT"),
     ("aps_transportkey_stdkeytype", "TEXT"),
@@ -269,13 +270,190 @@ CONSTRAINED_PKT_COLUMNS = set([
     "pkt_num",
     "pkt_time",
     "pkt_bytes",
+])
+
+# Commands that insert a column-ordered packet row into the packets table
+# or into the table of the packets that are staged for converted storage
+PKT_INSERT_COMMAND = "INSERT INTO packets VALUES ({})".format(
+    ", ".join("?"*len(PKT_COLUMNS)))
+STAGED_PKT_INSERT_COMMAND = "INSERT INTO packets_staged({}) VALUES ({})" \
+    "".format(", ".join(column[0] for column in PKT_COLUMNS),
+              ", ".join("?"*len(PKT_COLUMNS)))
+
+# Indexes of the packets table on the columns that the show command,
+# the derivation of information, and the analysis of the database filter on
+PKT_INDEXES = [
+    ("packets_file_index", ("pcap_filename", "pkt_num", "pcap_directory")),
+    ("packets_warning_index", ("warning_msg",)),
+    ("packets_mac_frametype_index", ("mac_frametype", "error_msg")),
+    ("packets_nwk_cmd_id_index", ("nwk_cmd_id", "error_msg")),
+    ("packets_mac_dstshortaddr_index",
+        ("der_mac_dstpanid", "der_mac_dstshortaddr")),
+    ("packets_mac_dstextendedaddr_index",
+        ("der_mac_dstextendedaddr", "der_mac_dsttype")),
+    ("packets_mac_srcshortaddr_index",
+        ("der_mac_srcpanid", "der_mac_srcshortaddr")),
+    ("packets_mac_srcextendedaddr_index",
+        ("der_mac_srcextendedaddr", "der_mac_srctype")),
+    ("packets_nwk_dstshortaddr_index",
+        ("der_nwk_dstpanid", "der_nwk_dstshortaddr")),
+    ("packets_nwk_dstextendedaddr_index",
+        ("der_nwk_dstextendedaddr", "der_nwk_dsttype")),
+    ("packets_nwk_srcshortaddr_index",
+        ("der_nwk_srcpanid", "der_nwk_srcshortaddr")),
+    ("packets_nwk_srcextendedaddr_index",
+        ("der_nwk_srcextendedaddr", "der_nwk_srctype")),
+]
+
+# Derived address columns of the packets, which are identified by the
+# name of their addresses, the prefix of their type, their PAN ID, short
+# address, extended address, and type columns, and the conditions that
+# the packets should satisfy for their extended address to be derived
+DERIVED_ADDRESS_COLUMNS = [
+    (
+        "MAC Destination",
+        "MAC Dst Type",
+        (
+            "der_mac_dstpanid",
+            "der_mac_dstshortaddr",
+            "der_mac_dstextendedaddr",
+            "der_mac_dsttype",
+        ),
+        (
+            ("error_msg", None),
+            ("mac_panidcomp",
+                "The source PAN ID is the same as the destination PAN ID"),
+            ("mac_dstaddrmode", "Short destination MAC address"),
+        ),
+    ),
+    (
+        "MAC Source",
+        "MAC Src Type",
+        (
+            "der_mac_srcpanid",
+            "der_mac_srcshortaddr",
+            "der_mac_srcextendedaddr",
+            "der_mac_srctype",
+        ),
+        (
+            ("error_msg", None),
+            ("mac_panidcomp",
+                "The source PAN ID is the same as the destination PAN ID"),
+            ("mac_srcaddrmode", "Short source MAC address"),
+        ),
+    ),
+    (
+        "NWK Destination",
+        "NWK Dst Type",
+        (
+            "der_nwk_dstpanid",
+            "der_nwk_dstshortaddr",
+            "der_nwk_dstextendedaddr",
+            "der_nwk_dsttype",
+        ),
+        (
+            ("error_msg", None),
+            ("mac_panidcomp",
+                "The source PAN ID is the same as the destination PAN ID"),
+            ("!nwk_dstshortaddr", None),
+        ),
+    ),
+    (
+        "NWK Source",
+        "NWK Src Type",
+        (
+            "der_nwk_srcpanid",
+            "der_nwk_srcshortaddr",
+            "der_nwk_srcextendedaddr",
+            "der_nwk_srctype",
+        ),
+        (
+            ("error_msg", None),
+            ("mac_panidcomp",
+                "The source PAN ID is the same as the destination PAN ID"),
+            ("!nwk_srcshortaddr", None),
+        ),
+    ),
+]
+
+# Maximum number of index entries that are examined for the statistics
+# of each index, which keeps the statistics of large databases
+# approximate but fast to refresh
+ANALYSIS_LIMIT = 10000
+
+# Journal modes and page cache size, in kibibytes, of bulk loads
+BULK_JOURNAL_MODES = set(["WAL", "MEMORY"])
+BULK_CACHE_SIZE = 65536
+
+# Text columns of the packets table that do not hold repeated values
+FREEFORM_PKT_COLUMNS = set([
     "pkt_show",
+    "mac_fcs",
+    "mac_beacon_shortaddresses",
+    "mac_beacon_extendedaddresses",
+    "nwk_srcroute_relaylist",
+    "nwk_aux_decshow",
+    "nwk_routerecord_relaylist",
+    "nwk_linkstatus_addresses",
+    "nwk_linkstatus_incomingcosts",
+    "nwk_linkstatus_outgoingcosts",
+    "aps_aux_decshow",
+    "aps_transportkey_key",
+    "aps_verifykey_keyhash",
 ])
 
+# Text columns of the packets table that are stored as integer codes in
+# the encoded storage mode, along with the column definitions of the table
+# that stores the encoded packets
+ENCODED_PKT_COLUMNS = [
+    column[0] for column in PKT_COLUMNS
+    if column[1] == "TEXT" and column[0] not in FREEFORM_PKT_COLUMNS
+]
+ENCODED_PKT_COLUMN_DEFS = [
+    (column[0], "INTEGER") if column[0] in ENCODED_PKT_COLUMNS else column
+    for column in PKT_COLUMNS
+]
+
+# Tables of the partitioned storage mode, each of which is keyed by the
+# packet ID and stores the columns of the packets table that start with
+# one of its prefixes, unless another table has a longer matching prefix
+PKT_PARTITIONS = [
+    ("packets_frame", ("pcap_", "pkt_", "phy_", "warning_msg", "error_msg")),
+    ("packets_show", ("pkt_show", "nwk_aux_decshow", "aps_aux_decshow")),
+    ("packets_mac", ("mac_",)),
+    ("packets_nwk", ("nwk_",)),
+    ("packets_nwk_aux", ("nwk_aux_",)),
+    ("packets_aps", ("aps_",)),
+    ("packets_aps_aux", ("aps_aux_",)),
+    ("packets_zdp_zcl", ("zdp_", "zcl_")),
+    ("packets_der", ("der_",)),
+]
+PKT_COLUMN_PARTITIONS = {
+    column_name: max((len(prefix), tablename)
+                     for tablename, prefixes in PKT_PARTITIONS
+                     for prefix in prefixes
+                     if column_name.startswith(prefix))[1]
+    for column_name in PKT_COLUMN_NAMES
+}
+
+# Number of packet rows that are converted at a time and number of stored
+# packets that are staged at a time by their IDs
+CONVERSION_BATCH_SIZE = 10000
+CHECKOUT_BATCH_SIZE = 500
+
 # Initialize global variables for interacting with the database
 connection = None
 cursor = None
 
+# Name of the table that stores the packets, or the frame of each packet
+# in the partitioned storage mode, and, in the encoded storage mode, the
+# dictionaries that map the values of each encoded column to their codes
+# and vice versa
+pkt_tablename = "packets"
+partitioned = False
+value_codes = None
+code_values = None
+
 
 def connect(db_filepath):
     global connection
@@ -285,15 +463,18 @@ def connect(db_filepath):
     connection = sqlite3.connect(db_filepath)
     connection.text_factory = str
     cursor = connection.cursor()
+    load_storage()
 
 
 def create_table(tablename):
-    global connection
     global cursor
 
     if tablename == "packets":
         columns = PKT_COLUMNS
         constrained_columns = CONSTRAINED_PKT_COLUMNS
+
+        # Drop the stored packets, which the new table replaces
+        drop_stored_tables()
     else:
         raise ValueError("Unknown table name \"{}\"".format(tablename))
 
@@ -302,8 +483,22 @@ def create_table(tablename):
     cursor.execute(table_drop_command)
 
     # Create the table
+    create_columns_table(tablename, columns, constrained_columns)
+
+    # Provide a view of the table with hex-encoded BLOB columns
+    if tablename == "packets":
+        create_hex_view()
+
+
+def create_columns_table(tablename, columns, constrained_columns,
+                         key_column=None):
+    global cursor
+
     table_creation_command = "CREATE TABLE {}(".format(tablename)
     delimiter_needed = False
+    if key_column is not None:
+        table_creation_command += "{} INTEGER PRIMARY KEY".format(key_column)
+        delimiter_needed = True
     for column in columns:
         if delimiter_needed:
             table_creation_command += ", "
@@ -341,14 +536,175 @@ def create_table(tablename):
     cursor.execute(table_creation_command)
 
 
-def insert_pkt(entry):
+def create_hex_view():
+    global cursor
+
+    view_columns = []
+    for column_name, column_type in PKT_COLUMNS:
+        if column_type == "BLOB":
+            view_columns.append(
+                "CASE WHEN {0} IS NULL THEN NULL "
+                "ELSE lower(hex({0})) END AS {0}".format(column_name))
+        else:
+            view_columns.append(column_name)
+    cursor.execute("DROP VIEW IF EXISTS packets_hex")
+    cursor.execute("CREATE VIEW packets_hex AS SELECT {} FROM packets"
+                   "".format(", ".join(view_columns)))
+
+
+def insert_pkts(pkt_rows):
+    global cursor
+
+    # Insert a batch of column-ordered packet rows into the database
+    if is_converted():
+        cursor.executemany(STAGED_PKT_INSERT_COMMAND, pkt_rows)
+        store_staged_pkts()
+    else:
+        cursor.executemany(PKT_INSERT_COMMAND, pkt_rows)
+
+
+def merge_shard(shard_filepath):
+    global connection
+    global cursor
+
+    # Copy all the packets of a shard database into the packets table
+    connection.commit()
+    cursor.execute("ATTACH DATABASE ? AS shard", (shard_filepath,))
+    if is_converted():
+        cursor.execute("INSERT INTO packets_staged({}) "
+                       "SELECT * FROM shard.packets"
+                       "".format(", ".join(PKT_COLUMN_NAMES)))
+        store_staged_pkts()
+    else:
+        cursor.execute("INSERT INTO packets SELECT * FROM shard.packets")
+    connection.commit()
+    cursor.execute("DETACH DATABASE shard")
+
+
+def remove_pcap_pkts(pcap_directory, pcap_filename):
+    global cursor
+
+    # Remove all the packets of a pcap file from the database
+    if not is_converted():
+        cursor.execute("DELETE FROM packets WHERE pcap_directory=? "
+                       "AND pcap_filename=?", (pcap_directory, pcap_filename))
+        return
+    expr_statements, expr_values = condition_expressions(
+        [("pcap_directory", pcap_directory), ("pcap_filename", pcap_filename)])
+    for tablename, _, _ in stored_columns(is_encoded(), is_partitioned())[1:]:
+        cursor.execute("DELETE FROM {} WHERE rowid IN "
+                       "(SELECT rowid FROM {} WHERE {})"
+                       "".format(tablename,
+                                 pkt_tablename,
+                                 " AND ".join(expr_statements)),
+                       tuple(expr_values))
+    cursor.execute("DELETE FROM {} WHERE {}"
+                   "".format(pkt_tablename, " AND ".join(expr_statements)),
+                   tuple(expr_values))
+
+
+def update_pkts(pkt_rows):
+    global cursor
+
+    # Replace the stored data of the provided column-ordered packet rows,
+    # which are identified by their pcap file and packet number
+    key_columns = ["pcap_directory", "pcap_filename", "pkt_num"]
+    update_columns = [column_name for column_name in PKT_COLUMN_NAMES
+                      if column_name not in key_columns]
+    indices = [PKT_COLUMN_NAMES.index(column_name)
+               for column_name in update_columns + key_columns]
+    if len(pkt_rows) == 0:
+        return
+
+    # Stage the converted packets that are updated, which are looked up by
+    # the stored form of their pcap file and packet number
+    if is_converted():
+        pkt_ids = []
+        for pkt_row in pkt_rows:
+            expr_statements, expr_values = condition_expressions(
+                [(column_name, pkt_row[i]) for column_name, i
+                 in zip(key_columns, indices[-len(key_columns):])])
+            cursor.execute("SELECT rowid FROM {} WHERE {}"
+                           "".format(pkt_tablename,
+                                     " AND ".join(expr_statements)),
+                           tuple(expr_values))
+            pkt_ids.extend(pkt_id for pkt_id, in cursor.fetchall())
+        for i in range(0, len(pkt_ids), CHECKOUT_BATCH_SIZE):
+            batch_ids = pkt_ids[i:i+CHECKOUT_BATCH_SIZE]
+            checkout_pkts("pkt_id IN ({})"
+                          "".format(", ".join("?"*len(batch_ids))),
+                          batch_ids)
+        tablename = "packets_staged"
+        temporary_index = False
+    else:
+        tablename = "packets"
+
+        # Index the packets only while they are being updated, unless their
+        # declared file index already exists
+        temporary_index = not index_exists("packets_file_index")
+    if temporary_index:
+        cursor.execute("CREATE INDEX update_index ON packets({})"
+                       "".format(", ".join(key_columns)))
+    cursor.executemany(
+        "UPDATE {} SET {} WHERE pcap_directory=? AND pcap_filename=? "
+        "AND pkt_num=?".format(tablename,
+                               ", ".join("{}=?".format(column_name)
+                                         for column_name in update_columns)),
+        (tuple(pkt_row[i] for i in indices) for pkt_row in pkt_rows))
+    if temporary_index:
+        cursor.execute("DROP INDEX update_index")
+    if is_converted():
+        store_staged_pkts()
+
+
+def index_exists(indexname):
     global cursor
 
-    # Insert the parsed data into the database
-    cursor.execute("INSERT INTO packets VALUES ({})"
-                   "".format(", ".join("?"*len(PKT_COLUMNS))),
-                   tuple(entry[column_name]
-                         for column_name in PKT_COLUMN_NAMES))
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master "
+                   "WHERE type=\"index\" AND name=?", (indexname,))
+    return cursor.fetchall()[0][0] > 0
+
+
+def create_indexes():
+    global cursor
+
+    # Sanity check
+    for _, column_names in PKT_INDEXES:
+        for column_name in column_names:
+            if column_name not in PKT_COLUMN_NAMES:
+                raise ValueError("Unknown column name \"{}\""
+                                 "".format(column_name))
+
+    # Create the declared indexes that do not already exist, each of which
+    # indexes only the columns of its first column's table in the
+    # partitioned storage mode
+    for index_name, column_names in PKT_INDEXES:
+        tablename = pkt_tablename
+        if is_partitioned():
+            tablename = PKT_COLUMN_PARTITIONS[column_names[0]]
+            column_names = [column_name for column_name in column_names
+                            if PKT_COLUMN_PARTITIONS[column_name] == tablename]
+        cursor.execute("CREATE INDEX IF NOT EXISTS {} ON {}({})"
+                       "".format(index_name,
+                                 tablename,
+                                 ", ".join(column_names)))
+
+
+def drop_indexes():
+    global cursor
+
+    # Drop the declared indexes, which are rebuilt faster after a bulk load
+    # than they are maintained while packets are inserted
+    for index_name, _ in PKT_INDEXES:
+        cursor.execute("DROP INDEX IF EXISTS {}".format(index_name))
+
+
+def analyze():
+    global cursor
+
+    # Refresh the statistics that the query planner uses to select indexes
+    cursor.execute("PRAGMA analysis_limit={}".format(ANALYSIS_LIMIT))
+    cursor.execute("ANALYZE")
 
 
 def commit():
@@ -357,6 +713,390 @@ def commit():
     connection.commit()
 
 
+def begin_bulk_load(journal_mode="WAL"):
+    global connection
+    global cursor
+
+    # Trade the durability of the database for faster bulk inserts, which
+    # means that the database may be corrupted if the system crashes
+    # before the end of the bulk load
+    if journal_mode not in BULK_JOURNAL_MODES:
+        raise ValueError("The journal mode \"{}\" is not in the set of "
+                         "bulk journal modes {}"
+                         "".format(journal_mode, BULK_JOURNAL_MODES))
+
+    # The journal mode cannot be changed within a transaction
+    connection.commit()
+    cursor.execute("PRAGMA journal_mode={}".format(journal_mode))
+    logging.debug("Using the \"{}\" journal mode for the bulk load"
+                  "".format(cursor.fetchone()[0]))
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA cache_size={}".format(-BULK_CACHE_SIZE))
+
+
+def end_bulk_load():
+    global connection
+    global cursor
+
+    # Write a durable checkpoint and restore the default settings
+    connection.commit()
+    cursor.execute("PRAGMA synchronous=FULL")
+    cursor.execute("PRAGMA journal_mode")
+    if cursor.fetchone()[0] == "wal":
+        cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    cursor.execute("PRAGMA journal_mode=DELETE")
+    cursor.execute("PRAGMA cache_size=-2000")
+
+
+def load_storage():
+    global pkt_tablename
+    global partitioned
+    global value_codes
+    global code_values
+    global cursor
+
+    # The packets are stored across the tables of their layers only in the
+    # partitioned storage mode and as integer codes only in the encoded
+    # storage mode, in which case the dictionaries of their codes are loaded
+    partitioned = table_exists("packets_frame")
+    if partitioned:
+        pkt_tablename = "packets_frame"
+    elif table_exists("packets_encoded"):
+        pkt_tablename = "packets_encoded"
+    else:
+        pkt_tablename = "packets"
+    value_codes = None
+    code_values = None
+    if table_exists("{}_codes".format(ENCODED_PKT_COLUMNS[0])):
+        value_codes = {}
+        code_values = {}
+        for column_name in ENCODED_PKT_COLUMNS:
+            cursor.execute("SELECT code, value FROM {}_codes"
+                           "".format(column_name))
+            code_values[column_name] = dict(cursor.fetchall())
+            value_codes[column_name] = {
+                value: code
+                for code, value in code_values[column_name].items()
+            }
+    if is_converted():
+        create_staging_table()
+
+
+def is_encoded():
+    return value_codes is not None
+
+
+def is_partitioned():
+    return partitioned
+
+
+def is_converted():
+    return is_encoded() or is_partitioned()
+
+
+def drop_stored_tables():
+    global pkt_tablename
+    global partitioned
+    global value_codes
+    global code_values
+    global cursor
+
+    # Drop the view that reconstructs the packets, the tables that store
+    # them, and their lookup tables, if they exist
+    cursor.execute("SELECT type FROM sqlite_master WHERE name=\"packets\"")
+    if cursor.fetchall() == [("view",)]:
+        cursor.execute("DROP VIEW IF EXISTS packets_hex")
+        cursor.execute("DROP VIEW packets")
+    cursor.execute("DROP TABLE IF EXISTS packets_encoded")
+    for tablename, _ in PKT_PARTITIONS:
+        cursor.execute("DROP TABLE IF EXISTS {}".format(tablename))
+    for column_name in ENCODED_PKT_COLUMNS:
+        cursor.execute("DROP TABLE IF EXISTS {}_codes".format(column_name))
+    cursor.execute("DROP TABLE IF EXISTS temp.packets_staged")
+    pkt_tablename = "packets"
+    partitioned = False
+    value_codes = None
+    code_values = None
+
+
+def pkt_source(column_names):
+    # Join the frame of each packet only with the tables of the layers
+    # that store the provided columns in the partitioned storage mode
+    if not is_partitioned():
+        return pkt_tablename
+    tablenames = set(PKT_COLUMN_PARTITIONS.get(column_name)
+                     for column_name in column_names)
+    source = "packets_frame"
+    for tablename, _ in PKT_PARTITIONS[1:]:
+        if tablename in tablenames:
+            source += " LEFT JOIN {} USING (pkt_id)".format(tablename)
+    return source
+
+
+def stored_columns(encode_columns, partition_layers):
+    # Return the name of each table that stores the packets, whether it is
+    # keyed by the packet ID, and the columns that it stores
+    column_defs = ENCODED_PKT_COLUMN_DEFS if encode_columns else PKT_COLUMNS
+    if not partition_layers:
+        return [("packets_encoded", False, column_defs)]
+    return [
+        (tablename, True, [column for column in column_defs
+                           if PKT_COLUMN_PARTITIONS[column[0]] == tablename])
+        for tablename, _ in PKT_PARTITIONS
+    ]
+
+
+def reconstruction_query(with_ids=False):
+    # Select the columns of the packets from the tables that store them,
+    # replacing the codes of the encoded columns with their values
+    selected_columns = []
+    if with_ids:
+        selected_columns.append("{}.rowid AS pkt_id".format(pkt_tablename))
+    for column_name in PKT_COLUMN_NAMES:
+        if is_encoded() and column_name in code_values.keys():
+            selected_columns.append(
+                "(SELECT value FROM {0}_codes WHERE code={1}.{0}) AS {0}"
+                "".format(column_name,
+                          PKT_COLUMN_PARTITIONS[column_name]
+                          if is_partitioned() else pkt_tablename))
+        else:
+            selected_columns.append(column_name)
+    return "SELECT {} FROM {}".format(", ".join(selected_columns),
+                                      pkt_source(PKT_COLUMN_NAMES))
+
+
+def convert_table(encode_columns, partition_layers):
+    global pkt_tablename
+    global partitioned
+    global value_codes
+    global code_values
+    global connection
+    global cursor
+
+    if is_converted() or not (encode_columns or partition_layers):
+        return
+
+    # Collect the distinct values of each encoded column, whose codes
+    # follow the order of the values, unlike the codes of the values that
+    # are stored after the conversion
+    new_value_codes = {}
+    if encode_columns:
+        iter_cursor = connection.cursor()
+        iter_cursor.execute("SELECT {} FROM packets"
+                            "".format(", ".join(ENCODED_PKT_COLUMNS)))
+        distinct_values = [set() for _ in ENCODED_PKT_COLUMNS]
+        while True:
+            pkt_rows = iter_cursor.fetchmany(CONVERSION_BATCH_SIZE)
+            if len(pkt_rows) == 0:
+                break
+            for i, column_values in enumerate(zip(*pkt_rows)):
+                distinct_values[i].update(column_values)
+        iter_cursor.close()
+        for column_name, column_values in zip(ENCODED_PKT_COLUMNS,
+                                              distinct_values):
+            column_values.discard(None)
+            new_value_codes[column_name] = {
+                value: code
+                for code, value in enumerate(sorted(column_values), start=1)
+            }
+
+    # Create the tables that store the packets, each of which, except for
+    # the table of the frames, stores only the packets that have a value
+    # in at least one of its columns
+    tables = stored_columns(encode_columns, partition_layers)
+    insert_commands = []
+    for tablename, keyed, columns in tables:
+        create_columns_table(tablename, columns, CONSTRAINED_PKT_COLUMNS,
+                             "pkt_id" if keyed else None)
+        insert_commands.append("INSERT INTO {} VALUES ({})".format(
+            tablename, ", ".join("?"*(len(columns) + keyed))))
+
+    # Copy the packets in batches, replacing the values of the encoded
+    # columns with their codes
+    indices = [(PKT_COLUMN_NAMES.index(column_name), column_dict)
+               for column_name, column_dict in new_value_codes.items()]
+    table_indices = [
+        [PKT_COLUMN_NAMES.index(column[0]) for column in columns]
+        for _, _, columns in tables
+    ]
+    iter_cursor = connection.cursor()
+    iter_cursor.execute("SELECT rowid, * FROM packets ORDER BY rowid")
+    while True:
+        pkt_rows = iter_cursor.fetchmany(CONVERSION_BATCH_SIZE)
+        if len(pkt_rows) == 0:
+            break
+        pkt_ids, *pkt_columns = zip(*pkt_rows)
+        for i, column_dict in indices:
+            pkt_columns[i] = list(map(column_dict.get, pkt_columns[i]))
+        for (tablename, keyed, _), insert_command, column_indices in zip(
+                tables, insert_commands, table_indices):
+            table_rows = zip(*[pkt_columns[i] for i in column_indices])
+            if not keyed:
+                cursor.executemany(insert_command, table_rows)
+            elif tablename == "packets_frame":
+                cursor.executemany(insert_command,
+                                   ((pkt_id,) + row for pkt_id, row
+                                    in zip(pkt_ids, table_rows)))
+            else:
+                cursor.executemany(insert_command,
+                                   ((pkt_id,) + row for pkt_id, row
+                                    in zip(pkt_ids, table_rows)
+                                    if any(value is not None
+                                           for value in row)))
+    iter_cursor.close()
+
+    # Store the lookup table of each encoded column
+    for column_name, column_codes in new_value_codes.items():
+        cursor.execute("CREATE TABLE {}_codes(code INTEGER PRIMARY KEY, "
+                       "value TEXT NOT NULL UNIQUE)".format(column_name))
+        cursor.executemany("INSERT INTO {}_codes VALUES (?, ?)"
+                           "".format(column_name),
+                           ((code, value) for value, code
+                            in column_codes.items()))
+
+    # Replace the packets table with a view that reconstructs the packets
+    cursor.execute("DROP VIEW IF EXISTS packets_hex")
+    cursor.execute("DROP TABLE packets")
+    pkt_tablename = tables[0][0]
+    partitioned = partition_layers
+    if encode_columns:
+        value_codes = new_value_codes
+        code_values = {
+            column_name: {code: value for value, code in column_codes.items()}
+            for column_name, column_codes in new_value_codes.items()
+        }
+    cursor.execute("CREATE VIEW packets AS {}".format(reconstruction_query()))
+    create_hex_view()
+    create_staging_table()
+
+    # Reclaim the space that the original packets used to occupy
+    connection.commit()
+    cursor.execute("VACUUM")
+
+
+def restore_table():
+    global cursor
+
+    if not is_converted():
+        return
+
+    # Restore the packets table from the view that reconstructs the packets
+    create_columns_table("packets_restored", PKT_COLUMNS,
+                         CONSTRAINED_PKT_COLUMNS)
+    cursor.execute("INSERT INTO packets_restored {} ORDER BY {}.rowid"
+                   "".format(reconstruction_query(), pkt_tablename))
+    drop_stored_tables()
+    cursor.execute("ALTER TABLE packets_restored RENAME TO packets")
+    create_hex_view()
+
+
+def create_staging_table():
+    global cursor
+
+    # Packets are written into the converted tables through a temporary
+    # table, which holds the packets that are being inserted or updated
+    cursor.execute("DROP TABLE IF EXISTS temp.packets_staged")
+    create_columns_table("temp.packets_staged",
+                         [("pkt_id", "INTEGER")] + PKT_COLUMNS,
+                         CONSTRAINED_PKT_COLUMNS)
+
+
+def store_staged_pkts():
+    global cursor
+
+    # Assign the next packet IDs to the staged packets that do not have one
+    cursor.execute("SELECT MAX(max_id) FROM ("
+                   "SELECT MAX(rowid) AS max_id FROM {} UNION ALL "
+                   "SELECT MAX(pkt_id) FROM packets_staged)"
+                   "".format(pkt_tablename))
+    cursor.execute("UPDATE packets_staged SET pkt_id=rowid+? "
+                   "WHERE pkt_id IS NULL", (cursor.fetchone()[0] or 0,))
+
+    # Assign the next codes to the values that do not have one
+    if is_encoded():
+        for column_name in ENCODED_PKT_COLUMNS:
+            cursor.execute("INSERT OR IGNORE INTO {0}_codes(value) "
+                           "SELECT DISTINCT {0} FROM packets_staged "
+                           "WHERE {0} IS NOT NULL".format(column_name))
+            cursor.execute("SELECT code, value FROM {}_codes WHERE code>?"
+                           "".format(column_name),
+                           (max(code_values[column_name].keys(),
+                                default=0),))
+            for code, value in cursor.fetchall():
+                code_values[column_name][code] = value
+                value_codes[column_name][value] = code
+
+    # Insert the staged packets into the tables that store them, each of
+    # which, except for the table of the frames, stores only the packets
+    # that have a value in at least one of its columns
+    for tablename, keyed, columns in stored_columns(is_encoded(),
+                                                    is_partitioned()):
+        selected_columns = []
+        for column_name, _ in columns:
+            if is_encoded() and column_name in code_values.keys():
+                selected_columns.append(
+                    "(SELECT code FROM {0}_codes "
+                    "WHERE value=packets_staged.{0})".format(column_name))
+            else:
+                selected_columns.append(column_name)
+        insert_command = (
+            "INSERT INTO {}({}, {}) SELECT pkt_id, {} FROM packets_staged"
+            "".format(tablename,
+                      "pkt_id" if keyed else "rowid",
+                      ", ".join(column_name for column_name, _ in columns),
+                      ", ".join(selected_columns))
+        )
+        if keyed and tablename != "packets_frame":
+            insert_command += " WHERE {}".format(
+                " OR ".join("{} IS NOT NULL".format(column_name)
+                            for column_name, _ in columns))
+        cursor.execute(insert_command)
+    cursor.execute("DELETE FROM packets_staged")
+
+
+def checkout_pkts(condition_statement, condition_values):
+    global cursor
+
+    # Move the stored packets that satisfy the condition, which refers to
+    # their original values, into the table of the staged packets
+    cursor.execute("INSERT INTO packets_staged SELECT * FROM ({}) AS packets "
+                   "WHERE {}".format(reconstruction_query(True),
+                                     condition_statement),
+                   tuple(condition_values))
+    for tablename, _, _ in reversed(stored_columns(is_encoded(),
+                                                   is_partitioned())):
+        cursor.execute("DELETE FROM {} WHERE rowid IN "
+                       "(SELECT pkt_id FROM packets_staged)"
+                       "".format(tablename))
+
+
+def decode_rows(selected_columns, rows):
+    # Replace the codes of the encoded columns with their values
+    if not is_encoded():
+        return rows
+    column_dicts = [code_values.get(column_name)
+                    for column_name in selected_columns]
+    if all(column_dict is None for column_dict in column_dicts):
+        return rows
+    return [
+        tuple(value if column_dict is None else column_dict.get(value)
+              for value, column_dict in zip(row, column_dicts))
+        for row in rows
+    ]
+
+
+def sorting_key(value):
+    # Order the values of a column in the same way that SQLite does
+    if value is None:
+        return (0,)
+    elif isinstance(value, (int, float)):
+        return (1, value)
+    elif isinstance(value, str):
+        return (2, value)
+    else:
+        return (3, value)
+
+
 def grouped_count(selected_columns, count_errors):
     global cursor
 
@@ -369,14 +1109,76 @@ def grouped_count(selected_columns, count_errors):
 
     # Construct the selection command
     column_csv = ", ".join(selected_columns)
-    select_command = "SELECT {}, COUNT(*) FROM packets".format(column_csv)
+    select_command = "SELECT {}, COUNT(*) FROM {}".format(
+        column_csv, pkt_source(selected_columns))
     if not count_errors:
         select_command += " WHERE error_msg IS NULL"
     select_command += " GROUP BY {}".format(column_csv)
 
-    # Return the results of the constructed command
+    # Return the results of the constructed command, which are sorted
+    # again after their codes are replaced with their values
     cursor.execute(select_command)
-    return cursor.fetchall()
+    results = decode_rows(list(selected_columns) + [None], cursor.fetchall())
+    if is_encoded():
+        results.sort(key=lambda row: tuple(map(sorting_key, row[:-1])))
+    return results
+
+
+def table_exists(tablename):
+    global cursor
+
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master "
+                   "WHERE type=\"table\" AND name=?", (tablename,))
+    return cursor.fetchall()[0][0] > 0
+
+
+def schema_matches():
+    global cursor
+
+    # The packets of databases that were created by an older version may
+    # be stored with different columns or column types, while the columns
+    # of the view that reconstructs converted packets have no declared
+    # type if they are decoded
+    cursor.execute("PRAGMA table_info(packets)")
+    stored_columns = [(row[1], row[2]) for row in cursor.fetchall()]
+    if is_converted():
+        return [column[0] for column in stored_columns] == PKT_COLUMN_NAMES
+    return stored_columns == PKT_COLUMNS
+
+
+def iterate_values(selected_columns):
+    global connection
+
+    # Sanity checks
+    if len(selected_columns) == 0:
+        raise ValueError("At least one selected column is required")
+    for column_name in selected_columns:
+        if column_name not in PKT_COLUMN_NAMES:
+            raise ValueError("Unknown column name \"{}\"".format(column_name))
+
+    # Yield the selected values of each packet without fetching all of them
+    # at once, using a separate cursor, in the order of their pcap files,
+    # whose codes do not follow the order of their values once new pcap
+    # files are stored in the encoded storage mode
+    order_columns = ["pcap_directory", "pcap_filename"]
+    if is_encoded():
+        order_columns = [
+            "(SELECT value FROM {0}_codes WHERE code={1}.{0})"
+            "".format(column_name, pkt_tablename)
+            for column_name in order_columns
+        ]
+    iter_cursor = connection.cursor()
+    iter_cursor.execute("SELECT {} FROM {} ORDER BY {}, pkt_num"
+                        "".format(", ".join(selected_columns),
+                                  pkt_source(selected_columns),
+                                  ", ".join(order_columns)))
+    while True:
+        rows = iter_cursor.fetchmany(CONVERSION_BATCH_SIZE)
+        if len(rows) == 0:
+            break
+        for row in decode_rows(selected_columns, rows):
+            yield row
+    iter_cursor.close()
 
 
 def fetch_values(selected_columns, conditions, distinct):
@@ -391,72 +1193,34 @@ def fetch_values(selected_columns, conditions, distinct):
 
     # Construct the selection command
     column_csv = ", ".join(selected_columns)
+    source = pkt_source(list(selected_columns)
+                        + condition_columns(conditions))
     if distinct:
-        select_command = "SELECT DISTINCT {} FROM packets".format(column_csv)
+        select_command = "SELECT DISTINCT {} FROM {}".format(
+            column_csv, source)
     else:
-        select_command = "SELECT {} FROM packets".format(column_csv)
-    expr_statements = []
+        select_command = "SELECT {} FROM {}".format(column_csv, source)
     expr_values = []
     if conditions is not None:
+        expr_statements, expr_values = condition_expressions(conditions)
         select_command += " WHERE "
-        for condition in conditions:
-            param = condition[0]
-            value = condition[1]
-            if param[0] == "!":
-                neq = True
-                param = param[1:]
-            else:
-                neq = False
-            if param not in PKT_COLUMN_NAMES:
-                raise ValueError("Unknown column name \"{}\"".format(param))
-            elif value is None:
-                if neq:
-                    expr_statements.append("{} IS NOT NULL".format(param))
-                else:
-                    expr_statements.append("{} IS NULL".format(param))
-            else:
-                if neq:
-                    expr_statements.append("{}!=?".format(param))
-                else:
-                    expr_statements.append("{}=?".format(param))
-                expr_values.append(value)
         select_command += " AND ".join(expr_statements)
 
     # Return the results of the constructed command
     cursor.execute(select_command, tuple(expr_values))
-    return cursor.fetchall()
+    return decode_rows(selected_columns, cursor.fetchall())
 
 
 def matching_frequency(conditions):
     global cursor
 
     # Construct the selection command
-    select_command = "SELECT COUNT(*) FROM packets"
-    expr_statements = []
+    select_command = "SELECT COUNT(*) FROM {}".format(
+        pkt_source(condition_columns(conditions)))
     expr_values = []
     if conditions is not None:
+        expr_statements, expr_values = condition_expressions(conditions)
         select_command += " WHERE "
-        for condition in conditions:
-            param = condition[0]
-            value = condition[1]
-            if param[0] == "!":
-                neq = True
-                param = param[1:]
-            else:
-                neq = False
-            if param not in PKT_COLUMN_NAMES:
-                raise ValueError("Unknown column name \"{}\"".format(param))
-            elif value is None:
-                if neq:
-                    expr_statements.append("{} IS NOT NULL".format(param))
-                else:
-                    expr_statements.append("{} IS NULL".format(param))
-            else:
-                if neq:
-                    expr_statements.append("{}!=?".format(param))
-                else:
-                    expr_statements.append("{}=?".format(param))
-                expr_values.append(value)
         select_command += " AND ".join(expr_statements)
 
     # Return the results of the constructed command
@@ -474,9 +1238,9 @@ def store_networks(networks):
     cursor.execute("CREATE TABLE networks(epid TEXT NOT NULL, panids TEXT)")
 
     # Insert the data into the database
-    for epid in networks.keys():
-        cursor.execute("INSERT INTO networks VALUES (?, ?)",
-                       tuple([epid, ",".join(networks[epid])]))
+    cursor.executemany("INSERT INTO networks VALUES (?, ?)",
+                       ((epid, ",".join(networks[epid]))
+                        for epid in networks.keys()))
 
 
 def store_devices(devices):
@@ -490,11 +1254,11 @@ def store_devices(devices):
                    "macdevtype TEXT, nwkdevtype TEXT)")
 
     # Insert the data into the database
-    for extendedaddr in devices.keys():
-        cursor.execute("INSERT INTO devices VALUES (?, ?, ?)",
-                       tuple([extendedaddr,
-                              devices[extendedaddr]["macdevtype"],
-                              devices[extendedaddr]["nwkdevtype"]]))
+    cursor.executemany("INSERT INTO devices VALUES (?, ?, ?)",
+                       ((extendedaddr,
+                         devices[extendedaddr]["macdevtype"],
+                         devices[extendedaddr]["nwkdevtype"])
+                        for extendedaddr in devices.keys()))
 
 
 def store_addresses(addresses):
@@ -508,9 +1272,9 @@ def store_addresses(addresses):
                    "panid TEXT NOT NULL, extendedaddr TEXT)")
 
     # Insert the data into the database
-    for addrpan in addresses.keys():
-        cursor.execute("INSERT INTO addresses VALUES (?, ?, ?)",
-                       tuple([addrpan[0], addrpan[1], addresses[addrpan]]))
+    cursor.executemany("INSERT INTO addresses VALUES (?, ?, ?)",
+                       ((addrpan[0], addrpan[1], addresses[addrpan])
+                        for addrpan in addresses.keys()))
 
 
 def store_pairs(pairs):
@@ -525,13 +1289,104 @@ def store_pairs(pairs):
                    "first REAL, last REAL)")
 
     # Insert the data into the database
-    for pairpan in pairs.keys():
-        cursor.execute("INSERT INTO pairs VALUES (?, ?, ?, ?, ?)",
-                       tuple([pairpan[0],
-                              pairpan[1],
-                              pairpan[2],
-                              pairs[pairpan]["first"],
-                              pairs[pairpan]["last"]]))
+    cursor.executemany("INSERT INTO pairs VALUES (?, ?, ?, ?, ?)",
+                       ((pairpan[0],
+                         pairpan[1],
+                         pairpan[2],
+                         pairs[pairpan]["first"],
+                         pairs[pairpan]["last"])
+                        for pairpan in pairs.keys()))
+
+
+def store_files(files):
+    global cursor
+
+    # Drop the table if it already exists
+    cursor.execute("DROP TABLE IF EXISTS files")
+
+    # Create the table
+    cursor.execute("CREATE TABLE files(pcap_directory TEXT NOT NULL, "
+                   "pcap_filename TEXT NOT NULL, size INTEGER NOT NULL, "
+                   "mtime INTEGER NOT NULL, sha256 TEXT)")
+
+    # Insert the data into the database
+    cursor.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                       ((dirfile[0],
+                         dirfile[1],
+                         files[dirfile]["size"],
+                         files[dirfile]["mtime"],
+                         files[dirfile]["sha256"])
+                        for dirfile in files.keys()))
+
+
+def load_files():
+    global cursor
+
+    files = {}
+    if not table_exists("files"):
+        return files
+    cursor.execute("SELECT * FROM files")
+    for pcap_directory, pcap_filename, size, mtime, sha256 in cursor:
+        files[(pcap_directory, pcap_filename)] = {
+            "size": size,
+            "mtime": mtime,
+            "sha256": sha256,
+        }
+    return files
+
+
+def load_networks():
+    global cursor
+
+    networks = {}
+    if not table_exists("networks"):
+        return networks
+    cursor.execute("SELECT * FROM networks")
+    for epid, panids in cursor:
+        networks[epid] = set(panids.split(",")) if panids else set()
+    return networks
+
+
+def load_devices():
+    global cursor
+
+    devices = {}
+    if not table_exists("devices"):
+        return devices
+    cursor.execute("SELECT * FROM devices")
+    for extendedaddr, macdevtype, nwkdevtype in cursor:
+        devices[extendedaddr] = {
+            "macdevtype": macdevtype,
+            "nwkdevtype": nwkdevtype,
+        }
+    return devices
+
+
+def load_addresses():
+    global cursor
+
+    addresses = {}
+    if not table_exists("addresses"):
+        return addresses
+    cursor.execute("SELECT * FROM addresses")
+    for shortaddr, panid, extendedaddr in cursor:
+        addresses[(shortaddr, panid)] = extendedaddr
+    return addresses
+
+
+def load_pairs():
+    global cursor
+
+    pairs = {}
+    if not table_exists("pairs"):
+        return pairs
+    cursor.execute("SELECT * FROM pairs")
+    for srcaddr, dstaddr, panid, first, last in cursor:
+        pairs[(srcaddr, dstaddr, panid)] = {
+            "first": first,
+            "last": last,
+        }
+    return pairs
 
 
 def get_macdevtype(shortaddr=None, panid=None, extendedaddr=None):
@@ -592,52 +1447,148 @@ def get_nwkdevtype(shortaddr=None, panid=None, extendedaddr=None):
         return results[0][0]
 
 
-def update_table(selected_columns, selected_values, conditions):
-    global connection
-    global cursor
+def condition_columns(conditions):
+    # Return the names of the columns that the provided conditions refer to
+    if conditions is None:
+        return []
+    return [condition[0].lstrip("!") for condition in conditions]
 
-    # Sanity checks
-    if len(selected_columns) == 0:
-        raise ValueError("At least one selected column is required")
-    elif len(selected_columns) != len(selected_values):
-        raise ValueError("The number of selected columns does not match "
-                         "the number of selected values")
-    for column_name in selected_columns:
-        if column_name not in PKT_COLUMN_NAMES:
-            raise ValueError("Unknown column name \"{}\"".format(column_name))
 
-    # Update the table
-    set_statements = ["{} = ?".format(x) for x in selected_columns]
-    update_command = "UPDATE packets SET {}".format(", ".join(set_statements))
+def condition_expressions(conditions, encode_values=True):
+    # Construct the expressions and the values of the provided conditions,
+    # which compare the encoded columns with codes unless otherwise noted
     expr_statements = []
-    expr_values = list(selected_values)
-    if conditions is not None:
-        update_command += " WHERE "
-        for condition in conditions:
-            param = condition[0]
-            value = condition[1]
-            if param[0] == "!":
-                neq = True
-                param = param[1:]
+    expr_values = []
+    for condition in conditions:
+        param = condition[0]
+        value = condition[1]
+        if param[0] == "!":
+            neq = True
+            param = param[1:]
+        else:
+            neq = False
+        if param not in PKT_COLUMN_NAMES:
+            raise ValueError("Unknown column name \"{}\"".format(param))
+        elif value is None:
+            if neq:
+                expr_statements.append("{} IS NOT NULL".format(param))
             else:
-                neq = False
-            if param not in PKT_COLUMN_NAMES:
-                raise ValueError("Unknown column name \"{}\"".format(param))
-            elif value is None:
-                if neq:
-                    expr_statements.append("{} IS NOT NULL".format(param))
-                else:
-                    expr_statements.append("{} IS NULL".format(param))
+                expr_statements.append("{} IS NULL".format(param))
+        else:
+            if neq:
+                expr_statements.append("{}!=?".format(param))
             else:
-                if neq:
-                    expr_statements.append("{}!=?".format(param))
-                else:
-                    expr_statements.append("{}=?".format(param))
-                expr_values.append(value)
-        update_command += " AND ".join(expr_statements)
-
-    # Execute the constructed command
-    cursor.execute(update_command, tuple(expr_values))
+                expr_statements.append("{}=?".format(param))
+
+            # Values without a code are compared with an unused code
+            if encode_values and is_encoded() and param in value_codes:
+                value = value_codes[param].get(value, 0)
+            expr_values.append(value)
+    return expr_statements, expr_values
+
+
+def derived_updates(tablename, conflicting_addresses, conflicting_types):
+    # Construct the assignments, the conditions, and the debug messages of
+    # the updates that derive the addresses and types of the packets, in
+    # the order that they should be applied to the provided table
+    updates = []
+
+    # Mark the extended address of each packet that used a conflicting
+    # short address as conflicting
+    if conflicting_addresses:
+        for _, prefix, columns, conditions in DERIVED_ADDRESS_COLUMNS:
+            panid_column, shortaddr_column, extendedaddr_column, \
+                type_column = columns
+            expr_statements, expr_values = condition_expressions(
+                conditions + (("!" + type_column,
+                               "{}: Conflicting Data".format(prefix)),),
+                False)
+            updates.append((
+                "{}=\"Conflicting Data\", {}=?".format(extendedaddr_column,
+                                                       type_column),
+                ["{}: Conflicting Data".format(prefix)],
+                "{0} AND EXISTS (SELECT 1 FROM conflicting_addresses "
+                "WHERE conflicting_addresses.panid={1}.{2} "
+                "AND conflicting_addresses.shortaddr={1}.{3})"
+                "".format(" AND ".join(expr_statements),
+                          tablename,
+                          panid_column,
+                          shortaddr_column),
+                expr_values,
+                None,
+            ))
+
+    # Derive previously unknown extended addresses and their device types
+    for name, prefix, columns, conditions in DERIVED_ADDRESS_COLUMNS:
+        panid_column, shortaddr_column, extendedaddr_column, \
+            type_column = columns
+        expr_statements, expr_values = condition_expressions(
+            conditions + ((extendedaddr_column, None),
+                          (type_column, "{}: None".format(prefix))),
+            False)
+        updates.append((
+            "{0}=(SELECT extendedaddr FROM address_types "
+            "WHERE address_types.panid={2}.{3} "
+            "AND address_types.shortaddr={2}.{4}), "
+            "{1}=? || (SELECT nwkdevtype FROM address_types "
+            "WHERE address_types.panid={2}.{3} "
+            "AND address_types.shortaddr={2}.{4})"
+            "".format(extendedaddr_column,
+                      type_column,
+                      tablename,
+                      panid_column,
+                      shortaddr_column),
+            ["{}: ".format(prefix)],
+            "{0} AND EXISTS (SELECT 1 FROM address_types "
+            "WHERE address_types.panid={1}.{2} "
+            "AND address_types.shortaddr={1}.{3})"
+            "".format(" AND ".join(expr_statements),
+                      tablename,
+                      panid_column,
+                      shortaddr_column),
+            expr_values,
+            "Identified the {} extended address of".format(name),
+        ))
+
+    # Mark the type of each packet that used the extended address of
+    # a device with a conflicting NWK device type as conflicting
+    if conflicting_types:
+        for _, prefix, columns, conditions in DERIVED_ADDRESS_COLUMNS:
+            _, _, extendedaddr_column, type_column = columns
+            expr_statements, expr_values = condition_expressions(
+                conditions + (("!" + type_column,
+                               "{}: Conflicting Data".format(prefix)),),
+                False)
+            updates.append((
+                "{}=?".format(type_column),
+                ["{}: Conflicting Data".format(prefix)],
+                "{} AND {} IN (SELECT extendedaddr FROM device_types "
+                "WHERE nwkdevtype=\"Conflicting Data\")"
+                "".format(" AND ".join(expr_statements),
+                          extendedaddr_column),
+                expr_values,
+                None,
+            ))
+
+    # Derive previously unknown device types from known extended addresses
+    for name, prefix, columns, conditions in DERIVED_ADDRESS_COLUMNS:
+        _, _, extendedaddr_column, type_column = columns
+        expr_statements, expr_values = condition_expressions(
+            conditions + ((type_column, "{}: None".format(prefix)),),
+            False)
+        updates.append((
+            "{0}=? || (SELECT nwkdevtype FROM device_types "
+            "WHERE device_types.extendedaddr={1}.{2})"
+            "".format(type_column, tablename, extendedaddr_column),
+            ["{}: ".format(prefix)],
+            "{0} AND {1} IN (SELECT extendedaddr FROM device_types "
+            "WHERE nwkdevtype IS NOT NULL "
+            "AND extendedaddr!=\"Conflicting Data\")"
+            "".format(" AND ".join(expr_statements), extendedaddr_column),
+            expr_values,
+            "Identified the {} Type of".format(name),
+        ))
+    return updates
 
 
 def update_packets():
@@ -646,605 +1597,97 @@ def update_packets():
     # Check for conflicting addresses
     cursor.execute("SELECT DISTINCT shortaddr, panid FROM addresses "
                    "WHERE extendedaddr=\"Conflicting Data\"")
-    results = cursor.fetchall()
-    for result in results:
-        shortaddr = result[0]
-        panid = result[1]
+    conflicting_addresses = cursor.fetchall()
+    for shortaddr, panid in conflicting_addresses:
         logging.warning("Observed conflicting data regarding the "
                         "extended address of the device that uses "
                         "{} as its short address and {} as its PAN ID"
                         "".format(shortaddr, panid))
 
-        # Update the "MAC Destination Type" column
-        update_columns = (
-            "der_mac_dstextendedaddr",
-            "der_mac_dsttype",
-        )
-        update_values = (
-            "Conflicting Data",
-            "MAC Dst Type: Conflicting Data",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("mac_dstaddrmode", "Short destination MAC address"),
-            ("der_mac_dstpanid", panid),
-            ("der_mac_dstshortaddr", shortaddr),
-            ("!der_mac_dsttype", "MAC Dst Type: Conflicting Data"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-        # Update the "MAC Source Type" column
-        update_columns = (
-            "der_mac_srcextendedaddr",
-            "der_mac_srctype",
-        )
-        update_values = (
-            "Conflicting Data",
-            "MAC Src Type: Conflicting Data",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("mac_srcaddrmode", "Short source MAC address"),
-            ("der_mac_srcpanid", panid),
-            ("der_mac_srcshortaddr", shortaddr),
-            ("!der_mac_srctype", "MAC Src Type: Conflicting Data"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-        # Update the "NWK Destination Type" column
-        update_columns = (
-            "der_nwk_dstextendedaddr",
-            "der_nwk_dsttype",
-        )
-        update_values = (
-            "Conflicting Data",
-            "NWK Dst Type: Conflicting Data",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("!nwk_dstshortaddr", None),
-            ("der_nwk_dstpanid", panid),
-            ("der_nwk_dstshortaddr", shortaddr),
-            ("!der_nwk_dsttype", "NWK Dst Type: Conflicting Data"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-        # Update the "NWK Source Type" column
-        update_columns = (
-            "der_nwk_srcextendedaddr",
-            "der_nwk_srctype",
-        )
-        update_values = (
-            "Conflicting Data",
-            "NWK Src Type: Conflicting Data",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("!nwk_srcshortaddr", None),
-            ("der_nwk_srcpanid", panid),
-            ("der_nwk_srcshortaddr", shortaddr),
-            ("!der_nwk_srctype", "NWK Src Type: Conflicting Data"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown MAC Destination extended addresses
-    cursor.execute("SELECT DISTINCT der_mac_dstpanid, "
-                   "der_mac_dstshortaddr FROM packets "
-                   "WHERE der_mac_dsttype=\"MAC Dst Type: None\" "
-                   "AND der_mac_dstextendedaddr IS NULL")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "MAC Destination extended addresses..."
-                  "".format(len(results)))
-    for result in results:
-        panid = result[0]
-        shortaddr = result[1]
-        cursor.execute("SELECT extendedaddr FROM addresses "
-                       "WHERE shortaddr=? AND panid=?",
-                       (shortaddr, panid))
-        fetched_addresses = cursor.fetchall()
-        if len(fetched_addresses) == 0:
-            continue
-        elif len(fetched_addresses) != 1:
-            update_values = (
-                "Conflicting Data",
-                "MAC Dst Type: Conflicting Data",
-            )
-        elif fetched_addresses[0][0] == "Conflicting Data":
-            update_values = (
-                "Conflicting Data",
-                "MAC Dst Type: Conflicting Data",
-            )
-        else:
-            extendedaddr = fetched_addresses[0][0]
-            cursor.execute("SELECT nwkdevtype FROM devices "
-                           "WHERE extendedaddr=?",
-                           tuple([extendedaddr]))
-            fetched_nwkdevtype = cursor.fetchall()
-            if len(fetched_nwkdevtype) == 0:
-                update_values = (
-                    extendedaddr,
-                    "MAC Dst Type: None",
-                )
-            elif len(fetched_nwkdevtype) != 1:
-                update_values = (
-                    extendedaddr,
-                    "MAC Dst Type: Conflicting Data",
-                )
-            else:
-                update_values = (
-                    extendedaddr,
-                    "MAC Dst Type: {}".format(fetched_nwkdevtype[0][0]),
-                )
-        update_columns = (
-            "der_mac_dstextendedaddr",
-            "der_mac_dsttype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("mac_dstaddrmode", "Short destination MAC address"),
-            ("der_mac_dstpanid", panid),
-            ("der_mac_dstshortaddr", shortaddr),
-            ("der_mac_dstextendedaddr", None),
-            ("der_mac_dsttype", "MAC Dst Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown MAC Source extended addresses
-    cursor.execute("SELECT DISTINCT der_mac_srcpanid, "
-                   "der_mac_srcshortaddr FROM packets "
-                   "WHERE der_mac_srctype=\"MAC Src Type: None\" "
-                   "AND der_mac_srcextendedaddr IS NULL")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "MAC Source extended addresses..."
-                  "".format(len(results)))
-    for result in results:
-        panid = result[0]
-        shortaddr = result[1]
-        cursor.execute("SELECT extendedaddr FROM addresses "
-                       "WHERE shortaddr=? AND panid=?",
-                       (shortaddr, panid))
-        fetched_addresses = cursor.fetchall()
-        if len(fetched_addresses) == 0:
-            continue
-        elif len(fetched_addresses) != 1:
-            update_values = (
-                "Conflicting Data",
-                "MAC Src Type: Conflicting Data",
-            )
-        elif fetched_addresses[0][0] == "Conflicting Data":
-            update_values = (
-                "Conflicting Data",
-                "MAC Src Type: Conflicting Data",
-            )
-        else:
-            extendedaddr = fetched_addresses[0][0]
-            cursor.execute("SELECT nwkdevtype FROM devices "
-                           "WHERE extendedaddr=?",
-                           tuple([extendedaddr]))
-            fetched_nwkdevtype = cursor.fetchall()
-            if len(fetched_nwkdevtype) == 0:
-                update_values = (
-                    extendedaddr,
-                    "MAC Src Type: None",
-                )
-            elif len(fetched_nwkdevtype) != 1:
-                update_values = (
-                    extendedaddr,
-                    "MAC Src Type: Conflicting Data",
-                )
-            else:
-                update_values = (
-                    extendedaddr,
-                    "MAC Src Type: {}".format(fetched_nwkdevtype[0][0]),
-                )
-        update_columns = (
-            "der_mac_srcextendedaddr",
-            "der_mac_srctype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("mac_srcaddrmode", "Short source MAC address"),
-            ("der_mac_srcpanid", panid),
-            ("der_mac_srcshortaddr", shortaddr),
-            ("der_mac_srcextendedaddr", None),
-            ("der_mac_srctype", "MAC Src Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown NWK Destination extended addresses
-    cursor.execute("SELECT DISTINCT der_nwk_dstpanid, "
-                   "der_nwk_dstshortaddr FROM packets "
-                   "WHERE der_nwk_dsttype=\"NWK Dst Type: None\" "
-                   "AND der_nwk_dstextendedaddr IS NULL")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "NWK Destination extended addresses..."
-                  "".format(len(results)))
-    for result in results:
-        panid = result[0]
-        shortaddr = result[1]
-        cursor.execute("SELECT extendedaddr FROM addresses "
-                       "WHERE shortaddr=? AND panid=?",
-                       (shortaddr, panid))
-        fetched_addresses = cursor.fetchall()
-        if len(fetched_addresses) == 0:
-            continue
-        elif len(fetched_addresses) != 1:
-            update_values = (
-                "Conflicting Data",
-                "NWK Dst Type: Conflicting Data",
-            )
-        elif fetched_addresses[0][0] == "Conflicting Data":
-            update_values = (
-                "Conflicting Data",
-                "NWK Dst Type: Conflicting Data",
-            )
-        else:
-            extendedaddr = fetched_addresses[0][0]
-            cursor.execute("SELECT nwkdevtype FROM devices "
-                           "WHERE extendedaddr=?",
-                           tuple([extendedaddr]))
-            fetched_nwkdevtype = cursor.fetchall()
-            if len(fetched_nwkdevtype) == 0:
-                update_values = (
-                    extendedaddr,
-                    "NWK Dst Type: None",
-                )
-            elif len(fetched_nwkdevtype) != 1:
-                update_values = (
-                    extendedaddr,
-                    "NWK Dst Type: Conflicting Data",
-                )
-            else:
-                update_values = (
-                    extendedaddr,
-                    "NWK Dst Type: {}".format(fetched_nwkdevtype[0][0]),
-                )
-        update_columns = (
-            "der_nwk_dstextendedaddr",
-            "der_nwk_dsttype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("!nwk_dstshortaddr", None),
-            ("der_nwk_dstpanid", panid),
-            ("der_nwk_dstshortaddr", shortaddr),
-            ("der_nwk_dstextendedaddr", None),
-            ("der_nwk_dsttype", "NWK Dst Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown NWK Source extended addresses
-    cursor.execute("SELECT DISTINCT der_nwk_srcpanid, "
-                   "der_nwk_srcshortaddr FROM packets "
-                   "WHERE der_nwk_srctype=\"NWK Src Type: None\" "
-                   "AND der_nwk_srcextendedaddr IS NULL")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "NWK Source extended addresses..."
-                  "".format(len(results)))
-    for result in results:
-        panid = result[0]
-        shortaddr = result[1]
-        cursor.execute("SELECT extendedaddr FROM addresses "
-                       "WHERE shortaddr=? AND panid=?",
-                       (shortaddr, panid))
-        fetched_addresses = cursor.fetchall()
-        if len(fetched_addresses) == 0:
-            continue
-        elif len(fetched_addresses) != 1:
-            update_values = (
-                "Conflicting Data",
-                "NWK Src Type: Conflicting Data",
-            )
-        elif fetched_addresses[0][0] == "Conflicting Data":
-            update_values = (
-                "Conflicting Data",
-                "NWK Src Type: Conflicting Data",
-            )
-        else:
-            extendedaddr = fetched_addresses[0][0]
-            cursor.execute("SELECT nwkdevtype FROM devices "
-                           "WHERE extendedaddr=?",
-                           tuple([extendedaddr]))
-            fetched_nwkdevtype = cursor.fetchall()
-            if len(fetched_nwkdevtype) == 0:
-                update_values = (
-                    extendedaddr,
-                    "NWK Src Type: None",
-                )
-            elif len(fetched_nwkdevtype) != 1:
-                update_values = (
-                    extendedaddr,
-                    "NWK Src Type: Conflicting Data",
-                )
-            else:
-                update_values = (
-                    extendedaddr,
-                    "NWK Src Type: {}".format(fetched_nwkdevtype[0][0]),
-                )
-        update_columns = (
-            "der_nwk_srcextendedaddr",
-            "der_nwk_srctype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("!nwk_srcshortaddr", None),
-            ("der_nwk_srcpanid", panid),
-            ("der_nwk_srcshortaddr", shortaddr),
-            ("der_nwk_srcextendedaddr", None),
-            ("der_nwk_srctype", "NWK Src Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
+    # Gather the device types and the resolved addresses in temporary
+    # tables, which are joined with the packets table by each update
+    cursor.execute("DROP TABLE IF EXISTS temp.conflicting_addresses")
+    cursor.execute("CREATE TEMP TABLE conflicting_addresses("
+                   "shortaddr TEXT, panid TEXT, "
+                   "PRIMARY KEY (panid, shortaddr))")
+    cursor.executemany("INSERT INTO conflicting_addresses VALUES (?, ?)",
+                       conflicting_addresses)
+    cursor.execute("DROP TABLE IF EXISTS temp.device_types")
+    cursor.execute("CREATE TEMP TABLE device_types("
+                   "extendedaddr TEXT PRIMARY KEY, "
+                   "macdevtype TEXT, nwkdevtype TEXT)")
+    cursor.execute("INSERT INTO device_types "
+                   "SELECT extendedaddr, "
+                   "CASE WHEN COUNT(*)!=1 THEN \"Conflicting Data\" "
+                   "ELSE MAX(macdevtype) END, "
+                   "CASE WHEN COUNT(*)!=1 THEN \"Conflicting Data\" "
+                   "ELSE MAX(nwkdevtype) END "
+                   "FROM devices GROUP BY extendedaddr")
+    cursor.execute("DROP TABLE IF EXISTS temp.address_types")
+    cursor.execute("CREATE TEMP TABLE address_types("
+                   "shortaddr TEXT, panid TEXT, extendedaddr TEXT, "
+                   "nwkdevtype TEXT, PRIMARY KEY (panid, shortaddr))")
+    cursor.execute("INSERT INTO address_types "
+                   "SELECT shortaddr, panid, extendedaddr, "
+                   "CASE WHEN extendedaddr=\"Conflicting Data\" "
+                   "THEN \"Conflicting Data\" "
+                   "ELSE COALESCE((SELECT nwkdevtype FROM device_types "
+                   "WHERE device_types.extendedaddr=addrpans.extendedaddr), "
+                   "\"None\") END "
+                   "FROM (SELECT shortaddr, panid, "
+                   "CASE WHEN COUNT(*)!=1 THEN \"Conflicting Data\" "
+                   "ELSE MAX(extendedaddr) END AS extendedaddr "
+                   "FROM addresses GROUP BY panid, shortaddr) AS addrpans "
+                   "WHERE extendedaddr IS NOT NULL")
 
     # Check for conflicting device types
-    cursor.execute("SELECT DISTINCT extendedaddr FROM devices")
+    cursor.execute("SELECT extendedaddr, macdevtype, nwkdevtype "
+                   "FROM device_types "
+                   "WHERE macdevtype=\"Conflicting Data\" "
+                   "OR nwkdevtype=\"Conflicting Data\"")
     results = cursor.fetchall()
-    for result in results:
-        extendedaddr = result[0]
-        if get_macdevtype(extendedaddr=extendedaddr) == "Conflicting Data":
+    for extendedaddr, macdevtype, nwkdevtype in results:
+        if macdevtype == "Conflicting Data":
             logging.warning("Observed conflicting data regarding the "
                             "MAC device type of the device that uses "
                             "{} as its extended address".format(extendedaddr))
-
-        if get_nwkdevtype(extendedaddr=extendedaddr) == "Conflicting Data":
+        if nwkdevtype == "Conflicting Data":
             logging.warning("Observed conflicting data regarding the "
                             "NWK device type of the device that uses "
                             "{} as its extended address".format(extendedaddr))
-
-            # Update the "MAC Destination Type" column
-            update_columns = (
-                "der_mac_dsttype",
-            )
-            update_values = (
-                "MAC Dst Type: Conflicting Data",
-            )
-            conditions = (
-                ("error_msg", None),
-                ("mac_panidcomp",
-                    "The source PAN ID is the same as the destination PAN ID"),
-                ("mac_dstaddrmode", "Short destination MAC address"),
-                ("der_mac_dstextendedaddr", extendedaddr),
-                ("!der_mac_dsttype", "MAC Dst Type: Conflicting Data"),
-            )
-            update_table(update_columns, update_values, conditions)
-
-            # Update the "MAC Source Type" column
-            update_columns = (
-                "der_mac_srctype",
-            )
-            update_values = (
-                "MAC Src Type: Conflicting Data",
-            )
-            conditions = (
-                ("error_msg", None),
-                ("mac_panidcomp",
-                    "The source PAN ID is the same as the destination PAN ID"),
-                ("mac_srcaddrmode", "Short source MAC address"),
-                ("der_mac_srcextendedaddr", extendedaddr),
-                ("!der_mac_srctype", "MAC Src Type: Conflicting Data"),
-            )
-            update_table(update_columns, update_values, conditions)
-
-            # Update the "NWK Destination Type" column
-            update_columns = (
-                "der_nwk_dsttype",
-            )
-            update_values = (
-                "NWK Dst Type: Conflicting Data",
-            )
-            conditions = (
-                ("error_msg", None),
-                ("mac_panidcomp",
-                    "The source PAN ID is the same as the destination PAN ID"),
-                ("!nwk_dstshortaddr", None),
-                ("der_nwk_dstextendedaddr", extendedaddr),
-                ("!der_nwk_dsttype", "NWK Dst Type: Conflicting Data"),
-            )
-            update_table(update_columns, update_values, conditions)
-
-            # Update the "NWK Source Type" column
-            update_columns = (
-                "der_nwk_srctype",
-            )
-            update_values = (
-                "NWK Src Type: Conflicting Data",
-            )
-            conditions = (
-                ("error_msg", None),
-                ("mac_panidcomp",
-                    "The source PAN ID is the same as the destination PAN ID"),
-                ("!nwk_srcshortaddr", None),
-                ("der_nwk_srcextendedaddr", extendedaddr),
-                ("!der_nwk_srctype", "NWK Src Type: Conflicting Data"),
-            )
-            update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown MAC Destination Types
-    cursor.execute("SELECT DISTINCT der_mac_dstextendedaddr FROM packets "
-                   "WHERE der_mac_dsttype=\"MAC Dst Type: None\" "
-                   "AND der_mac_dstextendedaddr IS NOT NULL "
-                   "AND der_mac_dstextendedaddr!=\"Conflicting Data\"")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "MAC Destination Types..."
-                  "".format(len(results)))
-    for result in results:
-        extendedaddr = result[0]
-        cursor.execute("SELECT nwkdevtype FROM devices "
-                       "WHERE extendedaddr=?",
-                       tuple([extendedaddr]))
-        fetched_nwkdevtype = cursor.fetchall()
-        if len(fetched_nwkdevtype) == 0:
-            continue
-        elif len(fetched_nwkdevtype) != 1:
-            update_values = (
-                "MAC Dst Type: Conflicting Data",
-            )
-        else:
-            nwkdevtype = fetched_nwkdevtype[0][0]
-            if nwkdevtype is None:
-                continue
-            else:
-                update_values = (
-                    "MAC Dst Type: {}".format(nwkdevtype),
-                )
-        update_columns = (
-            "der_mac_dsttype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("mac_dstaddrmode", "Short destination MAC address"),
-            ("der_mac_dstextendedaddr", extendedaddr),
-            ("der_mac_dsttype", "MAC Dst Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown MAC Source Types
-    cursor.execute("SELECT DISTINCT der_mac_srcextendedaddr FROM packets "
-                   "WHERE der_mac_srctype=\"MAC Src Type: None\" "
-                   "AND der_mac_srcextendedaddr IS NOT NULL "
-                   "AND der_mac_srcextendedaddr!=\"Conflicting Data\"")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "MAC Source Types..."
-                  "".format(len(results)))
-    for result in results:
-        extendedaddr = result[0]
-        cursor.execute("SELECT nwkdevtype FROM devices "
-                       "WHERE extendedaddr=?",
-                       tuple([extendedaddr]))
-        fetched_nwkdevtype = cursor.fetchall()
-        if len(fetched_nwkdevtype) == 0:
-            continue
-        elif len(fetched_nwkdevtype) != 1:
-            update_values = (
-                "MAC Src Type: Conflicting Data",
-            )
-        else:
-            nwkdevtype = fetched_nwkdevtype[0][0]
-            if nwkdevtype is None:
-                continue
-            else:
-                update_values = (
-                    "MAC Src Type: {}".format(nwkdevtype),
-                )
-        update_columns = (
-            "der_mac_srctype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("mac_srcaddrmode", "Short source MAC address"),
-            ("der_mac_srcextendedaddr", extendedaddr),
-            ("der_mac_srctype", "MAC Src Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown NWK Destination Types
-    cursor.execute("SELECT DISTINCT der_nwk_dstextendedaddr FROM packets "
-                   "WHERE der_nwk_dsttype=\"NWK Dst Type: None\" "
-                   "AND der_nwk_dstextendedaddr IS NOT NULL "
-                   "AND der_nwk_dstextendedaddr!=\"Conflicting Data\"")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "NWK Destination Types..."
-                  "".format(len(results)))
-    for result in results:
-        extendedaddr = result[0]
-        cursor.execute("SELECT nwkdevtype FROM devices "
-                       "WHERE extendedaddr=?",
-                       tuple([extendedaddr]))
-        fetched_nwkdevtype = cursor.fetchall()
-        if len(fetched_nwkdevtype) == 0:
-            continue
-        elif len(fetched_nwkdevtype) != 1:
-            update_values = (
-                "NWK Dst Type: Conflicting Data",
-            )
-        else:
-            nwkdevtype = fetched_nwkdevtype[0][0]
-            if nwkdevtype is None:
-                continue
-            else:
-                update_values = (
-                    "NWK Dst Type: {}".format(nwkdevtype),
-                )
-        update_columns = (
-            "der_nwk_dsttype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("!nwk_dstshortaddr", None),
-            ("der_nwk_dstextendedaddr", extendedaddr),
-            ("der_nwk_dsttype", "NWK Dst Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
-
-    # Check for previously unknown NWK Source Types
-    cursor.execute("SELECT DISTINCT der_nwk_srcextendedaddr FROM packets "
-                   "WHERE der_nwk_srctype=\"NWK Src Type: None\" "
-                   "AND der_nwk_srcextendedaddr IS NOT NULL "
-                   "AND der_nwk_srcextendedaddr!=\"Conflicting Data\"")
-    results = cursor.fetchall()
-    logging.debug("Trying to identify {} previously unknown "
-                  "NWK Source Types..."
-                  "".format(len(results)))
-    for result in results:
-        extendedaddr = result[0]
-        cursor.execute("SELECT nwkdevtype FROM devices "
-                       "WHERE extendedaddr=?",
-                       tuple([extendedaddr]))
-        fetched_nwkdevtype = cursor.fetchall()
-        if len(fetched_nwkdevtype) == 0:
-            continue
-        elif len(fetched_nwkdevtype) != 1:
-            update_values = (
-                "NWK Src Type: Conflicting Data",
-            )
-        else:
-            nwkdevtype = fetched_nwkdevtype[0][0]
-            if nwkdevtype is None:
-                continue
-            else:
-                update_values = (
-                    "NWK Src Type: {}".format(nwkdevtype),
-                )
-        update_columns = (
-            "der_nwk_srctype",
-        )
-        conditions = (
-            ("error_msg", None),
-            ("mac_panidcomp",
-                "The source PAN ID is the same as the destination PAN ID"),
-            ("!nwk_srcshortaddr", None),
-            ("der_nwk_srcextendedaddr", extendedaddr),
-            ("der_nwk_srctype", "NWK Src Type: None"),
-        )
-        update_table(update_columns, update_values, conditions)
+    conflicting_types = any(nwkdevtype == "Conflicting Data"
+                            for _, _, nwkdevtype in results)
+
+    # Stage the converted packets that may be updated, which are the ones
+    # that satisfy the conditions of at least one update
+    tablename = "packets"
+    if is_converted():
+        updates = derived_updates(tablename,
+                                  len(conflicting_addresses) > 0,
+                                  conflicting_types)
+        checkout_pkts(" OR ".join("({})".format(update[2])
+                                  for update in updates),
+                      [value for update in updates for value in update[3]])
+        tablename = "packets_staged"
+
+    # Update the derived columns of the packets
+    for set_statement, set_values, where_statement, where_values, message \
+            in derived_updates(tablename,
+                               len(conflicting_addresses) > 0,
+                               conflicting_types):
+        cursor.execute("UPDATE {} SET {} WHERE {}".format(tablename,
+                                                          set_statement,
+                                                          where_statement),
+                       tuple(set_values + where_values))
+        if message is not None:
+            logging.debug("{} {} packets".format(message, cursor.rowcount))
+    if is_converted():
+        store_staged_pkts()
+
+    # Drop the temporary tables
+    cursor.execute("DROP TABLE conflicting_addresses")
+    cursor.execute("DROP TABLE device_types")
+    cursor.execute("DROP TABLE address_types")
 
 
 def disconnect():
@@ -19,6 +19,7 @@ Filesystem module for the zigator package
 """
 
 import csv
+import hashlib
 import logging
 import os
 import string
@@ -28,6 +29,10 @@ from pycrc.algorithms import Crc
 from . import crypto
 
 
+# The CRC algorithm of install codes
+install_code_crc = None
+
+
 def write_tsv(results, out_filepath):
     fp = open(out_filepath, "w")
     for row in results:
@@ -103,7 +108,7 @@ def load_enc_keys(filepath, optional=False):
     return loaded_keys
 
 
-def load_install_codes(filepath, optional=False):
+def load_install_codes(filepath, optional=False, cache_filepath=None):
     # Check whether an exception should be raised if the file does not exist
     if not os.path.isfile(filepath):
         if optional:
@@ -112,8 +117,20 @@ def load_install_codes(filepath, optional=False):
             raise ValueError("The provided file \"{}\" "
                              "does not exist".format(filepath))
 
+    # Use the cached install codes and derived link keys, unless the
+    # provided file was modified after they were cached
+    if cache_filepath is not None:
+        with open(filepath, "rb") as fp:
+            fingerprint = hashlib.sha256(fp.read()).hexdigest()
+        cached_results = load_install_code_cache(cache_filepath, fingerprint)
+        if cached_results is not None:
+            logging.debug("Loaded the install codes and their derived link "
+                          "keys from \"{}\"".format(cache_filepath))
+            return cached_results
+
     # Read the provided file line by line
     loaded_codes = {}
+    loaded_code_set = set()
     derived_keys = {}
     with open(filepath, "r") as fp:
         rows = csv.reader(fp, delimiter="\t")
@@ -160,7 +177,7 @@ def load_install_codes(filepath, optional=False):
                 continue
 
             # Make sure that this install code is not already loaded
-            if code_bytes in loaded_codes.values():
+            if code_bytes in loaded_code_set:
                 logging.warning("The install code {} appears "
                                 "more than once in \"{}\""
                                 "".format(code_bytes.hex(), filepath))
@@ -174,22 +191,81 @@ def load_install_codes(filepath, optional=False):
                                           loaded_codes[code_name].hex()))
             else:
                 loaded_codes[code_name] = code_bytes
+                loaded_code_set.add(code_bytes)
 
-                # Derive the link key and give it a unique name
-                key_bytes = crypto.zigbee_mmo_hash(code_bytes)
-                key_name = "_derived_{}".format(code_bytes.hex())
-                derived_keys[key_name] = key_bytes
-                logging.debug("Derived the link key {} from the install code "
-                              "{}".format(key_bytes.hex(), code_bytes.hex()))
+    # Derive the link keys and give them unique names
+    derived_bytes = crypto.zigbee_bulk_mmo_hash(loaded_codes.values())
+    for code_bytes, key_bytes in zip(loaded_codes.values(), derived_bytes):
+        key_name = "_derived_{}".format(code_bytes.hex())
+        derived_keys[key_name] = key_bytes
+        logging.debug("Derived the link key {} from the install code "
+                      "{}".format(key_bytes.hex(), code_bytes.hex()))
+
+    # Cache the install codes and their derived link keys
+    if cache_filepath is not None:
+        write_install_code_cache(cache_filepath, fingerprint,
+                                 loaded_codes, derived_keys)
 
     return loaded_codes, derived_keys
 
 
+def load_install_code_cache(cache_filepath, fingerprint):
+    if not os.path.isfile(cache_filepath):
+        return None
+
+    # The first line of the cache contains the fingerprint of the install
+    # codes file, while each subsequent line contains an install code,
+    # its name, and its derived link key
+    loaded_codes = {}
+    derived_keys = {}
+    with open(cache_filepath, "r") as fp:
+        rows = csv.reader(fp, delimiter="\t")
+        for i, row in enumerate(rows, start=1):
+            if i == 1:
+                if row != [fingerprint]:
+                    return None
+                continue
+            elif len(row) != 3:
+                logging.debug("Ignoring the malformed cache \"{}\""
+                              "".format(cache_filepath))
+                return None
+            try:
+                code_bytes = bytes.fromhex(row[0])
+                key_bytes = bytes.fromhex(row[2])
+            except ValueError:
+                logging.debug("Ignoring the malformed cache \"{}\""
+                              "".format(cache_filepath))
+                return None
+            loaded_codes[row[1]] = code_bytes
+            derived_keys["_derived_{}".format(code_bytes.hex())] = key_bytes
+
+    return loaded_codes, derived_keys
+
+
+def write_install_code_cache(cache_filepath, fingerprint, loaded_codes,
+                             derived_keys):
+    # Replace the previous cache only after the new one was written
+    tmp_filepath = "{}.tmp".format(cache_filepath)
+    with open(tmp_filepath, "w") as fp:
+        fp.write("{}\n".format(fingerprint))
+        for code_name in loaded_codes.keys():
+            code_hex = loaded_codes[code_name].hex()
+            fp.write("{}\t{}\t{}\n".format(
+                code_hex,
+                code_name,
+                derived_keys["_derived_{}".format(code_hex)].hex()))
+    os.replace(tmp_filepath, cache_filepath)
+
+
 def check_crc(code_bytes):
-    # Initialize the CRC algorithm
-    crc = Crc(width=16, poly=0x1021,
-              reflect_in=True, xor_in=0xffff,
-              reflect_out=True, xor_out=0xffff)
+    global install_code_crc
+
+    # Initialize the CRC algorithm only once, since its initialization
+    # is much more expensive than the computation of a CRC value
+    if install_code_crc is None:
+        install_code_crc = Crc(width=16, poly=0x1021,
+                               reflect_in=True, xor_in=0xffff,
+                               reflect_out=True, xor_out=0xffff)
 
     # Separate the 128-bit number from its CRC value
     received_number = code_bytes[0:16]
@@ -197,6 +273,6 @@ def check_crc(code_bytes):
                                   byteorder="little")
 
     # Compute the CRC value of the received number
-    computed_crc = crc.bit_by_bit_fast(received_number)
+    computed_crc = install_code_crc.table_driven(received_number)
 
     return computed_crc, received_crc
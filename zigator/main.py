@@ -61,10 +61,33 @@ def main(argv):
     elif args.subcommand == "rm-config-entry":
         config.rm_config_entry(args.ENTRY_TYPE,
                                args.ENTRY_NAME)
+    elif args.subcommand == "parse" and args.live:
+        parsing.live(args.PCAP_DIRECTORY,
+                     args.DATABASE_FILEPATH,
+                     args.batch_size,
+                     args.batch_interval,
+                     args.store_show,
+                     args.max_attempts)
     elif args.subcommand == "parse":
         parsing.main(args.PCAP_DIRECTORY,
                      args.DATABASE_FILEPATH,
-                     args.num_workers)
+                     args.num_workers,
+                     args.shards,
+                     args.store_show,
+                     args.max_attempts,
+                     args.incremental,
+                     args.hash_files,
+                     args.skip_split,
+                     args.bulk_load,
+                     args.encode_columns,
+                     args.partition_layers)
+    elif args.subcommand == "show":
+        parsing.show(args.DATABASE_FILEPATH,
+                     args.PCAP_FILENAME,
+                     args.PKT_NUM)
+    elif args.subcommand == "index":
+        parsing.index(args.DATABASE_FILEPATH,
+                      args.drop)
     elif args.subcommand == "analyze":
         analysis.main(args.DATABASE_FILEPATH,
                       args.OUTPUT_DIRECTORY,
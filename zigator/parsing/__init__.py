@@ -18,7 +18,10 @@
 Collection of parsing modules for the zigator package
 """
 
+from .indexing import index
+from .live import live
 from .main import main
+from .show import show
 
 
-__all__ = ["main"]
+__all__ = ["index", "live", "main", "show"]
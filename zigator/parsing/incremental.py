@@ -0,0 +1,147 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import logging
+import os
+
+from .. import config
+from .derive_info import derive_info
+
+
+# Columns that are not required to derive information from stored packets
+UNDERIVED_COLUMNS = set([
+    "pkt_bytes",
+    "pkt_linktype",
+    "pkt_show",
+    "nwk_aux_decpayload",
+    "nwk_aux_decshow",
+    "aps_aux_decpayload",
+    "aps_aux_decshow",
+])
+
+
+def fingerprint_file(filepath, hash_files):
+    # The size and the modification time of a file are always recorded,
+    # while its SHA-256 digest is computed only if requested
+    file_stat = os.stat(filepath)
+    fingerprint = {
+        "size": file_stat.st_size,
+        "mtime": file_stat.st_mtime_ns,
+        "sha256": None,
+    }
+    if hash_files:
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1048576), b""):
+                digest.update(chunk)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def file_changed(fingerprint, stored_fingerprint):
+    if stored_fingerprint is None:
+        return True
+    elif fingerprint["size"] != stored_fingerprint["size"]:
+        return True
+    elif (fingerprint["sha256"] is not None
+            and stored_fingerprint["sha256"] is not None):
+        # The modification time is ignored if the digests can be compared
+        return fingerprint["sha256"] != stored_fingerprint["sha256"]
+    else:
+        return fingerprint["mtime"] != stored_fingerprint["mtime"]
+
+
+def fingerprint_files(filepaths, hash_files):
+    files = {}
+    for filepath in filepaths:
+        head, tail = os.path.split(os.path.abspath(filepath))
+        files[(head, tail)] = fingerprint_file(filepath, hash_files)
+    return files
+
+
+def select_files(filepaths, files, stored_files):
+    """Return the new and the modified pcap files.
+
+    The packets of the modified pcap files are removed from the database.
+    """
+    new_filepaths = []
+    modified_filepaths = []
+    for filepath in filepaths:
+        head, tail = os.path.split(os.path.abspath(filepath))
+        if (head, tail) not in stored_files.keys():
+            new_filepaths.append(filepath)
+        elif file_changed(files[(head, tail)], stored_files[(head, tail)]):
+            config.db.remove_pcap_pkts(head, tail)
+            modified_filepaths.append(filepath)
+        elif files[(head, tail)]["sha256"] is None:
+            # Keep the digest of an unchanged file from a previous run
+            files[(head, tail)]["sha256"] = (
+                stored_files[(head, tail)]["sha256"]
+            )
+    return new_filepaths, modified_filepaths
+
+
+def restore_sniffed_keys():
+    # Sniffed keys are stored only in the packets that transported them
+    stored_keys = config.db.fetch_values(
+        ["pcap_directory",
+         "pcap_filename",
+         "pkt_num",
+         "aps_transportkey_stdkeytype",
+         "aps_transportkey_key"],
+        [("!aps_transportkey_key", None)],
+        False)
+    for pcap_directory, pcap_filename, pkt_num, stdkeytype, key_hex in sorted(
+            stored_keys):
+        if stdkeytype == "Standard Network Key":
+            key_type = "network"
+        else:
+            key_type = "link"
+        key_name = "_sniffed_{}_{}".format(
+            os.path.join(pcap_directory, pcap_filename), pkt_num)
+        config.add_sniffed_key(bytes.fromhex(key_hex), key_type, key_name)
+
+
+def restore_derived_info(rederive):
+    """Restore the derived information of the stored packets.
+
+    The derived information is loaded from the stored tables, unless
+    some stored packets were removed, in which case it is derived again
+    from the remaining stored packets.
+    """
+    restore_sniffed_keys()
+    if not rederive:
+        config.networks = config.db.load_networks()
+        config.devices = config.db.load_devices()
+        config.addresses = config.db.load_addresses()
+        config.pairs = config.db.load_pairs()
+        for (shortaddr, panid), extendedaddr in config.addresses.items():
+            if extendedaddr != "Conflicting Data":
+                config.update_address_history(shortaddr, panid, extendedaddr)
+        return
+
+    logging.info("Deriving information from the stored packets...")
+    selected_columns = [column_name
+                        for column_name in config.db.PKT_COLUMN_NAMES
+                        if column_name not in UNDERIVED_COLUMNS]
+    for values in config.db.iterate_values(selected_columns):
+        config.reset_entries()
+        for column_name, value in zip(selected_columns, values):
+            config.entry[column_name] = value
+        if config.entry["error_msg"] is None:
+            derive_info()
+    config.reset_entries()
@@ -0,0 +1,46 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+
+from .. import config
+
+
+def index(db_filepath, drop=False):
+    """Create or drop the declared indexes of a database file."""
+    # Sanity checks
+    if not os.path.isfile(db_filepath):
+        raise ValueError("The provided database file \"{}\" "
+                         "does not exist".format(db_filepath))
+    config.db.connect(db_filepath)
+    if not (config.db.table_exists("packets") or config.db.is_converted()):
+        config.db.disconnect()
+        raise ValueError("The provided database file \"{}\" "
+                         "does not have a packets table".format(db_filepath))
+
+    if drop:
+        config.db.drop_indexes()
+        config.db.commit()
+        logging.info("Dropped the indexes of the \"{}\" database"
+                     "".format(db_filepath))
+    else:
+        config.db.create_indexes()
+        config.db.analyze()
+        config.db.commit()
+        logging.info("Indexed the \"{}\" database and refreshed its "
+                     "statistics".format(db_filepath))
+    config.db.disconnect()
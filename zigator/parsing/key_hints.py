@@ -0,0 +1,143 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import itertools
+
+from .. import config
+
+
+# Maximum number of candidate pairs of source address and key that are
+# tried in a batch
+DEC_BATCH_SIZE = 64
+
+# The key that last verified a payload for each combination of key type,
+# extended source address, PAN ID, and key sequence number
+hints = {}
+
+# The extended address of the source that last verified a payload for
+# each combination of short address and PAN ID
+recent_sources = {}
+
+# Candidates that were suggested by the hints for the current payload
+hinted_candidates = set()
+
+# Counters of the current worker
+hits = 0
+misses = 0
+attempts = 0
+
+
+def ranked_sources(shortaddr, panid):
+    """Return the extended addresses of the potential sources in order.
+
+    The source that last verified a payload from the same short address
+    is ranked first, followed by the extended addresses that used that
+    short address in that PAN, starting with the most recent one, the
+    other devices of that PAN, and finally all the other known devices.
+    """
+    ranked = []
+    ranked_set = set()
+    history = config.address_history.get((shortaddr, panid), [])
+    pan_devices = config.pan_addresses.get(panid, {})
+    for extendedaddr in itertools.chain(
+            [recent_sources.get((shortaddr, panid))],
+            reversed(history),
+            pan_devices.keys(),
+            config.devices.keys()):
+        if (config.max_dec_attempts is not None
+                and len(ranked) >= config.max_dec_attempts):
+            break
+        elif extendedaddr in {None, "Conflicting Data"}:
+            continue
+        source_addr = int(extendedaddr, 16)
+        if source_addr not in ranked_set:
+            ranked.append(source_addr)
+            ranked_set.add(source_addr)
+    return ranked
+
+
+def add_source(potential_sources, extendedaddr):
+    # Rank a source address that was observed in the packet first
+    source_addr = int(extendedaddr, 16)
+    if source_addr in potential_sources:
+        potential_sources.remove(source_addr)
+    potential_sources.insert(0, source_addr)
+
+
+def candidate_batches(keytype, potential_sources, potential_keys, panid,
+                      key_seqnum):
+    """Yield batches of potential pairs of source address and key.
+
+    The pairs that the hints suggest are yielded first in a batch of
+    their own, followed by batches of the remaining pairs in their
+    original order, until the maximum number of decryption attempts
+    for a payload is reached.
+    """
+    global hinted_candidates
+    global attempts
+
+    potential_keys = list(potential_keys)
+    hinted_candidates = set()
+    ranked_candidates = []
+    for source_addr in potential_sources:
+        key = hints.get((keytype, source_addr, panid, key_seqnum))
+        if key is not None and key in potential_keys:
+            hinted_candidates.add((source_addr, key))
+            ranked_candidates.append((source_addr, key))
+    batch_size = len(ranked_candidates)
+    ranked_candidates = itertools.islice(
+        itertools.chain(
+            ranked_candidates,
+            ((source_addr, key)
+             for source_addr in potential_sources
+             for key in potential_keys
+             if (source_addr, key) not in hinted_candidates)),
+        config.max_dec_attempts)
+
+    while True:
+        batch = list(itertools.islice(ranked_candidates,
+                                      batch_size or DEC_BATCH_SIZE))
+        if len(batch) == 0:
+            return
+        attempts += len(batch)
+        yield batch
+        batch_size = DEC_BATCH_SIZE
+
+
+def verified(keytype, source_addr, shortaddr, panid, key_seqnum, key):
+    global hits
+    global misses
+
+    # Remember the source that verified a payload from this short address
+    if shortaddr is not None:
+        recent_sources[(shortaddr, panid)] = format(source_addr, "016x")
+
+    # Remember the key that verified the payload of this source
+    if (source_addr, key) in hinted_candidates:
+        hits += 1
+    else:
+        misses += 1
+        hints[(keytype, source_addr, panid, key_seqnum)] = key
+
+
+def unverified():
+    global misses
+
+    misses += 1
+
+
+def counters():
+    return hits, misses, attempts
@@ -0,0 +1,54 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+from operator import attrgetter
+
+from .. import config
+
+
+def compile_spec(fields):
+    """Compile the declarative specification of some enumerated fields.
+
+    Each field is specified as a tuple of its column name, its Scapy
+    attribute, its bit offset and bit length within the raw bytes of the
+    header that contains it, its names dictionary, and the name of its
+    unknown values. The names dictionary of each field is replaced with
+    a tuple that is indexed by each value that the field can take.
+    """
+    spec = []
+    for column, attribute, bit_offset, bit_length, names, unknown in fields:
+        table = tuple(names.get(value, unknown)
+                      for value in range(2**bit_length))
+        spec.append((column, attrgetter(attribute), bit_offset,
+                     2**bit_length - 1, table, unknown))
+    return tuple(spec)
+
+
+def decode_layer(layer, spec):
+    """Decode the enumerated fields of a layer that Scapy dissected."""
+    entry = config.entry
+    for column, getter, _, _, table, unknown in spec:
+        try:
+            entry[column] = table[getter(layer)]
+        except (IndexError, TypeError):
+            entry[column] = unknown
+
+
+def decode_bits(value, spec):
+    """Decode the enumerated fields of an integer from the raw bytes."""
+    entry = config.entry
+    for column, _, bit_offset, mask, table, _ in spec:
+        entry[column] = table[(value >> bit_offset) & mask]
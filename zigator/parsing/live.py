@@ -0,0 +1,295 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+import queue
+import signal
+import socket
+import stat
+import threading
+import time
+
+from scapy.all import conf
+
+from .. import config
+from . import incremental as inc
+from .main import set_parsing_options
+from .pcap_file import DLT_IEEE802_15_4_WITHFCS
+from .pcap_file import dissect_pkt
+from .pcap_file import parse_pkt
+from .pcap_reader import capture_stream
+from .redecryption import log_msgs
+
+
+# Default IP address of the UDP socket, matching that of the inject command
+DEFAULT_IPADDR = "127.0.0.1"
+
+# Maximum size of each received UDP datagram
+MAX_DATAGRAM_SIZE = 65535
+
+# Maximum number of seconds to wait for a packet before checking whether
+# the parsing should stop
+POLL_INTERVAL = 0.5
+
+# Minimum number of seconds between logged throughput and latency reports
+REPORT_INTERVAL = 10.0
+
+
+def receive_datagrams(sock, frame_queue):
+    # Each datagram is expected to contain a packet with its FCS field
+    while True:
+        raw, _ = sock.recvfrom(MAX_DATAGRAM_SIZE)
+        frame_queue.put((time.perf_counter(), DLT_IEEE802_15_4_WITHFCS,
+                         time.time(), raw))
+
+
+def read_records(capture_records, frame_queue):
+    # The end of the stream is signaled with a None object
+    for linktype, pkt_time, raw in capture_records:
+        frame_queue.put((time.perf_counter(), linktype, pkt_time, raw))
+    frame_queue.put(None)
+
+
+def open_source(source, frame_queue, msg_queue):
+    """Return the label and the reader of a live source.
+
+    The source is either a UDP socket, specified as "udp:PORTNUM" or
+    "udp:IPADDR:PORTNUM", or the path of a named pipe that streams
+    pcap or pcapng records.
+    """
+    if source.startswith("udp:"):
+        ipaddr, _, portnum = source[4:].rpartition(":")
+        if len(ipaddr) == 0:
+            ipaddr = DEFAULT_IPADDR
+        try:
+            portnum = int(portnum)
+        except ValueError:
+            raise ValueError("Invalid port number in the \"{}\" live source"
+                             "".format(source))
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((ipaddr, portnum))
+        reader = threading.Thread(target=receive_datagrams,
+                                  args=(sock, frame_queue),
+                                  daemon=True)
+        label = "udp:{}:{}".format(ipaddr, portnum)
+        return label, reader
+    elif os.path.exists(source) and stat.S_ISFIFO(os.stat(source).st_mode):
+        logging.info("Waiting for a pcap stream from the \"{}\" named pipe..."
+                     "".format(source))
+        fp = open(source, "rb")
+        try:
+            capture_records = capture_stream(fp, source, msg_queue)
+        except ValueError:
+            fp.close()
+            raise
+        reader = threading.Thread(target=read_records,
+                                  args=(capture_records, frame_queue),
+                                  daemon=True)
+        return os.path.abspath(source), reader
+    else:
+        raise ValueError("The provided live source \"{}\" is neither a UDP "
+                         "socket nor a named pipe".format(source))
+
+
+def commit_pkts(pkt_rows, recv_clocks, stats):
+    # Commit a batch of parsed packets and record their latencies
+    config.db.insert_pkts(pkt_rows)
+    config.db.store_networks(config.networks)
+    config.db.store_devices(config.devices)
+    config.db.store_addresses(config.addresses)
+    config.db.store_pairs(config.pairs)
+    config.db.commit()
+    commit_clock = time.perf_counter()
+    for recv_clock in recv_clocks:
+        latency = commit_clock - recv_clock
+        stats["latency_sum"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+    stats["committed_pkts"] += len(pkt_rows)
+    del pkt_rows[:]
+    del recv_clocks[:]
+
+
+def report_stats(stats, elapsed_time):
+    num_pkts = stats["committed_pkts"]
+    if num_pkts == 0:
+        logging.info("No packets were received in the last {:.1f} seconds"
+                     "".format(elapsed_time))
+        return
+    logging.info("Committed {} packets in {:.1f} seconds "
+                 "({:.1f} packets per second), with a mean latency of "
+                 "{:.2f} ms, a maximum latency of {:.2f} ms, and a mean "
+                 "parsing time of {:.2f} ms"
+                 "".format(num_pkts,
+                           elapsed_time,
+                           num_pkts / elapsed_time,
+                           1000.0 * stats["latency_sum"] / num_pkts,
+                           1000.0 * stats["latency_max"],
+                           1000.0 * stats["parsing_time"] / num_pkts))
+
+
+def reset_stats(stats):
+    stats["committed_pkts"] = 0
+    stats["latency_sum"] = 0.0
+    stats["latency_max"] = 0.0
+    stats["parsing_time"] = 0.0
+
+
+def merge_stats(total_stats, interval_stats):
+    for key in total_stats.keys():
+        if key == "latency_max":
+            total_stats[key] = max(total_stats[key], interval_stats[key])
+        else:
+            total_stats[key] += interval_stats[key]
+    reset_stats(interval_stats)
+
+
+def live(source, db_filepath, batch_size=1000, batch_interval=1.0,
+         store_show=False, max_attempts=None):
+    """Parse the packets of a live source as they are received.
+
+    The parsed packets are committed to the database in batches, once
+    either the batch size or the batch interval is reached, until the
+    stream of a named pipe ends or the user interrupts the parsing.
+    """
+    # Sanity checks
+    if batch_size < 1:
+        raise ValueError("The batch size should be a positive integer")
+    if batch_interval <= 0:
+        raise ValueError("The batch interval should be a positive number")
+
+    # Append the received packets to the database, if it already exists,
+    # in the storage form of its packets
+    config.db.connect(db_filepath)
+    if config.db.table_exists("packets") or config.db.is_converted():
+        inc.restore_derived_info(False)
+    else:
+        config.db.create_table("packets")
+        config.db.commit()
+    set_parsing_options(store_show, max_attempts)
+    init_network_keys = len(config.network_keys)
+    init_link_keys = len(config.link_keys)
+
+    # Start reading packets from the live source
+    msg_queue = queue.Queue()
+    frame_queue = queue.Queue()
+    label, reader = open_source(source, frame_queue, msg_queue)
+    pkt_classes = {}
+    config.reset_entries()
+    config.entry["pcap_directory"] = label
+    config.entry["pcap_filename"] = time.strftime("live-%Y%m%d-%H%M%S")
+    config.entry["pkt_num"] = 0
+    reader.start()
+    logging.info("Parsing packets from the \"{}\" live source, which will "
+                 "be stored with the \"{}\" filename..."
+                 "".format(label, config.entry["pcap_filename"]))
+
+    pkt_rows = []
+    recv_clocks = []
+    interval_stats = {}
+    total_stats = {}
+    reset_stats(interval_stats)
+    reset_stats(total_stats)
+    start_clock = time.perf_counter()
+    commit_clock = start_clock
+    report_clock = start_clock
+
+    # Stop only between packets when the user interrupts the parsing
+    stop_event = threading.Event()
+    prev_handler = signal.signal(signal.SIGINT,
+                                 lambda signum, frame: stop_event.set())
+    while not stop_event.is_set():
+        # Wait for a packet at most until the end of the batch interval
+        try:
+            frame = frame_queue.get(
+                timeout=min(POLL_INTERVAL,
+                            max(0.0, commit_clock + batch_interval
+                                - time.perf_counter())))
+        except queue.Empty:
+            frame = False
+        if frame is None:
+            break
+        elif frame is not False:
+            recv_clock, linktype, pkt_time, raw = frame
+            parse_clock = time.perf_counter()
+            if linktype not in pkt_classes.keys():
+                pkt_classes[linktype] = conf.l2types.get(linktype,
+                                                         conf.raw_layer)
+            pkt_class = pkt_classes[linktype]
+
+            # Collect some data about the packet
+            config.entry["pkt_num"] += 1
+            config.entry["pkt_time"] = pkt_time
+            config.entry["pkt_bytes"] = bytes(raw)
+            config.entry["pkt_linktype"] = linktype
+            if config.store_show:
+                pkt = dissect_pkt(pkt_class, raw)
+                config.entry["pkt_show"] = pkt.show(dump=True)
+            else:
+                pkt = None
+
+            # Collect more data about the packet from the PHY layer
+            # and onward
+            parse_pkt(linktype, pkt_class, raw, pkt, msg_queue)
+            pkt_rows.append(config.entry_row())
+            recv_clocks.append(recv_clock)
+            interval_stats["parsing_time"] += (
+                time.perf_counter() - parse_clock
+            )
+            config.reset_entries(keep=["pcap_directory",
+                                       "pcap_filename",
+                                       "pkt_num"])
+        log_msgs(msg_queue)
+
+        # Commit the batch once its size or interval is reached
+        current_clock = time.perf_counter()
+        if (len(pkt_rows) >= batch_size
+                or current_clock - commit_clock >= batch_interval):
+            if len(pkt_rows) > 0:
+                commit_pkts(pkt_rows, recv_clocks, interval_stats)
+            commit_clock = time.perf_counter()
+        if current_clock - report_clock >= REPORT_INTERVAL:
+            report_stats(interval_stats, current_clock - report_clock)
+            merge_stats(total_stats, interval_stats)
+            report_clock = current_clock
+    signal.signal(signal.SIGINT, prev_handler)
+    if stop_event.is_set():
+        logging.info("Stopped receiving packets from the \"{}\" live source"
+                     "".format(label))
+
+    # Commit the remaining packets
+    log_msgs(msg_queue)
+    if len(pkt_rows) > 0:
+        commit_pkts(pkt_rows, recv_clocks, interval_stats)
+    merge_stats(total_stats, interval_stats)
+    logging.info("Parsed {} packets from the \"{}\" live source"
+                 "".format(config.entry["pkt_num"], label))
+    report_stats(total_stats, time.perf_counter() - start_clock)
+    logging.info("Sniffed {} previously unknown network keys"
+                 "".format(len(config.network_keys) - init_network_keys))
+    logging.info("Sniffed {} previously unknown link keys"
+                 "".format(len(config.link_keys) - init_link_keys))
+
+    # Update the packets table using the derived information
+    logging.info("Updating the database...")
+    config.db.create_indexes()
+    config.db.update_packets()
+    config.db.analyze()
+    config.db.commit()
+    logging.info("Finished updating the database")
+
+    # Disconnection from the database
+    config.db.disconnect()
@@ -31,219 +31,224 @@ from scapy.all import ZigBeeBeacon
 from scapy.all import ZigbeeNWK
 
 from .. import config
+from .layer_spec import compile_spec
+from .layer_spec import decode_layer
 from .nwk_fields import nwk_fields
 
 
-def get_mac_frametype(pkt):
-    mac_frametypes = {
-        0: "MAC Beacon",
-        1: "MAC Data",
-        2: "MAC Acknowledgment",
-        3: "MAC Command"
-    }
-    frametype_id = pkt[Dot15d4FCS].fcf_frametype
-    return mac_frametypes.get(frametype_id, "Unknown MAC frame type")
-
-
-def get_mac_security(pkt):
-    mac_security_states = {
-        0: "MAC Security Disabled",
-        1: "MAC Security Enabled"
-    }
-    sec_state = pkt[Dot15d4FCS].fcf_security
-    return mac_security_states.get(sec_state, "Unknown MAC security state")
-
-
-def get_mac_framepending(pkt):
-    mac_framepending_states = {
-        0: "No additional packets are pending for the receiver",
-        1: "Additional packets are pending for the receiver"
-    }
-    fp_state = pkt[Dot15d4FCS].fcf_pending
-    return mac_framepending_states.get(fp_state, "Unknown MAC FP state")
-
-
-def get_mac_ackreq(pkt):
-    mac_ackreq_states = {
-        0: "The sender does not request a MAC Acknowledgment",
-        1: "The sender requests a MAC Acknowledgment"
-    }
-    ar_state = pkt[Dot15d4FCS].fcf_ackreq
-    return mac_ackreq_states.get(ar_state, "Unknown MAC AR state")
-
-
-def get_mac_panidcomp(pkt):
-    mac_panidcomp_states = {
-        0: "Do not compress the source PAN ID",
-        1: "The source PAN ID is the same as the destination PAN ID"
-    }
-    pc_state = pkt[Dot15d4FCS].fcf_panidcompress
-    return mac_panidcomp_states.get(pc_state, "Unknown MAC PC state")
-
-
-def get_mac_dstaddrmode(pkt):
-    mac_dstaddr_modes = {
-        0: "No destination MAC address",
-        2: "Short destination MAC address",
-        3: "Extended destination MAC address"
-    }
-    dstaddr_mode = pkt[Dot15d4FCS].fcf_destaddrmode
-    return mac_dstaddr_modes.get(dstaddr_mode, "Unknown MAC DA mode")
-
-
-def get_mac_frameversion(pkt):
-    mac_frame_versions = {
-        0: "IEEE 802.15.4-2003 Frame Version",
-        1: "IEEE 802.15.4-2006 Frame Version",
-        2: "IEEE 802.15.4-2015 Frame Version"
-    }
-    fv_id = pkt[Dot15d4FCS].fcf_framever
-    return mac_frame_versions.get(fv_id, "Unknown MAC frame version")
-
-
-def get_mac_srcaddrmode(pkt):
-    mac_srcaddr_modes = {
-        0: "No source MAC address",
-        2: "Short source MAC address",
-        3: "Extended source MAC address"
-    }
-    srcaddr_mode = pkt[Dot15d4FCS].fcf_srcaddrmode
-    return mac_srcaddr_modes.get(srcaddr_mode, "Unknown MAC SA mode")
-
-
-def get_mac_command(pkt):
-    mac_commands = {
-        1: "MAC Association Request",
-        2: "MAC Association Response",
-        3: "MAC Disassociation Notification",
-        4: "MAC Data Request",
-        5: "MAC PAN ID Conflict Notification",
-        6: "MAC Orphan Notification",
-        7: "MAC Beacon Request",
-        8: "MAC Coordinator Realignment",
-        9: "MAC GTS Request"
-    }
-    command_id = pkt[Dot15d4Cmd].cmd_id
-    return mac_commands.get(command_id, "Unknown MAC Command")
-
-
-def get_mac_assocreq_apc(pkt):
-    apc_states = {
-        0: "The sender is not capable of becoming a PAN coordinator",
-        1: "The sender is capable of becoming a PAN coordinator"
-    }
-    apc_state = pkt[Dot15d4CmdAssocReq].alternate_pan_coordinator
-    return apc_states.get(apc_state, "Unknown APC state")
-
-
-def get_mac_assocreq_devtype(pkt):
-    device_types = {
-        0: "Reduced-Function Device",
-        1: "Full-Function Device"
-    }
-    devtype_id = pkt[Dot15d4CmdAssocReq].device_type
-    return device_types.get(devtype_id, "Unknown device type")
-
-
-def get_mac_assocreq_powsrc(pkt):
-    power_sources = {
-        0: "The sender is not a mains-powered device",
-        1: "The sender is a mains-powered device"
-    }
-    pwrsrc_id = pkt[Dot15d4CmdAssocReq].power_source
-    return power_sources.get(pwrsrc_id, "Unknown power source")
-
-
-def get_mac_assocreq_rxidle(pkt):
-    rxidle_states = {
-        0: "Disables the receiver to conserve power when idle",
-        1: "Does not disable the receiver to conserve power"
-    }
-    rxidle_state = pkt[Dot15d4CmdAssocReq].receiver_on_when_idle
-    return rxidle_states.get(rxidle_state, "Unknown RX state when idle")
-
-
-def get_mac_assocreq_seccap(pkt):
-    seccap_states = {
-        0: "Cannot transmit and receive secure MAC frames",
-        1: "Can transmit and receive secure MAC frames"
-    }
-    seccap_state = pkt[Dot15d4CmdAssocReq].security_capability
-    return seccap_states.get(seccap_state, "Unknown MAC security capacity")
-
-
-def get_mac_assocreq_allocaddr(pkt):
-    allocaddr_states = {
-        0: "Does not request a short address",
-        1: "Requests a short address"
-    }
-    allocaddr_state = pkt[Dot15d4CmdAssocReq].allocate_address
-    return allocaddr_states.get(allocaddr_state, "Unknown address allocation")
-
-
-def get_mac_assocrsp_status(pkt):
-    assoc_statuses = {
-        0: "Association successful",
-        1: "PAN at capacity",
-        2: "PAN access denied"
-    }
-    assoc_status = pkt[Dot15d4CmdAssocResp].association_status
-    return assoc_statuses.get(assoc_status, "Unknown association status")
-
-
-def get_mac_disassoc_reason(pkt):
-    disassoc_reasons = {
-        1: "The coordinator wishes the device to leave the PAN",
-        2: "The device wishes to leave the PAN"
-    }
-    reason_id = pkt[Dot15d4CmdDisassociation].disassociation_reason
-    return disassoc_reasons.get(reason_id, "Unknown disassociation reason")
-
-
-def get_mac_gtsreq_dir(pkt):
-    gts_direction = {
-        0: "Transmit-Only GTS",
-        1: "Receive-Only GTS"
-    }
-    dir_id = pkt[Dot15d4CmdGTSReq].gts_dir
-    return gts_direction.get(dir_id, "Unknown GTS direction")
-
-
-def get_mac_gtsreq_chartype(pkt):
-    charact_types = {
-        0: "GTS Deallocation",
-        1: "GTS Allocation"
-    }
-    chartype_id = pkt[Dot15d4CmdGTSReq].charact_type
-    return charact_types.get(chartype_id, "Unknown GTS characteristics type")
-
-
-def get_mac_beacon_pancoord(pkt):
-    panc_states = {
-        0: "The sender is not the PAN coordinator",
-        1: "The sender is the PAN coordinator"
-    }
-    panc_state = pkt[Dot15d4Beacon].sf_pancoord
-    return panc_states.get(panc_state, "Unknown PAN coordinator state")
-
-
-def get_mac_beacon_assocpermit(pkt):
-    assocp_states = {
-        0: "The sender is currently not accepting association requests",
-        1: "The sender is currently accepting association requests"
-    }
-    assocp_state = pkt[Dot15d4Beacon].sf_assocpermit
-    return assocp_states.get(assocp_state, "Unknown Association Permit state")
+MAC_FRAMETYPE_NAMES = {
+    0: "MAC Beacon",
+    1: "MAC Data",
+    2: "MAC Acknowledgment",
+    3: "MAC Command"
+}
+
+
+MAC_SECURITY_NAMES = {
+    0: "MAC Security Disabled",
+    1: "MAC Security Enabled"
+}
+
+
+MAC_FRAMEPENDING_NAMES = {
+    0: "No additional packets are pending for the receiver",
+    1: "Additional packets are pending for the receiver"
+}
+
+
+MAC_ACKREQ_NAMES = {
+    0: "The sender does not request a MAC Acknowledgment",
+    1: "The sender requests a MAC Acknowledgment"
+}
+
+
+MAC_PANIDCOMP_NAMES = {
+    0: "Do not compress the source PAN ID",
+    1: "The source PAN ID is the same as the destination PAN ID"
+}
+
+
+MAC_DSTADDRMODE_NAMES = {
+    0: "No destination MAC address",
+    2: "Short destination MAC address",
+    3: "Extended destination MAC address"
+}
+
+
+MAC_FRAMEVERSION_NAMES = {
+    0: "IEEE 802.15.4-2003 Frame Version",
+    1: "IEEE 802.15.4-2006 Frame Version",
+    2: "IEEE 802.15.4-2015 Frame Version"
+}
+
+
+MAC_SRCADDRMODE_NAMES = {
+    0: "No source MAC address",
+    2: "Short source MAC address",
+    3: "Extended source MAC address"
+}
+
+
+MAC_COMMAND_NAMES = {
+    1: "MAC Association Request",
+    2: "MAC Association Response",
+    3: "MAC Disassociation Notification",
+    4: "MAC Data Request",
+    5: "MAC PAN ID Conflict Notification",
+    6: "MAC Orphan Notification",
+    7: "MAC Beacon Request",
+    8: "MAC Coordinator Realignment",
+    9: "MAC GTS Request"
+}
+
+
+MAC_ASSOCREQ_APC_NAMES = {
+    0: "The sender is not capable of becoming a PAN coordinator",
+    1: "The sender is capable of becoming a PAN coordinator"
+}
+
+
+MAC_ASSOCREQ_DEVTYPE_NAMES = {
+    0: "Reduced-Function Device",
+    1: "Full-Function Device"
+}
+
+
+MAC_ASSOCREQ_POWSRC_NAMES = {
+    0: "The sender is not a mains-powered device",
+    1: "The sender is a mains-powered device"
+}
+
+
+MAC_ASSOCREQ_RXIDLE_NAMES = {
+    0: "Disables the receiver to conserve power when idle",
+    1: "Does not disable the receiver to conserve power"
+}
+
+
+MAC_ASSOCREQ_SECCAP_NAMES = {
+    0: "Cannot transmit and receive secure MAC frames",
+    1: "Can transmit and receive secure MAC frames"
+}
+
+
+MAC_ASSOCREQ_ALLOCADDR_NAMES = {
+    0: "Does not request a short address",
+    1: "Requests a short address"
+}
+
+
+MAC_ASSOCRSP_STATUS_NAMES = {
+    0: "Association successful",
+    1: "PAN at capacity",
+    2: "PAN access denied"
+}
+
+
+MAC_DISASSOC_REASON_NAMES = {
+    1: "The coordinator wishes the device to leave the PAN",
+    2: "The device wishes to leave the PAN"
+}
+
+
+MAC_GTSREQ_DIR_NAMES = {
+    0: "Transmit-Only GTS",
+    1: "Receive-Only GTS"
+}
+
+
+MAC_GTSREQ_CHARTYPE_NAMES = {
+    0: "GTS Deallocation",
+    1: "GTS Allocation"
+}
+
+
+MAC_BEACON_PANCOORD_NAMES = {
+    0: "The sender is not the PAN coordinator",
+    1: "The sender is the PAN coordinator"
+}
+
+
+MAC_BEACON_ASSOCPERMIT_NAMES = {
+    0: "The sender is currently not accepting association requests",
+    1: "The sender is currently accepting association requests"
+}
+
+
+# Enumerated fields of the Frame Control field (2 bytes)
+MAC_FCF_SPEC = compile_spec((
+    ("mac_frametype", "fcf_frametype", 0, 3,
+     MAC_FRAMETYPE_NAMES, "Unknown MAC frame type"),
+    ("mac_security", "fcf_security", 3, 1,
+     MAC_SECURITY_NAMES, "Unknown MAC security state"),
+    ("mac_framepending", "fcf_pending", 4, 1,
+     MAC_FRAMEPENDING_NAMES, "Unknown MAC FP state"),
+    ("mac_ackreq", "fcf_ackreq", 5, 1,
+     MAC_ACKREQ_NAMES, "Unknown MAC AR state"),
+    ("mac_panidcomp", "fcf_panidcompress", 6, 1,
+     MAC_PANIDCOMP_NAMES, "Unknown MAC PC state"),
+    ("mac_dstaddrmode", "fcf_destaddrmode", 10, 2,
+     MAC_DSTADDRMODE_NAMES, "Unknown MAC DA mode"),
+    ("mac_frameversion", "fcf_framever", 12, 2,
+     MAC_FRAMEVERSION_NAMES, "Unknown MAC frame version"),
+    ("mac_srcaddrmode", "fcf_srcaddrmode", 14, 2,
+     MAC_SRCADDRMODE_NAMES, "Unknown MAC SA mode"),
+))
+
+# Enumerated fields of the Command Identifier field (1 byte)
+MAC_COMMAND_SPEC = compile_spec((
+    ("mac_cmd_id", "cmd_id", 0, 8,
+     MAC_COMMAND_NAMES, "Unknown MAC Command"),
+))
+
+# Enumerated fields of the Capability Information field (1 byte)
+MAC_ASSOCREQ_SPEC = compile_spec((
+    ("mac_assocreq_apc", "alternate_pan_coordinator", 0, 1,
+     MAC_ASSOCREQ_APC_NAMES, "Unknown APC state"),
+    ("mac_assocreq_devtype", "device_type", 1, 1,
+     MAC_ASSOCREQ_DEVTYPE_NAMES, "Unknown device type"),
+    ("mac_assocreq_powsrc", "power_source", 2, 1,
+     MAC_ASSOCREQ_POWSRC_NAMES, "Unknown power source"),
+    ("mac_assocreq_rxidle", "receiver_on_when_idle", 3, 1,
+     MAC_ASSOCREQ_RXIDLE_NAMES, "Unknown RX state when idle"),
+    ("mac_assocreq_seccap", "security_capability", 6, 1,
+     MAC_ASSOCREQ_SECCAP_NAMES, "Unknown MAC security capacity"),
+    ("mac_assocreq_allocaddr", "allocate_address", 7, 1,
+     MAC_ASSOCREQ_ALLOCADDR_NAMES, "Unknown address allocation"),
+))
+
+# Enumerated fields of the Association Status field (1 byte)
+MAC_ASSOCRSP_SPEC = compile_spec((
+    ("mac_assocrsp_status", "association_status", 0, 8,
+     MAC_ASSOCRSP_STATUS_NAMES, "Unknown association status"),
+))
+
+# Enumerated fields of the Disassociation Reason field (1 byte)
+MAC_DISASSOC_SPEC = compile_spec((
+    ("mac_disassoc_reason", "disassociation_reason", 0, 8,
+     MAC_DISASSOC_REASON_NAMES, "Unknown disassociation reason"),
+))
+
+# Enumerated fields of the GTS Characteristics field (1 byte)
+MAC_GTSREQ_SPEC = compile_spec((
+    ("mac_gtsreq_dir", "gts_dir", 4, 1,
+     MAC_GTSREQ_DIR_NAMES, "Unknown GTS direction"),
+    ("mac_gtsreq_chartype", "charact_type", 5, 1,
+     MAC_GTSREQ_CHARTYPE_NAMES, "Unknown GTS characteristics type"),
+))
+
+# Enumerated fields of the Superframe Specification field (2 bytes)
+MAC_BEACON_SPEC = compile_spec((
+    ("mac_beacon_pancoord", "sf_pancoord", 14, 1,
+     MAC_BEACON_PANCOORD_NAMES, "Unknown PAN coordinator state"),
+    ("mac_beacon_assocpermit", "sf_assocpermit", 15, 1,
+     MAC_BEACON_ASSOCPERMIT_NAMES, "Unknown Association Permit state"),
+))
 
 
 def mac_assocreq(pkt):
     # Capability Information field (1 byte)
-    config.entry["mac_assocreq_apc"] = get_mac_assocreq_apc(pkt)
-    config.entry["mac_assocreq_devtype"] = get_mac_assocreq_devtype(pkt)
-    config.entry["mac_assocreq_powsrc"] = get_mac_assocreq_powsrc(pkt)
-    config.entry["mac_assocreq_rxidle"] = get_mac_assocreq_rxidle(pkt)
-    config.entry["mac_assocreq_seccap"] = get_mac_assocreq_seccap(pkt)
-    config.entry["mac_assocreq_allocaddr"] = get_mac_assocreq_allocaddr(pkt)
+    decode_layer(pkt[Dot15d4CmdAssocReq], MAC_ASSOCREQ_SPEC)
 
     return
 
@@ -254,14 +259,14 @@ def mac_assocrsp(pkt):
         pkt[Dot15d4CmdAssocResp].short_address)
 
     # Association Status field (1 byte)
-    config.entry["mac_assocrsp_status"] = get_mac_assocrsp_status(pkt)
+    decode_layer(pkt[Dot15d4CmdAssocResp], MAC_ASSOCRSP_SPEC)
 
     return
 
 
 def mac_disassoc(pkt):
     # Disassociation Reason field (1 byte)
-    config.entry["mac_disassoc_reason"] = get_mac_disassoc_reason(pkt)
+    decode_layer(pkt[Dot15d4CmdDisassociation], MAC_DISASSOC_SPEC)
 
     return
 
@@ -292,8 +297,7 @@ def mac_realign(pkt):
 def mac_gtsreq(pkt):
     # GTS Characteristics field (1 byte)
     config.entry["mac_gtsreq_length"] = pkt[Dot15d4CmdGTSReq].gts_len
-    config.entry["mac_gtsreq_dir"] = get_mac_gtsreq_dir(pkt)
-    config.entry["mac_gtsreq_chartype"] = get_mac_gtsreq_chartype(pkt)
+    decode_layer(pkt[Dot15d4CmdGTSReq], MAC_GTSREQ_SPEC)
 
     return
 
@@ -348,7 +352,7 @@ def mac_command(pkt, msg_queue):
         return
 
     # Command Frame Identifier field (1 byte)
-    config.entry["mac_cmd_id"] = get_mac_command(pkt)
+    decode_layer(pkt[Dot15d4Cmd], MAC_COMMAND_SPEC)
 
     # Compute the MAC Command Payload Length
     # The constant 6 was derived by summing the following:
@@ -477,8 +481,7 @@ def mac_beacon(pkt, msg_queue):
     config.entry["mac_beacon_sforder"] = pkt[Dot15d4Beacon].sf_sforder
     config.entry["mac_beacon_finalcap"] = pkt[Dot15d4Beacon].sf_finalcapslot
     config.entry["mac_beacon_ble"] = pkt[Dot15d4Beacon].sf_battlifeextend
-    config.entry["mac_beacon_pancoord"] = get_mac_beacon_pancoord(pkt)
-    config.entry["mac_beacon_assocpermit"] = get_mac_beacon_assocpermit(pkt)
+    decode_layer(pkt[Dot15d4Beacon], MAC_BEACON_SPEC)
 
     # GTS Specification field (1 byte)
     config.entry["mac_beacon_gtsnum"] = pkt[Dot15d4Beacon].gts_spec_desccount
@@ -605,14 +608,7 @@ def mac_fields(pkt, msg_queue):
     config.entry["mac_fcs"] = "0x{:04x}".format(pkt[Dot15d4FCS].fcs)
 
     # Frame Control field (2 bytes)
-    config.entry["mac_frametype"] = get_mac_frametype(pkt)
-    config.entry["mac_security"] = get_mac_security(pkt)
-    config.entry["mac_framepending"] = get_mac_framepending(pkt)
-    config.entry["mac_ackreq"] = get_mac_ackreq(pkt)
-    config.entry["mac_panidcomp"] = get_mac_panidcomp(pkt)
-    config.entry["mac_dstaddrmode"] = get_mac_dstaddrmode(pkt)
-    config.entry["mac_frameversion"] = get_mac_frameversion(pkt)
-    config.entry["mac_srcaddrmode"] = get_mac_srcaddrmode(pkt)
+    decode_layer(pkt[Dot15d4FCS], MAC_FCF_SPEC)
 
     # Sequence Number field (1 byte)
     config.entry["mac_seqnum"] = pkt[Dot15d4FCS].seqnum
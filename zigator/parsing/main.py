@@ -14,75 +14,167 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
+import collections
+import copy
 import glob
 import logging
+import math
 import multiprocessing as mp
 import os
+import time
 
 from .. import config
+from . import incremental as inc
+from . import key_hints
 from .pcap_file import pcap_file
+from . import ring_buffer
+from . import shared_store
+from .pcap_reader import capture_size
+from .pcap_reader import is_capture_file
+from .pcap_reader import pcap_ranges
+from .redecryption import redecrypt_pkts
 
 
-def worker(filepaths, msg_queue, task_index, task_lock):
+# Minimum size of each byte range of a split pcap file
+MIN_RANGE_SIZE = 16777216
+
+
+def worker(tasks, msg_queue, task_index, task_lock, ring, slot_semaphores,
+           index, shard_filepath, store):
     """Parse pcap files from the task list."""
+    if shard_filepath is None:
+        ring_buffer.attach(ring, slot_semaphores, index)
+    else:
+        ring_buffer.attach_shard(shard_filepath)
+    if store is not None:
+        shared_store.attach(store)
     while True:
         with task_lock:
-            if task_index.value < len(filepaths):
-                filepath = filepaths[task_index.value]
+            if task_index.value < len(tasks):
+                filepath, pkt_range, task_size = tasks[task_index.value]
                 task_index.value += 1
             else:
                 break
-        pcap_file(filepath, msg_queue)
-        msg_queue.put((config.PCAP_MSG, filepath))
+        start_time = time.perf_counter()
+        num_pkts = pcap_file(filepath, msg_queue, pkt_range)
+        msg_queue.put(
+            (config.PCAP_MSG,
+             (filepath, index, task_size, num_pkts,
+              time.perf_counter() - start_time)))
+    if shard_filepath is not None:
+        config.db.disconnect()
     msg_queue.put((config.RETURN_MSG, os.getpid()))
 
 
-def main(pcap_dirpath, db_filepath, num_workers):
-    """Parse all pcap files in the provided directory."""
-    # Sanity check
-    if not os.path.isdir(pcap_dirpath):
-        raise ValueError("The provided directory \"{}\" "
-                         "does not exist".format(pcap_dirpath))
+def split_pcap_files(filepaths, num_workers, skip_split=False):
+    """Return the tasks of the workers, starting with the largest one.
 
-    # Initialize the database that will store the parsed data
-    config.db.connect(db_filepath)
-    config.db.create_table("packets")
-    config.db.commit()
-
-    # Get a sorted list of pcap filepaths
-    filepaths = glob.glob(
-        os.path.join(pcap_dirpath, "**", "*.[pP][cC][aA][pP]"),
-        recursive=True)
-    filepaths.sort()
-    logging.info("Detected {} pcap files in the \"{}\" directory"
-                 "".format(len(filepaths), pcap_dirpath))
-
-    # Determine the number of processes that will be used
-    if num_workers is None:
-        num_workers = len(os.sched_getaffinity(0)) - 1
-    if num_workers < 1:
-        num_workers = 1
-    logging.info("The pcap files will be parsed by {} workers"
-                 "".format(num_workers))
+    Unless requested otherwise, pcap files that are larger than an even
+    share of the workload are split into record-aligned byte ranges, so
+    that they can be parsed in parallel. Handing out the largest tasks
+    first prevents a large pcap file from delaying the end of parsing.
+    """
+    filesizes = [capture_size(filepath) for filepath in filepaths]
+    range_size = max(MIN_RANGE_SIZE, math.ceil(sum(filesizes) / num_workers))
+    tasks = []
+    for filepath, filesize in zip(filepaths, filesizes):
+        if not skip_split and filesize > range_size:
+            try:
+                pkt_ranges = pcap_ranges(
+                    filepath, math.ceil(filesize / range_size))
+            except ValueError:
+                pkt_ranges = []
+            if len(pkt_ranges) > 1:
+                logging.info("The \"{}\" file was split into {} byte ranges"
+                             "".format(filepath, len(pkt_ranges)))
+                for pkt_range in pkt_ranges:
+                    tasks.append((filepath, pkt_range,
+                                  pkt_range[1] - pkt_range[0]))
+                continue
+        tasks.append((filepath, None, filesize))
+    tasks.sort(key=lambda task: task[2], reverse=True)
+    return tasks
+
+
+def set_parsing_options(store_show, max_attempts):
+    # Determine whether the output of Scapy's show function will be stored,
+    # which requires every packet to be dissected by Scapy, while the show
+    # subcommand can regenerate it from the stored bytes of each packet
+    config.store_show = store_show
+    if store_show:
+        logging.info("The output of Scapy's show function will be "
+                     "stored in the database")
 
+    # Determine the maximum number of decryption attempts for each payload
+    if max_attempts is not None and max_attempts < 1:
+        raise ValueError("The maximum number of decryption attempts "
+                         "should be a positive integer")
+    config.max_dec_attempts = max_attempts
+    if max_attempts is not None:
+        logging.info("At most {} decryption attempts will be made for "
+                     "each secured payload".format(max_attempts))
+
+
+def log_throughput(worker_stats, index, task_size, num_pkts, task_time,
+                   remaining_bytes, elapsed_time):
+    # Estimate the remaining time from the throughput of all the workers
+    worker_stats[index][0] += task_size
+    worker_stats[index][1] += num_pkts
+    worker_stats[index][2] += task_time
+    parsed_bytes = sum(stats[0] for stats in worker_stats)
+    worker_time = max(worker_stats[index][2], 1e-6)
+    if remaining_bytes > 0:
+        eta = remaining_bytes * elapsed_time / max(parsed_bytes, 1)
+    else:
+        eta = 0.0
+    logging.info("Worker {} parsed {:.1f} packets/s and {:.1f} bytes/s, "
+                 "with an ETA of {:.1f} seconds for the remaining {} bytes"
+                 "".format(index,
+                           worker_stats[index][1] / worker_time,
+                           worker_stats[index][0] / worker_time,
+                           eta,
+                           remaining_bytes))
+
+
+def parse_tasks(tasks, num_workers, shard_filepaths):
     # Create variables that will be shared by the processes
     msg_queue = mp.Queue()
     task_index = mp.Value("L", 0, lock=False)
     task_lock = mp.Lock()
+    if shard_filepaths is None:
+        ring, slot_semaphores = ring_buffer.init_ring(num_workers)
+        ring_view = memoryview(ring).cast("B")
+        shard_filepaths = [None for _ in range(num_workers)]
+    else:
+        ring, slot_semaphores = None, None
+
+    # Let the workers share the keys, addresses, and devices that they
+    # learn while parsing, so that they can use them right away
+    if num_workers > 1:
+        manager, store = shared_store.init_store()
+    else:
+        manager, store = None, None
 
     # Start the processes
     processes = []
-    for _ in range(num_workers):
+    for i in range(num_workers):
         p = mp.Process(target=worker,
-                       args=(filepaths, msg_queue, task_index, task_lock))
+                       args=(tasks, msg_queue, task_index, task_lock,
+                             ring, slot_semaphores, i, shard_filepaths[i],
+                             store))
         p.start()
         processes.append(p)
 
     # Process received messages until all the tasks are completed
+    remaining_tasks = collections.Counter(task[0] for task in tasks)
+    remaining_bytes = sum(task[2] for task in tasks)
+    worker_stats = [[0, 0, 0.0] for _ in range(num_workers)]
+    start_time = time.perf_counter()
     num_terminated_processes = 0
     pcap_counter = 0
     new_network_keys = 0
     new_link_keys = 0
+    key_hint_counters = [0, 0, 0]
     while num_terminated_processes < num_workers:
         msg_type, msg_obj = msg_queue.get()
         if msg_type is config.RETURN_MSG:
@@ -101,11 +193,23 @@ def main(pcap_dirpath, db_filepath, num_workers):
         elif msg_type is config.CRITICAL_MSG:
             logging.critical(msg_obj)
         elif msg_type is config.PCAP_MSG:
-            pcap_counter += 1
-            logging.info("Parsed {} out of the {} pcap files"
-                         "".format(pcap_counter, len(filepaths)))
-        elif msg_type is config.PKT_MSG:
-            config.db.insert_pkt(msg_obj)
+            filepath, index, task_size, num_pkts, task_time = msg_obj
+            remaining_bytes -= task_size
+            log_throughput(worker_stats, index, task_size, num_pkts,
+                           task_time, remaining_bytes,
+                           time.perf_counter() - start_time)
+            remaining_tasks[filepath] -= 1
+            if remaining_tasks[filepath] == 0:
+                pcap_counter += 1
+                logging.info("Parsed {} out of the {} pcap files"
+                             "".format(pcap_counter, len(remaining_tasks)))
+        elif msg_type is config.PKT_MSG or msg_type is config.PKTS_MSG:
+            if msg_type is config.PKT_MSG:
+                pkt_rows = [msg_obj]
+            else:
+                pkt_rows = ring_buffer.read_batch(
+                    ring_view, slot_semaphores, *msg_obj)
+            config.db.insert_pkts(pkt_rows)
         elif msg_type is config.NETWORK_KEYS_MSG:
             for key_name in msg_obj.keys():
                 if key_name not in config.network_keys.keys():
@@ -118,6 +222,7 @@ def main(pcap_dirpath, db_filepath, num_workers):
                     if msg_obj[key_name] not in config.link_keys.values():
                         config.link_keys[key_name] = msg_obj[key_name]
                         new_link_keys += 1
+                        config.invalidate_derived_keys()
         elif msg_type is config.NETWORKS_MSG:
             for epid in msg_obj.keys():
                 if epid not in config.networks.keys():
@@ -139,6 +244,11 @@ def main(pcap_dirpath, db_filepath, num_workers):
                 elif (config.addresses[(shortaddr, panid)]
                       != msg_obj[(shortaddr, panid)]):
                     config.addresses[(shortaddr, panid)] = "Conflicting Data"
+                if msg_obj[(shortaddr, panid)] != "Conflicting Data":
+                    config.update_address_history(
+                        shortaddr,
+                        panid,
+                        msg_obj[(shortaddr, panid)])
         elif msg_type is config.PAIRS_MSG:
             for (srcaddr, dstaddr, panid) in msg_obj.keys():
                 config.update_pairs(
@@ -151,12 +261,17 @@ def main(pcap_dirpath, db_filepath, num_workers):
                     dstaddr,
                     panid,
                     msg_obj[(srcaddr, dstaddr, panid)]["last"])
+        elif msg_type is config.KEY_HINTS_MSG:
+            for i in range(len(msg_obj)):
+                key_hint_counters[i] += msg_obj[i]
         else:
             raise ValueError("Unknown message type \"{}\"".format(msg_type))
 
     # Make sure that all processes terminated
     for p in processes:
         p.join()
+    if manager is not None:
+        manager.shutdown()
     logging.info("All {} workers completed their tasks"
                  "".format(num_workers))
 
@@ -164,35 +279,212 @@ def main(pcap_dirpath, db_filepath, num_workers):
     if not msg_queue.empty():
         raise ValueError("Expected the message queue to be empty")
 
-    # Commit the received data to the database
-    config.db.commit()
-
-    # Log a summary of sniffed keys and derived information
-    logging.info("Sniffed {} previously unknown network keys"
-                 "".format(new_network_keys))
-    logging.info("Sniffed {} previously unknown link keys"
-                 "".format(new_link_keys))
-    logging.info("Discovered the EPID of {} networks"
-                 "".format(len(config.networks)))
-    logging.info("Discovered the extended address of {} devices"
-                 "".format(len(config.devices)))
-    logging.info("Discovered the short-to-extended address mapping of "
-                 "{} devices".format(len(config.addresses)))
-    logging.info("Discovered {} flows of MAC Data packets"
-                 "".format(len(config.pairs)))
-
-    # Store the derived information into the database
-    config.db.store_networks(config.networks)
-    config.db.store_devices(config.devices)
-    config.db.store_addresses(config.addresses)
-    config.db.store_pairs(config.pairs)
-    config.db.commit()
-
-    # Update the packets table using the derived information
-    logging.info("Updating the database...")
-    config.db.update_packets()
-    config.db.commit()
-    logging.info("Finished updating the database")
+    # Merge the shard databases of the workers into the main database
+    for shard_filepath in shard_filepaths:
+        if shard_filepath is not None and os.path.isfile(shard_filepath):
+            config.db.merge_shard(shard_filepath)
+            os.remove(shard_filepath)
+            logging.debug("Merged the \"{}\" shard database"
+                          "".format(shard_filepath))
+
+    return new_network_keys, new_link_keys, key_hint_counters
+
+
+def main(pcap_dirpath, db_filepath, num_workers, shards=False,
+         store_show=False, max_attempts=None, incremental=False,
+         hash_files=False, skip_split=False, bulk_load=False,
+         encode_columns=False, partition_layers=False):
+    """Parse all pcap files in the provided directory.
+
+    In incremental mode, only the pcap files that are new or were
+    modified since the previous parsing of the directory are parsed,
+    unless the database was created with a different schema or without
+    the fingerprints of its pcap files.
+    In bulk-load mode, the database is synchronized with the disk only
+    after it was updated with the derived information, and its indexes
+    are rebuilt after all the packets were inserted. In encoded storage
+    mode, the text columns with repeated values are stored as integer
+    codes, with a lookup table for each column and a packets view that
+    decodes them. In partitioned storage mode, the columns of each layer
+    are stored in a separate table that is keyed by the packet ID, with
+    a packets view that joins them.
+    """
+    # Sanity check
+    if not os.path.isdir(pcap_dirpath):
+        raise ValueError("The provided directory \"{}\" "
+                         "does not exist".format(pcap_dirpath))
+
+    # Initialize the database that will store the parsed data, which is
+    # parsed again from scratch if its stored packets cannot be updated
+    config.db.connect(db_filepath)
+    if incremental and (config.db.table_exists("packets")
+                        or config.db.is_converted()):
+        if not config.db.schema_matches():
+            logging.warning("The packets of the \"{}\" database were stored "
+                            "with a different schema, so all the pcap files "
+                            "will be parsed again".format(db_filepath))
+            incremental = False
+        elif not config.db.table_exists("files"):
+            logging.warning("The \"{}\" database does not identify the "
+                            "pcap files of its packets, so all the pcap "
+                            "files will be parsed again".format(db_filepath))
+            incremental = False
+    if not incremental or not (config.db.table_exists("packets")
+                               or config.db.is_converted()):
+        config.db.create_table("packets")
+        config.db.commit()
+    elif config.db.is_converted() and (
+            (encode_columns and not config.db.is_encoded())
+            or (partition_layers and not config.db.is_partitioned())):
+        # Restore the stored packets before they are converted again with
+        # the additional storage modes, while new packets are appended to
+        # their stored form otherwise
+        logging.info("Restoring the packets table of the database...")
+        encode_columns = encode_columns or config.db.is_encoded()
+        partition_layers = partition_layers or config.db.is_partitioned()
+        config.db.restore_table()
+        config.db.commit()
+    if bulk_load:
+        config.db.begin_bulk_load()
+        logging.info("The database will be synchronized with the disk "
+                     "only after the end of the bulk load")
+
+    try:
+        # Get a sorted list of pcap filepaths, including pcapng files and
+        # compressed capture files
+        filepaths = glob.glob(os.path.join(pcap_dirpath, "**", "*"),
+                              recursive=True)
+        filepaths = [filepath for filepath in filepaths
+                     if is_capture_file(filepath)]
+        filepaths.sort()
+        logging.info("Detected {} pcap files in the \"{}\" directory"
+                     "".format(len(filepaths), pcap_dirpath))
+
+        # Parse only new or modified pcap files in incremental mode
+        files = inc.fingerprint_files(filepaths, hash_files)
+        if incremental:
+            stored_files = config.db.load_files()
+            new_filepaths, modified_filepaths = inc.select_files(
+                filepaths, files, stored_files)
+            config.db.commit()
+            logging.info("Detected {} new and {} modified pcap files, "
+                         "while {} pcap files were not modified"
+                         "".format(len(new_filepaths),
+                                   len(modified_filepaths),
+                                   len(filepaths) - len(new_filepaths)
+                                   - len(modified_filepaths)))
+            for dirfile in stored_files.keys():
+                if dirfile not in files.keys():
+                    files[dirfile] = stored_files[dirfile]
+            inc.restore_derived_info(len(modified_filepaths) > 0)
+            filepaths = sorted(new_filepaths + modified_filepaths)
+
+        # Determine the number of processes that will be used
+        if num_workers is None:
+            num_workers = len(os.sched_getaffinity(0)) - 1
+        if num_workers < 1:
+            num_workers = 1
+        logging.info("The pcap files will be parsed by {} workers"
+                     "".format(num_workers))
+
+        # Apply the options that affect the parsing of each packet
+        set_parsing_options(store_show, max_attempts)
+
+        # Keep a copy of each dictionary that the workers use for decryption
+        init_network_keys = config.network_keys.copy()
+        init_link_keys = config.link_keys.copy()
+        init_devices = copy.deepcopy(config.devices)
+        init_addresses = config.addresses.copy()
+
+        # Rebuild the indexes after the bulk load instead of maintaining them
+        if bulk_load:
+            config.db.drop_indexes()
+            config.db.commit()
+
+        # Parse the pcap files, starting with the largest ones
+        tasks = split_pcap_files(filepaths, num_workers, skip_split)
+        if shards:
+            shard_filepaths = ["{}.shard{}".format(db_filepath, i)
+                               for i in range(num_workers)]
+            logging.info("Each worker will write its packets into a shard "
+                         "database")
+        else:
+            shard_filepaths = None
+        new_network_keys, new_link_keys, key_hint_counters = parse_tasks(
+            tasks, num_workers, shard_filepaths)
+        config.db.commit()
+
+        # Retry the decryption of packets that could not be decrypted, using
+        # the keys and addresses that were sniffed from all the pcap files,
+        # which affect the stored packets of previous incremental runs only if
+        # keys were sniffed or their source short addresses were mapped again
+        keys_sniffed = (config.network_keys != init_network_keys
+                        or config.link_keys != init_link_keys)
+        if ((len(config.network_keys) > 0 or len(config.link_keys) > 0)
+                and (keys_sniffed
+                     or config.devices != init_devices
+                     or config.addresses != init_addresses)):
+            num_network_keys = len(config.network_keys)
+            num_link_keys = len(config.link_keys)
+            if incremental and not keys_sniffed:
+                redecrypt_pkts(
+                    set(os.path.split(os.path.abspath(filepath))
+                        for filepath in filepaths),
+                    set(key for key, extendedaddr in config.addresses.items()
+                        if init_addresses.get(key) != extendedaddr))
+            else:
+                redecrypt_pkts()
+            new_network_keys += len(config.network_keys) - num_network_keys
+            new_link_keys += len(config.link_keys) - num_link_keys
+            for i, counter in enumerate(key_hints.counters()):
+                key_hint_counters[i] += counter
+
+        # Commit the received data to the database
+        config.db.commit()
+
+        # Log a summary of sniffed keys and derived information
+        logging.info("Sniffed {} previously unknown network keys"
+                     "".format(new_network_keys))
+        logging.info("Sniffed {} previously unknown link keys"
+                     "".format(new_link_keys))
+        logging.info("Discovered the EPID of {} networks"
+                     "".format(len(config.networks)))
+        logging.info("Discovered the extended address of {} devices"
+                     "".format(len(config.devices)))
+        logging.info("Discovered the short-to-extended address mapping of "
+                     "{} devices".format(len(config.addresses)))
+        logging.info("Discovered {} flows of MAC Data packets"
+                     "".format(len(config.pairs)))
+        logging.info("The decryption key hints had {} hits and {} misses, "
+                     "with {} decryption attempts in total"
+                     "".format(*key_hint_counters))
+
+        # Store the derived information into the database
+        config.db.store_files(files)
+        config.db.store_networks(config.networks)
+        config.db.store_devices(config.devices)
+        config.db.store_addresses(config.addresses)
+        config.db.store_pairs(config.pairs)
+        config.db.commit()
+
+        # Update the packets table using the derived information
+        logging.info("Updating the database...")
+        config.db.create_indexes()
+        config.db.update_packets()
+        if ((encode_columns or partition_layers)
+                and not config.db.is_converted()):
+            config.db.convert_table(encode_columns, partition_layers)
+            config.db.create_indexes()
+            logging.info("Converted the storage of the packets")
+        config.db.analyze()
+        config.db.commit()
+        logging.info("Finished updating the database")
+    finally:
+        # Restore the default settings of the database even if the bulk
+        # load failed, since its journal mode persists across connections
+        if bulk_load:
+            config.db.end_bulk_load()
+            logging.info("Wrote a durable checkpoint of the database")
 
     # Log a summary of the generated warnings
     warnings = config.db.fetch_values(["warning_msg"], None, True)
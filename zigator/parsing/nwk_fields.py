@@ -22,375 +22,448 @@ from scapy.all import ZigbeeSecurityHeader
 
 from .. import config
 from .. import crypto
+from . import key_hints
 from .aps_fields import aps_fields
+from .layer_spec import compile_spec
+from .layer_spec import decode_layer
 
 
-def get_nwk_frametype(pkt):
-    nwk_frame_types = {
-        0: "NWK Data",
-        1: "NWK Command",
-        3: "NWK Inter-PAN"
-    }
-    frametype_id = pkt[ZigbeeNWK].frametype
-    return nwk_frame_types.get(frametype_id, "Unknown NWK frame type")
-
-
-def get_nwk_protocolversion(pkt):
-    protocol_versions = {
-        1: "Zigbee 2004",
-        2: "Zigbee PRO",
-        3: "Zigbee Green Power"
-    }
-    if pkt.haslayer(ZigbeeNWK):
-        prot_ver = pkt[ZigbeeNWK].proto_version
-    elif pkt.haslayer(ZigBeeBeacon):
-        prot_ver = pkt[ZigBeeBeacon].nwkc_protocol_version
-    else:
-        prot_ver = None
-    return protocol_versions.get(prot_ver, "Unknown NWK protocol version")
-
-
-def get_nwk_discroute(pkt):
-    discroute_states = {
-        0: "Suppress route discovery",
-        1: "Enable route discovery"
-    }
-    discroute_state = pkt[ZigbeeNWK].discover_route
-    return discroute_states.get(discroute_state, "Unknown NWK DR state")
-
-
-def get_nwk_aux_seclevel(pkt):
-    sec_levels = {
-        0: "None",
-        1: "MIC-32",
-        2: "MIC-64",
-        3: "MIC-128",
-        4: "ENC",
-        5: "ENC-MIC-32",
-        6: "ENC-MIC-64",
-        7: "ENC-MIC-128"
-    }
-    seclevel_id = pkt[ZigbeeSecurityHeader].nwk_seclevel
-    return sec_levels.get(seclevel_id, "Unknown NWK security level")
-
-
-def get_nwk_aux_keytype(pkt):
-    key_types = {
-        0: "Data Key",
-        1: "Network Key",
-        2: "Key-Transport Key",
-        3: "Key-Load Key"
-    }
-    keytype_id = pkt[ZigbeeSecurityHeader].key_type
-    return key_types.get(keytype_id, "Unknown NWK key type")
-
-
-def get_nwk_aux_extnonce(pkt):
-    extnonce_states = {
-        0: "The source address is not present",
-        1: "The source address is present"
-    }
-    extnonce_state = pkt[ZigbeeSecurityHeader].extended_nonce
-    return extnonce_states.get(extnonce_state, "Unknown NWK EN state")
-
-
-def get_nwk_command(pkt):
-    nwk_commands = {
-        1: "NWK Route Request",
-        2: "NWK Route Reply",
-        3: "NWK Network Status",
-        4: "NWK Leave",
-        5: "NWK Route Record",
-        6: "NWK Rejoin Request",
-        7: "NWK Rejoin Response",
-        8: "NWK Link Status",
-        9: "NWK Network Report",
-        10: "NWK Network Update",
-        11: "NWK End Device Timeout Request",
-        12: "NWK End Device Timeout Response"
-    }
-    command_id = pkt[ZigbeeNWKCommandPayload].cmd_identifier
-    return nwk_commands.get(command_id, "Unknown NWK command")
-
-
-def get_nwk_routerequest_mto(pkt):
-    mto_values = {
-        0: "Not a Many-to-One Route Request",
-        1: "Many-to-One Route Request with Route Record support",
-        2: "Many-to-One Route Request without Route Record support",
-    }
-    mto_id = pkt[ZigbeeNWKCommandPayload].many_to_one
-    return mto_values.get(mto_id, "Unknown Many-to-One value")
-
-
-def get_nwk_routerequest_ed(pkt):
-    dst_states = {
-        0: "The extended destination address is not present",
-        1: "The extended destination address is present"
-    }
-    dst_state = pkt[ZigbeeNWKCommandPayload].dest_addr_bit
-    return dst_states.get(dst_state, "Unknown Extended Destination state")
-
-
-def get_nwk_routerequest_mc(pkt):
-    mc_states = {
-        0: "The destination address is not a Group ID",
-        1: "The destination address is a Group ID"
-    }
-    mc_state = pkt[ZigbeeNWKCommandPayload].multicast
-    return mc_states.get(mc_state, "Unknown Multicast state")
-
-
-def get_nwk_routereply_eo(pkt):
-    dst_states = {
-        0: "The extended originator address is not present",
-        1: "The extended originator address is present"
-    }
-    dst_state = pkt[ZigbeeNWKCommandPayload].originator_addr_bit
-    return dst_states.get(dst_state, "Unknown Extended Originator state")
-
-
-def get_nwk_routereply_er(pkt):
-    dst_states = {
-        0: "The extended responder address is not present",
-        1: "The extended responder address is present"
-    }
-    dst_state = pkt[ZigbeeNWKCommandPayload].responder_addr_bit
-    return dst_states.get(dst_state, "Unknown Extended Responder state")
-
-
-def get_nwk_routereply_mc(pkt):
-    mc_states = {
-        0: "The responder address is not a Group ID",
-        1: "The responder address is a Group ID"
-    }
-    mc_state = pkt[ZigbeeNWKCommandPayload].multicast
-    return mc_states.get(mc_state, "Unknown Multicast state")
-
-
-def get_nwk_networkstatus_code(pkt):
-    status_codes = {
-        0: "No route available",
-        1: "Tree link failure",
-        2: "Non-tree link failure",
-        3: "Low battery level",
-        4: "No routing capacity",
-        5: "No indirect capacity",
-        6: "Indirect transaction expiry",
-        7: "Target device unavailable",
-        8: "Target address unallocated",
-        9: "Parent link failure",
-        10: "Validate route",
-        11: "Source route failure",
-        12: "Many-to-one route failure",
-        13: "Address conflict",
-        14: "Verify addresses",
-        15: "PAN identifier update",
-        16: "Network address update",
-        17: "Bad frame counter",
-        18: "Bad key sequence number"
-    }
-    status_code = pkt[ZigbeeNWKCommandPayload].status_code
-    return status_codes.get(status_code, "Unknown Status Code value")
-
-
-def get_nwk_leave_rejoin(pkt):
-    rejoin_states = {
-        0: "The device will not rejoin the network",
-        1: "The device will rejoin the network"
-    }
-    rejoin_state = pkt[ZigbeeNWKCommandPayload].rejoin
-    return rejoin_states.get(rejoin_state, "Unknown Rejoin state")
-
-
-def get_nwk_leave_request(pkt):
-    request_states = {
-        0: "The sending device wants to leave the network",
-        1: "Another device wants to leave the network"
-    }
-    request_state = pkt[ZigbeeNWKCommandPayload].request
-    return request_states.get(request_state, "Unknown Request state")
-
-
-def get_nwk_leave_rmch(pkt):
-    rmch_states = {
-        0: "The device's children will not be removed from the network",
-        1: "The device's children will be removed from the network"
-    }
-    rmch_state = pkt[ZigbeeNWKCommandPayload].remove_children
-    return rmch_states.get(rmch_state, "Unknown Remove Children state")
-
-
-def get_nwk_rejoinreq_apc(pkt):
-    apc_states = {
-        0: "The sender is not capable of becoming a PAN coordinator",
-        1: "The sender is capable of becoming a PAN coordinator"
-    }
-    apc_state = pkt[ZigbeeNWKCommandPayload].alternate_pan_coordinator
-    return apc_states.get(apc_state, "Unknown APC state")
-
-
-def get_nwk_rejoinreq_devtype(pkt):
-    device_types = {
-        0: "Zigbee End Device",
-        1: "Zigbee Router"
-    }
-    devtype_id = pkt[ZigbeeNWKCommandPayload].device_type
-    return device_types.get(devtype_id, "Unknown device type")
-
-
-def get_nwk_rejoinreq_powsrc(pkt):
-    power_sources = {
-        0: "The sender is not a mains-powered device",
-        1: "The sender is a mains-powered device"
-    }
-    pwrsrc_id = pkt[ZigbeeNWKCommandPayload].power_source
-    return power_sources.get(pwrsrc_id, "Unknown power source")
-
-
-def get_nwk_rejoinreq_rxidle(pkt):
-    rxidle_states = {
-        0: "Disables the receiver to conserve power when idle",
-        1: "Does not disable the receiver to conserve power"
-    }
-    rxidle_state = pkt[ZigbeeNWKCommandPayload].receiver_on_when_idle
-    return rxidle_states.get(rxidle_state, "Unknown RX state when idle")
-
-
-def get_nwk_rejoinreq_seccap(pkt):
-    seccap_states = {
-        0: "Cannot transmit and receive secure MAC frames",
-        1: "Can transmit and receive secure MAC frames"
-    }
-    seccap_state = pkt[ZigbeeNWKCommandPayload].security_capability
-    return seccap_states.get(seccap_state, "Unknown MAC security capacity")
-
-
-def get_nwk_rejoinreq_allocaddr(pkt):
-    allocaddr_states = {
-        0: "Does not request a short address",
-        1: "Requests a short address"
-    }
-    allocaddr_state = pkt[ZigbeeNWKCommandPayload].allocate_address
-    return allocaddr_states.get(allocaddr_state, "Unknown address allocation")
-
-
-def get_nwk_rejoinrsp_status(pkt):
-    rejoin_statuses = {
-        0: "Rejoin successful",
-        1: "PAN at capacity",
-        2: "PAN access denied"
-    }
-    rejoin_status = pkt[ZigbeeNWKCommandPayload].rejoin_status
-    return rejoin_statuses.get(rejoin_status, "Unknown rejoin status")
-
-
-def get_nwk_linkstatus_first(pkt):
-    first_statuses = {
-        0: "This is not the first frame of the sender's link status",
-        1: "This is the first frame of the sender's link status"
-    }
-    first_status = pkt[ZigbeeNWKCommandPayload].first_frame
-    return first_statuses.get(first_status, "Unknown first frame status")
-
-
-def get_nwk_linkstatus_last(pkt):
-    last_statuses = {
-        0: "This is not the last frame of the sender's link status",
-        1: "This is the last frame of the sender's link status"
-    }
-    last_status = pkt[ZigbeeNWKCommandPayload].last_frame
-    return last_statuses.get(last_status, "Unknown last frame status")
-
-
-def get_nwk_networkreport_type(pkt):
-    report_types = {
-        0: "PAN Identifier Conflict"
-    }
-    report_type = pkt[ZigbeeNWKCommandPayload].report_command_identifier
-    return report_types.get(report_type, "Unknown report type")
-
-
-def get_nwk_networkupdate_type(pkt):
-    update_types = {
-        0: "PAN Identifier Update"
-    }
-    update_type = pkt[ZigbeeNWKCommandPayload].update_command_identifier
-    return update_types.get(update_type, "Unknown update type")
-
-
-def get_edtimeoutreq_reqtime(pkt):
-    timeout_values = {
-        0: "10 seconds",
-        1: "2 minutes",
-        2: "4 minutes",
-        3: "8 minutes",
-        4: "16 minutes",
-        5: "32 minutes",
-        6: "64 minutes",
-        7: "128 minutes",
-        8: "256 minutes",
-        9: "512 minutes",
-        10: "1024 minutes",
-        11: "2048 minutes",
-        12: "4096 minutes",
-        13: "8192 minutes",
-        14: "16384 minutes"
-    }
-    req_timeout = pkt[ZigbeeNWKCommandPayload].req_timeout
-    return timeout_values.get(req_timeout, "Unknown requested timeout value")
-
-
-def get_edtimeoutrsp_status(pkt):
-    status_values = {
-        0: "Success",
-        1: "Incorrect Value"
-    }
-    status = pkt[ZigbeeNWKCommandPayload].status
-    return status_values.get(status, "Unknown status value")
-
-
-def get_edtimeoutrsp_poll(pkt):
-    poll_states = {
-        0: "MAC Data Poll Keepalive is not supported",
-        1: "MAC Data Poll Keepalive is supported"
-    }
-    poll_state = pkt[ZigbeeNWKCommandPayload].mac_data_poll_keepalive
-    return poll_states.get(poll_state, "Unknown poll state")
-
-
-def get_edtimeoutrsp_timeout(pkt):
-    timeout_states = {
-        0: "End Device Timeout Request Keepalive is not supported",
-        1: "End Device Timeout Request Keepalive is supported"
-    }
-    timeout_state = pkt[ZigbeeNWKCommandPayload].ed_timeout_req_keepalive
-    return timeout_states.get(timeout_state, "Unknown timeout state")
-
-
-def get_nwk_beacon_routercap(pkt):
-    rcap_states = {
-        0: "The sender cannot accept join requests from routers",
-        1: "The sender can accept join requests from routers"
-    }
-    rcap_state = pkt[ZigBeeBeacon].router_capacity
-    return rcap_states.get(rcap_state, "Unknown Router Capacity state")
-
-
-def get_nwk_beacon_edcap(pkt):
-    edcap_states = {
-        0: "The sender cannot accept join requests from end devices",
-        1: "The sender can accept join requests from end devices"
-    }
-    edcap_state = pkt[ZigBeeBeacon].end_device_capacity
-    return edcap_states.get(edcap_state, "Unknown End Device Capacity state")
+NWK_FRAMETYPE_NAMES = {
+    0: "NWK Data",
+    1: "NWK Command",
+    3: "NWK Inter-PAN"
+}
+
+
+NWK_PROTOCOLVERSION_NAMES = {
+    1: "Zigbee 2004",
+    2: "Zigbee PRO",
+    3: "Zigbee Green Power"
+}
+
+
+NWK_DISCROUTE_NAMES = {
+    0: "Suppress route discovery",
+    1: "Enable route discovery"
+}
+
+
+NWK_MULTICAST_NAMES = {
+    0: "NWK Multicast Disabled",
+    1: "NWK Multicast Enabled"
+}
+
+
+NWK_SECURITY_NAMES = {
+    0: "NWK Security Disabled",
+    1: "NWK Security Enabled"
+}
+
+
+NWK_SRCROUTE_NAMES = {
+    0: "NWK Source Route Omitted",
+    1: "NWK Source Route Included"
+}
+
+
+NWK_EXTENDEDDST_NAMES = {
+    0: "NWK Extended Destination Omitted",
+    1: "NWK Extended Destination Included"
+}
+
+
+NWK_EXTENDEDSRC_NAMES = {
+    0: "NWK Extended Source Omitted",
+    1: "NWK Extended Source Included"
+}
+
+
+NWK_EDINITIATOR_NAMES = {
+    0: "NWK Not End Device Initiator",
+    1: "NWK End Device Initiator"
+}
+
+
+NWK_AUX_SECLEVEL_NAMES = {
+    0: "None",
+    1: "MIC-32",
+    2: "MIC-64",
+    3: "MIC-128",
+    4: "ENC",
+    5: "ENC-MIC-32",
+    6: "ENC-MIC-64",
+    7: "ENC-MIC-128"
+}
+
+
+NWK_AUX_KEYTYPE_NAMES = {
+    0: "Data Key",
+    1: "Network Key",
+    2: "Key-Transport Key",
+    3: "Key-Load Key"
+}
+
+
+NWK_AUX_EXTNONCE_NAMES = {
+    0: "The source address is not present",
+    1: "The source address is present"
+}
+
+
+NWK_COMMAND_NAMES = {
+    1: "NWK Route Request",
+    2: "NWK Route Reply",
+    3: "NWK Network Status",
+    4: "NWK Leave",
+    5: "NWK Route Record",
+    6: "NWK Rejoin Request",
+    7: "NWK Rejoin Response",
+    8: "NWK Link Status",
+    9: "NWK Network Report",
+    10: "NWK Network Update",
+    11: "NWK End Device Timeout Request",
+    12: "NWK End Device Timeout Response"
+}
+
+
+NWK_ROUTEREQUEST_MTO_NAMES = {
+    0: "Not a Many-to-One Route Request",
+    1: "Many-to-One Route Request with Route Record support",
+    2: "Many-to-One Route Request without Route Record support",
+}
+
+
+NWK_ROUTEREQUEST_ED_NAMES = {
+    0: "The extended destination address is not present",
+    1: "The extended destination address is present"
+}
+
+
+NWK_ROUTEREQUEST_MC_NAMES = {
+    0: "The destination address is not a Group ID",
+    1: "The destination address is a Group ID"
+}
+
+
+NWK_ROUTEREPLY_EO_NAMES = {
+    0: "The extended originator address is not present",
+    1: "The extended originator address is present"
+}
+
+
+NWK_ROUTEREPLY_ER_NAMES = {
+    0: "The extended responder address is not present",
+    1: "The extended responder address is present"
+}
+
+
+NWK_ROUTEREPLY_MC_NAMES = {
+    0: "The responder address is not a Group ID",
+    1: "The responder address is a Group ID"
+}
+
+
+NWK_NETWORKSTATUS_CODE_NAMES = {
+    0: "No route available",
+    1: "Tree link failure",
+    2: "Non-tree link failure",
+    3: "Low battery level",
+    4: "No routing capacity",
+    5: "No indirect capacity",
+    6: "Indirect transaction expiry",
+    7: "Target device unavailable",
+    8: "Target address unallocated",
+    9: "Parent link failure",
+    10: "Validate route",
+    11: "Source route failure",
+    12: "Many-to-one route failure",
+    13: "Address conflict",
+    14: "Verify addresses",
+    15: "PAN identifier update",
+    16: "Network address update",
+    17: "Bad frame counter",
+    18: "Bad key sequence number"
+}
+
+
+NWK_LEAVE_REJOIN_NAMES = {
+    0: "The device will not rejoin the network",
+    1: "The device will rejoin the network"
+}
+
+
+NWK_LEAVE_REQUEST_NAMES = {
+    0: "The sending device wants to leave the network",
+    1: "Another device wants to leave the network"
+}
+
+
+NWK_LEAVE_RMCH_NAMES = {
+    0: "The device's children will not be removed from the network",
+    1: "The device's children will be removed from the network"
+}
+
+
+NWK_REJOINREQ_APC_NAMES = {
+    0: "The sender is not capable of becoming a PAN coordinator",
+    1: "The sender is capable of becoming a PAN coordinator"
+}
+
+
+NWK_REJOINREQ_DEVTYPE_NAMES = {
+    0: "Zigbee End Device",
+    1: "Zigbee Router"
+}
+
+
+NWK_REJOINREQ_POWSRC_NAMES = {
+    0: "The sender is not a mains-powered device",
+    1: "The sender is a mains-powered device"
+}
+
+
+NWK_REJOINREQ_RXIDLE_NAMES = {
+    0: "Disables the receiver to conserve power when idle",
+    1: "Does not disable the receiver to conserve power"
+}
+
+
+NWK_REJOINREQ_SECCAP_NAMES = {
+    0: "Cannot transmit and receive secure MAC frames",
+    1: "Can transmit and receive secure MAC frames"
+}
+
+
+NWK_REJOINREQ_ALLOCADDR_NAMES = {
+    0: "Does not request a short address",
+    1: "Requests a short address"
+}
+
+
+NWK_REJOINRSP_STATUS_NAMES = {
+    0: "Rejoin successful",
+    1: "PAN at capacity",
+    2: "PAN access denied"
+}
+
+
+NWK_LINKSTATUS_FIRST_NAMES = {
+    0: "This is not the first frame of the sender's link status",
+    1: "This is the first frame of the sender's link status"
+}
+
+
+NWK_LINKSTATUS_LAST_NAMES = {
+    0: "This is not the last frame of the sender's link status",
+    1: "This is the last frame of the sender's link status"
+}
+
+
+NWK_NETWORKREPORT_TYPE_NAMES = {
+    0: "PAN Identifier Conflict"
+}
+
+
+NWK_NETWORKUPDATE_TYPE_NAMES = {
+    0: "PAN Identifier Update"
+}
+
+
+EDTIMEOUTREQ_REQTIME_NAMES = {
+    0: "10 seconds",
+    1: "2 minutes",
+    2: "4 minutes",
+    3: "8 minutes",
+    4: "16 minutes",
+    5: "32 minutes",
+    6: "64 minutes",
+    7: "128 minutes",
+    8: "256 minutes",
+    9: "512 minutes",
+    10: "1024 minutes",
+    11: "2048 minutes",
+    12: "4096 minutes",
+    13: "8192 minutes",
+    14: "16384 minutes"
+}
+
+
+EDTIMEOUTRSP_STATUS_NAMES = {
+    0: "Success",
+    1: "Incorrect Value"
+}
+
+
+EDTIMEOUTRSP_POLL_NAMES = {
+    0: "MAC Data Poll Keepalive is not supported",
+    1: "MAC Data Poll Keepalive is supported"
+}
+
+
+EDTIMEOUTRSP_TIMEOUT_NAMES = {
+    0: "End Device Timeout Request Keepalive is not supported",
+    1: "End Device Timeout Request Keepalive is supported"
+}
+
+
+NWK_BEACON_ROUTERCAP_NAMES = {
+    0: "The sender cannot accept join requests from routers",
+    1: "The sender can accept join requests from routers"
+}
+
+
+NWK_BEACON_EDCAP_NAMES = {
+    0: "The sender cannot accept join requests from end devices",
+    1: "The sender can accept join requests from end devices"
+}
+
+
+# Enumerated fields of the Frame Control field (2 bytes)
+NWK_FCF_SPEC = compile_spec((
+    ("nwk_frametype", "frametype", 0, 2,
+     NWK_FRAMETYPE_NAMES, "Unknown NWK frame type"),
+    ("nwk_protocolversion", "proto_version", 2, 4,
+     NWK_PROTOCOLVERSION_NAMES, "Unknown NWK protocol version"),
+    ("nwk_discroute", "discover_route", 6, 2,
+     NWK_DISCROUTE_NAMES, "Unknown NWK DR state"),
+    ("nwk_multicast", "flags.multicast", 8, 1,
+     NWK_MULTICAST_NAMES, "Unknown NWK multicast state"),
+    ("nwk_security", "flags.security", 9, 1,
+     NWK_SECURITY_NAMES, "Unknown NWK security state"),
+    ("nwk_srcroute", "flags.source_route", 10, 1,
+     NWK_SRCROUTE_NAMES, "Unknown NWK source route state"),
+    ("nwk_extendeddst", "flags.extended_dst", 11, 1,
+     NWK_EXTENDEDDST_NAMES, "Unknown Extended Destination state"),
+    ("nwk_extendedsrc", "flags.extended_src", 12, 1,
+     NWK_EXTENDEDSRC_NAMES, "Unknown Extended Source state"),
+    ("nwk_edinitiator", "flags.reserved1", 13, 1,
+     NWK_EDINITIATOR_NAMES, "Unknown End Device Initiator state"),
+))
+
+# Enumerated fields of the Security Control field (1 byte)
+NWK_AUX_SPEC = compile_spec((
+    ("nwk_aux_seclevel", "nwk_seclevel", 0, 3,
+     NWK_AUX_SECLEVEL_NAMES, "Unknown NWK security level"),
+    ("nwk_aux_keytype", "key_type", 3, 2,
+     NWK_AUX_KEYTYPE_NAMES, "Unknown NWK key type"),
+    ("nwk_aux_extnonce", "extended_nonce", 5, 1,
+     NWK_AUX_EXTNONCE_NAMES, "Unknown NWK EN state"),
+))
+
+# Enumerated fields of the Command Identifier field (1 byte)
+NWK_COMMAND_SPEC = compile_spec((
+    ("nwk_cmd_id", "cmd_identifier", 0, 8,
+     NWK_COMMAND_NAMES, "Unknown NWK command"),
+))
+
+# Enumerated fields of the Command Options field of Route Requests (1 byte)
+NWK_ROUTEREQUEST_SPEC = compile_spec((
+    ("nwk_routerequest_mto", "many_to_one", 3, 2,
+     NWK_ROUTEREQUEST_MTO_NAMES, "Unknown Many-to-One value"),
+    ("nwk_routerequest_ed", "dest_addr_bit", 5, 1,
+     NWK_ROUTEREQUEST_ED_NAMES, "Unknown Extended Destination state"),
+    ("nwk_routerequest_mc", "multicast", 6, 1,
+     NWK_ROUTEREQUEST_MC_NAMES, "Unknown Multicast state"),
+))
+
+# Enumerated fields of the Command Options field of Route Replies (1 byte)
+NWK_ROUTEREPLY_SPEC = compile_spec((
+    ("nwk_routereply_eo", "originator_addr_bit", 4, 1,
+     NWK_ROUTEREPLY_EO_NAMES, "Unknown Extended Originator state"),
+    ("nwk_routereply_er", "responder_addr_bit", 5, 1,
+     NWK_ROUTEREPLY_ER_NAMES, "Unknown Extended Responder state"),
+    ("nwk_routereply_mc", "multicast", 6, 1,
+     NWK_ROUTEREPLY_MC_NAMES, "Unknown Multicast state"),
+))
+
+# Enumerated fields of the Status Code field (1 byte)
+NWK_NETWORKSTATUS_SPEC = compile_spec((
+    ("nwk_networkstatus_code", "status_code", 0, 8,
+     NWK_NETWORKSTATUS_CODE_NAMES, "Unknown Status Code value"),
+))
+
+# Enumerated fields of the Command Options field of Leave commands (1 byte)
+NWK_LEAVE_SPEC = compile_spec((
+    ("nwk_leave_rejoin", "rejoin", 5, 1,
+     NWK_LEAVE_REJOIN_NAMES, "Unknown Rejoin state"),
+    ("nwk_leave_request", "request", 6, 1,
+     NWK_LEAVE_REQUEST_NAMES, "Unknown Request state"),
+    ("nwk_leave_rmch", "remove_children", 7, 1,
+     NWK_LEAVE_RMCH_NAMES, "Unknown Remove Children state"),
+))
+
+# Enumerated fields of the Capability Information field (1 byte)
+NWK_REJOINREQ_SPEC = compile_spec((
+    ("nwk_rejoinreq_apc", "alternate_pan_coordinator", 0, 1,
+     NWK_REJOINREQ_APC_NAMES, "Unknown APC state"),
+    ("nwk_rejoinreq_devtype", "device_type", 1, 1,
+     NWK_REJOINREQ_DEVTYPE_NAMES, "Unknown device type"),
+    ("nwk_rejoinreq_powsrc", "power_source", 2, 1,
+     NWK_REJOINREQ_POWSRC_NAMES, "Unknown power source"),
+    ("nwk_rejoinreq_rxidle", "receiver_on_when_idle", 3, 1,
+     NWK_REJOINREQ_RXIDLE_NAMES, "Unknown RX state when idle"),
+    ("nwk_rejoinreq_seccap", "security_capability", 6, 1,
+     NWK_REJOINREQ_SECCAP_NAMES, "Unknown MAC security capacity"),
+    ("nwk_rejoinreq_allocaddr", "allocate_address", 7, 1,
+     NWK_REJOINREQ_ALLOCADDR_NAMES, "Unknown address allocation"),
+))
+
+# Enumerated fields of the Rejoin Status field (1 byte)
+NWK_REJOINRSP_SPEC = compile_spec((
+    ("nwk_rejoinrsp_status", "rejoin_status", 0, 8,
+     NWK_REJOINRSP_STATUS_NAMES, "Unknown rejoin status"),
+))
+
+# Enumerated fields of the Command Options field of Link Status (1 byte)
+NWK_LINKSTATUS_SPEC = compile_spec((
+    ("nwk_linkstatus_first", "first_frame", 5, 1,
+     NWK_LINKSTATUS_FIRST_NAMES, "Unknown first frame status"),
+    ("nwk_linkstatus_last", "last_frame", 6, 1,
+     NWK_LINKSTATUS_LAST_NAMES, "Unknown last frame status"),
+))
+
+# Enumerated fields of the Command Options field of Network Reports (1 byte)
+NWK_NETWORKREPORT_SPEC = compile_spec((
+    ("nwk_networkreport_type", "report_command_identifier", 5, 3,
+     NWK_NETWORKREPORT_TYPE_NAMES, "Unknown report type"),
+))
+
+# Enumerated fields of the Command Options field of Network Updates (1 byte)
+NWK_NETWORKUPDATE_SPEC = compile_spec((
+    ("nwk_networkupdate_type", "update_command_identifier", 5, 3,
+     NWK_NETWORKUPDATE_TYPE_NAMES, "Unknown update type"),
+))
+
+# Enumerated fields of the Requested Timeout field (1 byte)
+NWK_EDTIMEOUTREQ_SPEC = compile_spec((
+    ("nwk_edtimeoutreq_reqtime", "req_timeout", 0, 8,
+     EDTIMEOUTREQ_REQTIME_NAMES, "Unknown requested timeout value"),
+))
+
+# Enumerated fields of the Status and Parent Information fields (2 bytes)
+NWK_EDTIMEOUTRSP_SPEC = compile_spec((
+    ("nwk_edtimeoutrsp_status", "status", 0, 8,
+     EDTIMEOUTRSP_STATUS_NAMES, "Unknown status value"),
+    ("nwk_edtimeoutrsp_poll", "mac_data_poll_keepalive", 8, 1,
+     EDTIMEOUTRSP_POLL_NAMES, "Unknown poll state"),
+    ("nwk_edtimeoutrsp_timeout", "ed_timeout_req_keepalive", 9, 1,
+     EDTIMEOUTRSP_TIMEOUT_NAMES, "Unknown timeout state"),
+))
+
+# Enumerated fields of the Beacon Payload field (2 bytes after its first)
+NWK_BEACON_SPEC = compile_spec((
+    ("nwk_beacon_protocolversion", "nwkc_protocol_version", 4, 4,
+     NWK_PROTOCOLVERSION_NAMES, "Unknown NWK protocol version"),
+    ("nwk_beacon_routercap", "router_capacity", 10, 1,
+     NWK_BEACON_ROUTERCAP_NAMES, "Unknown Router Capacity state"),
+    ("nwk_beacon_edcap", "end_device_capacity", 15, 1,
+     NWK_BEACON_EDCAP_NAMES, "Unknown End Device Capacity state"),
+))
 
 
 def nwk_routerequest(pkt):
     # Command Options field (1 byte)
-    config.entry["nwk_routerequest_mto"] = get_nwk_routerequest_mto(pkt)
-    config.entry["nwk_routerequest_ed"] = get_nwk_routerequest_ed(pkt)
-    config.entry["nwk_routerequest_mc"] = get_nwk_routerequest_mc(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_ROUTEREQUEST_SPEC)
 
     # Route Request Identifier field (1 byte)
     config.entry["nwk_routerequest_id"] = (
@@ -420,9 +493,7 @@ def nwk_routerequest(pkt):
 
 def nwk_routereply(pkt):
     # Command Options field (1 byte)
-    config.entry["nwk_routereply_eo"] = get_nwk_routereply_eo(pkt)
-    config.entry["nwk_routereply_er"] = get_nwk_routereply_er(pkt)
-    config.entry["nwk_routereply_mc"] = get_nwk_routereply_mc(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_ROUTEREPLY_SPEC)
 
     # Route Request Identifier field (1 byte)
     config.entry["nwk_routereply_id"] = (
@@ -465,7 +536,7 @@ def nwk_routereply(pkt):
 
 def nwk_networkstatus(pkt):
     # Status Code field (1 byte)
-    config.entry["nwk_networkstatus_code"] = get_nwk_networkstatus_code(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_NETWORKSTATUS_SPEC)
 
     # Destination Short Address field (2 bytes)
     config.entry["nwk_networkstatus_dstshortaddr"] = "0x{:04x}".format(
@@ -476,9 +547,7 @@ def nwk_networkstatus(pkt):
 
 def nwk_leave(pkt):
     # Command Options field (1 byte)
-    config.entry["nwk_leave_rejoin"] = get_nwk_leave_rejoin(pkt)
-    config.entry["nwk_leave_request"] = get_nwk_leave_request(pkt)
-    config.entry["nwk_leave_rmch"] = get_nwk_leave_rmch(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_LEAVE_SPEC)
 
     return
 
@@ -499,12 +568,7 @@ def nwk_routerecord(pkt):
 
 def nwk_rejoinreq(pkt):
     # Capability Information field (1 byte)
-    config.entry["nwk_rejoinreq_apc"] = get_nwk_rejoinreq_apc(pkt)
-    config.entry["nwk_rejoinreq_devtype"] = get_nwk_rejoinreq_devtype(pkt)
-    config.entry["nwk_rejoinreq_powsrc"] = get_nwk_rejoinreq_powsrc(pkt)
-    config.entry["nwk_rejoinreq_rxidle"] = get_nwk_rejoinreq_rxidle(pkt)
-    config.entry["nwk_rejoinreq_seccap"] = get_nwk_rejoinreq_seccap(pkt)
-    config.entry["nwk_rejoinreq_allocaddr"] = get_nwk_rejoinreq_allocaddr(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_REJOINREQ_SPEC)
 
     return
 
@@ -515,7 +579,7 @@ def nwk_rejoinrsp(pkt):
         pkt[ZigbeeNWKCommandPayload].network_address)
 
     # Rejoin Status field (1 byte)
-    config.entry["nwk_rejoinrsp_status"] = get_nwk_rejoinrsp_status(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_REJOINRSP_SPEC)
 
     return
 
@@ -525,8 +589,7 @@ def nwk_linkstatus(pkt, msg_queue):
     config.entry["nwk_linkstatus_count"] = (
         pkt[ZigbeeNWKCommandPayload].entry_count
     )
-    config.entry["nwk_linkstatus_first"] = get_nwk_linkstatus_first(pkt)
-    config.entry["nwk_linkstatus_last"] = get_nwk_linkstatus_last(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_LINKSTATUS_SPEC)
 
     # Link Status List field (variable)
     linkstatus_list = pkt[ZigbeeNWKCommandPayload].link_status_list
@@ -557,7 +620,7 @@ def nwk_networkreport(pkt, msg_queue):
     config.entry["nwk_networkreport_count"] = (
         pkt[ZigbeeNWKCommandPayload].report_information_count
     )
-    config.entry["nwk_networkreport_type"] = get_nwk_networkreport_type(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_NETWORKREPORT_SPEC)
 
     # EPID field (8 bytes)
     config.entry["nwk_networkreport_epid"] = format(
@@ -591,7 +654,7 @@ def nwk_networkupdate(pkt):
     config.entry["nwk_networkupdate_count"] = (
         pkt[ZigbeeNWKCommandPayload].update_information_count
     )
-    config.entry["nwk_networkupdate_type"] = get_nwk_networkupdate_type(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_NETWORKUPDATE_SPEC)
 
     # EPID field (8 bytes)
     config.entry["nwk_networkupdate_epid"] = format(
@@ -615,7 +678,7 @@ def nwk_networkupdate(pkt):
 
 def nwk_edtimeoutreq(pkt):
     # Requested Timeout field (1 byte)
-    config.entry["nwk_edtimeoutreq_reqtime"] = get_edtimeoutreq_reqtime(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_EDTIMEOUTREQ_SPEC)
 
     # End Device Configuration field (1 byte)
     config.entry["nwk_edtimeoutreq_edconf"] = (
@@ -626,19 +689,15 @@ def nwk_edtimeoutreq(pkt):
 
 
 def nwk_edtimeoutrsp(pkt):
-    # Status field (1 byte)
-    config.entry["nwk_edtimeoutrsp_status"] = get_edtimeoutrsp_status(pkt)
-
-    # Parent Information field (1 byte)
-    config.entry["nwk_edtimeoutrsp_poll"] = get_edtimeoutrsp_poll(pkt)
-    config.entry["nwk_edtimeoutrsp_timeout"] = get_edtimeoutrsp_timeout(pkt)
+    # Status field (1 byte) and Parent Information field (1 byte)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_EDTIMEOUTRSP_SPEC)
 
     return
 
 
 def nwk_command(pkt, msg_queue):
     # Command Identifier field (1 byte)
-    config.entry["nwk_cmd_id"] = get_nwk_command(pkt)
+    decode_layer(pkt[ZigbeeNWKCommandPayload], NWK_COMMAND_SPEC)
 
     # Compute the NWK Command Payload Length
     # The constant 14 was derived by summing the following:
@@ -807,10 +866,8 @@ def nwk_beacon(pkt):
     # Beacon Payload field (15 bytes)
     config.entry["nwk_beacon_protocolid"] = pkt[ZigBeeBeacon].proto_id
     config.entry["nwk_beacon_stackprofile"] = pkt[ZigBeeBeacon].stack_profile
-    config.entry["nwk_beacon_protocolversion"] = get_nwk_protocolversion(pkt)
-    config.entry["nwk_beacon_routercap"] = get_nwk_beacon_routercap(pkt)
     config.entry["nwk_beacon_devdepth"] = pkt[ZigBeeBeacon].device_depth
-    config.entry["nwk_beacon_edcap"] = get_nwk_beacon_edcap(pkt)
+    decode_layer(pkt[ZigBeeBeacon], NWK_BEACON_SPEC)
     config.entry["nwk_beacon_epid"] = format(
         pkt[ZigBeeBeacon].extended_pan_id, "016x")
     config.entry["nwk_beacon_txoffset"] = pkt[ZigBeeBeacon].tx_offset
@@ -821,100 +878,115 @@ def nwk_beacon(pkt):
 
 def nwk_auxiliary(pkt, msg_queue):
     # Security Control field (1 byte)
-    config.entry["nwk_aux_seclevel"] = get_nwk_aux_seclevel(pkt)
-    config.entry["nwk_aux_keytype"] = get_nwk_aux_keytype(pkt)
-    config.entry["nwk_aux_extnonce"] = get_nwk_aux_extnonce(pkt)
+    decode_layer(pkt[ZigbeeSecurityHeader], NWK_AUX_SPEC)
 
     # Frame Counter field (4 bytes)
     config.entry["nwk_aux_framecounter"] = pkt[ZigbeeSecurityHeader].fc
-    frame_counter = pkt[ZigbeeSecurityHeader].fc
 
     # Source Address field (0/8 bytes)
     if (config.entry["nwk_aux_extnonce"]
             == "The source address is present"):
         config.entry["nwk_aux_srcaddr"] = format(
             pkt[ZigbeeSecurityHeader].source, "016x")
-        potential_sources = set([pkt[ZigbeeSecurityHeader].source])
+
+    # Key Sequence Number field (0/1 byte)
+    if config.entry["nwk_aux_keytype"] == "Network Key":
+        config.entry["nwk_aux_keyseqnum"] = (
+            pkt[ZigbeeSecurityHeader].key_seqnum
+        )
+
+    # Attempt to decrypt the payload
+    nwk_header = pkt[ZigbeeNWK].copy()
+    nwk_header.remove_payload()
+    header = bytes(nwk_header)
+    sec_control = bytes(pkt[ZigbeeSecurityHeader])[0]
+    enc_payload = pkt[ZigbeeSecurityHeader].data[:-4]
+    mic = pkt[ZigbeeSecurityHeader].data[-4:]
+    nwk_decryption(header, sec_control, enc_payload, mic, msg_queue)
+
+
+def nwk_decryption(header, sec_control, enc_payload, mic, msg_queue):
+    frame_counter = config.entry["nwk_aux_framecounter"]
+
+    # Determine the potential extended source addresses
+    if (config.entry["nwk_aux_extnonce"]
+            == "The source address is present"):
+        potential_sources = [int(config.entry["nwk_aux_srcaddr"], 16)]
     elif (config.entry["nwk_aux_extnonce"]
             == "The source address is not present"):
-        potential_sources = set()
         shortaddr = config.entry["mac_srcshortaddr"]
         panid = config.entry["mac_dstpanid"]
 
         if (shortaddr, panid) in config.addresses:
             if config.addresses[(shortaddr, panid)] != "Conflicting Data":
-                potential_sources.add(
-                    int(config.addresses[(shortaddr, panid)], 16))
+                potential_sources = [
+                    int(config.addresses[(shortaddr, panid)], 16)]
             else:
-                potential_sources.update(
-                    [int(extendedaddr, 16)
-                     for extendedaddr in config.devices.keys()])
+                potential_sources = key_hints.ranked_sources(
+                    shortaddr, panid)
         else:
-            potential_sources.update(
-                [int(extendedaddr, 16)
-                 for extendedaddr in config.devices.keys()])
-
-        if config.entry["nwk_srcextendedaddr"] is not None:
-            potential_sources.add(
-                int(config.entry["nwk_srcextendedaddr"], 16))
-        if config.entry["mac_srcextendedaddr"] is not None:
-            potential_sources.add(
-                int(config.entry["mac_srcextendedaddr"], 16))
+            potential_sources = key_hints.ranked_sources(shortaddr, panid)
+
+        for extendedaddr in (config.entry["nwk_srcextendedaddr"],
+                             config.entry["mac_srcextendedaddr"]):
+            if extendedaddr is not None:
+                key_hints.add_source(potential_sources, extendedaddr)
     else:
         config.entry["error_msg"] = "Unknown NWK EN state"
         return
 
-    # Key Sequence Number field (1 byte)
+    # Determine the potential keys
     if config.entry["nwk_aux_keytype"] == "Network Key":
-        config.entry["nwk_aux_keyseqnum"] = (
-            pkt[ZigbeeSecurityHeader].key_seqnum
-        )
-        key_seqnum = pkt[ZigbeeSecurityHeader].key_seqnum
+        key_seqnum = config.entry["nwk_aux_keyseqnum"]
         potential_keys = config.network_keys.values()
     else:
         config.entry["error_msg"] = "Unexpected key type on the NWK layer"
         return
 
-    # Attempt to decrypt the payload
-    nwk_header = pkt[ZigbeeNWK].copy()
-    nwk_header.remove_payload()
-    header = bytes(nwk_header)
-    sec_control = bytes(pkt[ZigbeeSecurityHeader])[0]
-    enc_payload = pkt[ZigbeeSecurityHeader].data[:-4]
-    mic = pkt[ZigbeeSecurityHeader].data[-4:]
-    for source_addr in potential_sources:
-        for key in potential_keys:
-            dec_payload, auth_payload = crypto.zigbee_dec_ver(
-                key, source_addr, frame_counter, sec_control,
-                header, key_seqnum, enc_payload, mic)
-
-            # Check whether the decrypted payload is authentic
-            if auth_payload:
-                config.entry["nwk_aux_deckey"] = key.hex()
-                config.entry["nwk_aux_decsrc"] = format(source_addr, "016x")
-                config.entry["nwk_aux_decpayload"] = dec_payload.hex()
-
-                # NWK Payload field (variable)
-                if config.entry["nwk_frametype"] == "NWK Command":
-                    dec_pkt = ZigbeeNWKCommandPayload(dec_payload)
+    # Attempt to decrypt the payload, starting with the keys that last
+    # verified payloads from the potential sources
+    keytype = config.entry["nwk_aux_keytype"]
+    shortaddr = config.entry["mac_srcshortaddr"]
+    panid = config.entry["mac_dstpanid"]
+    for batch in key_hints.candidate_batches(
+            keytype, potential_sources, potential_keys, panid, key_seqnum):
+        verified_candidate = crypto.zigbee_batch_dec_ver(
+            batch, frame_counter, sec_control,
+            header, key_seqnum, enc_payload, mic)
+
+        # Check whether a decrypted payload is authentic
+        if verified_candidate is not None:
+            source_addr, key, dec_payload = verified_candidate
+            key_hints.verified(
+                keytype, source_addr, shortaddr, panid, key_seqnum, key)
+            config.entry["nwk_aux_deckey"] = key.hex()
+            config.entry["nwk_aux_decsrc"] = format(source_addr, "016x")
+            config.entry["nwk_aux_decpayload"] = dec_payload
+
+            # NWK Payload field (variable)
+            if config.entry["nwk_frametype"] == "NWK Command":
+                dec_pkt = ZigbeeNWKCommandPayload(dec_payload)
+                if config.store_show:
                     config.entry["nwk_aux_decshow"] = (
                         dec_pkt.show(dump=True)
                     )
-                    nwk_command(dec_pkt, msg_queue)
-                    return
-                elif config.entry["nwk_frametype"] == "NWK Data":
-                    dec_pkt = ZigbeeAppDataPayload(dec_payload)
+                nwk_command(dec_pkt, msg_queue)
+                return
+            elif config.entry["nwk_frametype"] == "NWK Data":
+                dec_pkt = ZigbeeAppDataPayload(dec_payload)
+                if config.store_show:
                     config.entry["nwk_aux_decshow"] = (
                         dec_pkt.show(dump=True)
                     )
-                    aps_fields(dec_pkt, msg_queue)
-                    return
-                else:
-                    config.entry["error_msg"] = (
-                        "Unexpected format of the decrypted NWK payload"
-                    )
-                    return
+                aps_fields(dec_pkt, msg_queue)
+                return
+            else:
+                config.entry["error_msg"] = (
+                    "Unexpected format of the decrypted NWK payload"
+                )
+                return
 
+    key_hints.unverified()
     msg_queue.put(
         (config.DEBUG_MSG,
          "Unable to decrypt with a {} the NWK payload of packet #{} in {}"
@@ -940,33 +1012,7 @@ def nwk_fields(pkt, msg_queue):
         return
 
     # Frame Control field (2 bytes)
-    config.entry["nwk_frametype"] = get_nwk_frametype(pkt)
-    config.entry["nwk_protocolversion"] = get_nwk_protocolversion(pkt)
-    config.entry["nwk_discroute"] = get_nwk_discroute(pkt)
-    if pkt[ZigbeeNWK].flags.multicast:
-        config.entry["nwk_multicast"] = "NWK Multicast Enabled"
-    else:
-        config.entry["nwk_multicast"] = "NWK Multicast Disabled"
-    if pkt[ZigbeeNWK].flags.security:
-        config.entry["nwk_security"] = "NWK Security Enabled"
-    else:
-        config.entry["nwk_security"] = "NWK Security Disabled"
-    if pkt[ZigbeeNWK].flags.source_route:
-        config.entry["nwk_srcroute"] = "NWK Source Route Included"
-    else:
-        config.entry["nwk_srcroute"] = "NWK Source Route Omitted"
-    if pkt[ZigbeeNWK].flags.extended_dst:
-        config.entry["nwk_extendeddst"] = "NWK Extended Destination Included"
-    else:
-        config.entry["nwk_extendeddst"] = "NWK Extended Destination Omitted"
-    if pkt[ZigbeeNWK].flags.extended_src:
-        config.entry["nwk_extendedsrc"] = "NWK Extended Source Included"
-    else:
-        config.entry["nwk_extendedsrc"] = "NWK Extended Source Omitted"
-    if pkt[ZigbeeNWK].flags.reserved1:
-        config.entry["nwk_edinitiator"] = "NWK End Device Initiator"
-    else:
-        config.entry["nwk_edinitiator"] = "NWK Not End Device Initiator"
+    decode_layer(pkt[ZigbeeNWK], NWK_FCF_SPEC)
 
     # Destination Short Address field (2 bytes)
     config.entry["nwk_dstshortaddr"] = "0x{:04x}".format(
@@ -14,24 +14,68 @@
 # You should have received a copy of the GNU General Public License
 # along with Zigator. If not, see <https://www.gnu.org/licenses/>.
 
+import copy
 import os
 
-from scapy.all import PcapReader
+from scapy.all import conf
 
 from .. import config
+from . import key_hints
+from . import shared_store
 from .derive_info import derive_info
+from .pcap_reader import capture_reader
 from .phy_fields import phy_fields
+from .raw_fields import raw_fields
+from .ring_buffer import flush_pkts
+from .ring_buffer import put_pkt
 
 
-def pcap_file(filepath, msg_queue):
-    """Parse all packets in the provided pcap file."""
+# Data link type of IEEE 802.15.4 packets that include the FCS field
+DLT_IEEE802_15_4_WITHFCS = 195
+
+
+def dissect_pkt(pkt_class, raw):
+    # Fall back to a raw layer if Scapy fails to dissect the packet
+    try:
+        return pkt_class(bytes(raw))
+    except Exception:
+        return conf.raw_layer(bytes(raw))
+
+
+def parse_pkt(linktype, pkt_class, raw, pkt, msg_queue):
+    # Use Scapy's dissection of the packet only for uncommon packets
+    if (linktype != DLT_IEEE802_15_4_WITHFCS
+            or not raw_fields(raw, msg_queue)):
+        config.reset_entries(keep=["pcap_directory",
+                                   "pcap_filename",
+                                   "pkt_num",
+                                   "pkt_time",
+                                   "pkt_bytes",
+                                   "pkt_linktype",
+                                   "pkt_show"])
+        if pkt is None:
+            pkt = dissect_pkt(pkt_class, raw)
+        phy_fields(pkt, msg_queue)
+
+    # Derive additional information from the parsed packet
+    if config.entry["error_msg"] is None:
+        derive_info()
+
+
+def pcap_file(filepath, msg_queue, pkt_range=None):
+    """Parse all packets in the provided pcap file.
+
+    If a byte range of the pcap file is provided, only its packets are
+    parsed. The number of parsed packets is returned.
+    """
     # Keep a copy of each dictionary that may change after parsing packets
     init_network_keys = config.network_keys.copy()
     init_link_keys = config.link_keys.copy()
     init_networks = config.networks.copy()
-    init_devices = config.devices.copy()
+    init_devices = copy.deepcopy(config.devices)
     init_addresses = config.addresses.copy()
-    init_pairs = config.pairs.copy()
+    init_pairs = copy.deepcopy(config.pairs)
+    init_hits, init_misses, init_attempts = key_hints.counters()
 
     # Reset all data entries in the dictionary
     config.reset_entries()
@@ -42,42 +86,65 @@ def pcap_file(filepath, msg_queue):
     config.entry["pcap_filename"] = tail
 
     # Parse the packets of the pcap file
-    msg_queue.put(
-        (config.INFO_MSG,
-         "Reading packets from the \"{}\" file..."
-         "".format(filepath)))
-    config.entry["pkt_num"] = 0
-    pcap_reader = PcapReader(filepath)
-    for pkt in pcap_reader:
+    if pkt_range is None:
+        start, end, init_pkt_num = None, None, 0
+        msg_queue.put(
+            (config.INFO_MSG,
+             "Reading packets from the \"{}\" file..."
+             "".format(filepath)))
+    else:
+        start, end, init_pkt_num = pkt_range
+        msg_queue.put(
+            (config.INFO_MSG,
+             "Reading packets from bytes {} to {} of the \"{}\" file..."
+             "".format(start, end, filepath)))
+    config.entry["pkt_num"] = init_pkt_num
+    pkt_counter = 0
+    try:
+        capture_records = capture_reader(filepath, msg_queue, start, end)
+    except ValueError as err:
+        msg_queue.put((config.ERROR_MSG, str(err)))
+        return 0
+    pkt_classes = {}
+    for linktype, pkt_time, raw in capture_records:
+        # The interfaces of a pcapng file may have different link types
+        if linktype not in pkt_classes.keys():
+            pkt_classes[linktype] = conf.l2types.get(linktype,
+                                                     conf.raw_layer)
+        pkt_class = pkt_classes[linktype]
+
         # Collect some data about the packet
         config.entry["pkt_num"] += 1
-        config.entry["pkt_time"] = float(pkt.time)
-        config.entry["pkt_bytes"] = bytes(pkt).hex()
-        config.entry["pkt_show"] = pkt.show(dump=True)
+        pkt_counter += 1
+        config.entry["pkt_time"] = pkt_time
+        config.entry["pkt_bytes"] = bytes(raw)
+        config.entry["pkt_linktype"] = linktype
+        if config.store_show:
+            pkt = dissect_pkt(pkt_class, raw)
+            config.entry["pkt_show"] = pkt.show(dump=True)
+        else:
+            pkt = None
 
-        # Collect more data about the packet from the PHY layer and onward
-        phy_fields(pkt, msg_queue)
+        # Collect more data about the packet from the PHY layer and onward,
+        # using what the other workers learned up to this point
+        shared_store.poll()
+        parse_pkt(linktype, pkt_class, raw, pkt, msg_queue)
+        shared_store.publish()
 
-        # Derive additional information from the parsed packet
-        if config.entry["error_msg"] is None:
-            derive_info()
-
-        # Send a copy of the collected data to the main process
-        msg_queue.put(
-            (config.PKT_MSG,
-             config.entry.copy()))
+        # Send the collected data to the main process
+        put_pkt(config.entry_row(), msg_queue)
 
         # Reset only the data entries that the next packet may change
         config.reset_entries(keep=["pcap_directory",
                                    "pcap_filename",
                                    "pkt_num"])
-    pcap_reader.close()
+    flush_pkts(msg_queue)
 
     # Log the number of parsed packets from this pcap file
     msg_queue.put(
         (config.INFO_MSG,
          "Parsed {} packets from the \"{}\" file"
-         "".format(config.entry["pkt_num"], filepath)))
+         "".format(pkt_counter, filepath)))
 
     # Send a copy of each dictionary that changed after parsing packets
     if config.network_keys != init_network_keys:
@@ -92,3 +159,13 @@ def pcap_file(filepath, msg_queue):
         msg_queue.put((config.ADDRESSES_MSG, config.addresses.copy()))
     if config.pairs != init_pairs:
         msg_queue.put((config.PAIRS_MSG, config.pairs.copy()))
+
+    # Send the changes of the key hint counters after parsing packets
+    hits, misses, attempts = key_hints.counters()
+    if attempts != init_attempts or misses != init_misses:
+        msg_queue.put(
+            (config.KEY_HINTS_MSG,
+             (hits - init_hits, misses - init_misses,
+              attempts - init_attempts)))
+
+    return pkt_counter
@@ -0,0 +1,553 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import bz2
+import gzip
+import lzma
+import mmap
+import os
+import struct
+
+from .. import config
+
+
+# Byte order and timestamp resolution for each magic number
+PCAP_MAGIC_NUMBERS = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1000000),
+    b"\xa1\xb2\xc3\xd4": (">", 1000000),
+    b"\x4d\x3c\xb2\xa1": ("<", 1000000000),
+    b"\xa1\xb2\x3c\x4d": (">", 1000000000),
+}
+
+# Length of the global header and of each record header
+PCAP_GLOBAL_HEADER_LENGTH = 24
+PCAP_RECORD_HEADER_LENGTH = 16
+
+# Block type of the section header block, which is identical in both byte
+# orders, and the byte order for each byte-order magic of pcapng files
+PCAPNG_SHB_MAGIC = b"\x0a\x0d\x0d\x0a"
+PCAPNG_BYTE_ORDER_MAGICS = {
+    b"\x4d\x3c\x2b\x1a": "<",
+    b"\x1a\x2b\x3c\x4d": ">",
+}
+
+# Block types of pcapng files
+PCAPNG_SHB_TYPE = 0x0a0d0d0a
+PCAPNG_IDB_TYPE = 0x00000001
+PCAPNG_PB_TYPE = 0x00000002
+PCAPNG_SPB_TYPE = 0x00000003
+PCAPNG_EPB_TYPE = 0x00000006
+
+# Minimum length of the block body of each pcapng block type
+PCAPNG_MIN_BODY_LENGTHS = {
+    PCAPNG_SHB_TYPE: 16,
+    PCAPNG_IDB_TYPE: 8,
+    PCAPNG_PB_TYPE: 20,
+    PCAPNG_SPB_TYPE: 4,
+    PCAPNG_EPB_TYPE: 20,
+}
+
+# Option codes of pcapng files
+PCAPNG_OPT_ENDOFOPT = 0
+PCAPNG_OPT_IF_TSRESOL = 9
+PCAPNG_OPT_IF_TSOFFSET = 14
+
+# Length of the block type, the block total length, and the first four
+# bytes of the block body, which every pcapng block contains
+PCAPNG_BLOCK_HEADER_LENGTH = 12
+
+# Extensions of capture files and of their compressed versions
+CAPTURE_EXTENSIONS = {".pcap", ".pcapng"}
+COMPRESSION_EXTENSIONS = {".gz", ".bz2", ".xz"}
+
+# File opener for each magic number of compressed capture files
+COMPRESSION_MAGIC_NUMBERS = {
+    b"\x1f\x8b": gzip.open,
+    b"BZh": bz2.open,
+    b"\xfd7zXZ\x00": lzma.open,
+}
+
+
+def pcap_records(pcap_view, byte_order, tsresol, snaplen, start, end,
+                 filepath, msg_queue):
+    record_header = struct.Struct(byte_order + "IIII")
+    offset = start
+    while offset < end:
+        if offset + PCAP_RECORD_HEADER_LENGTH > end:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored a truncated record header at the end of "
+                 "the \"{}\" file".format(filepath)))
+            return
+        # Timestamp Seconds field (4 bytes)
+        # Timestamp Fraction field (4 bytes)
+        # Captured Packet Length field (4 bytes)
+        # Original Packet Length field (4 bytes)
+        ts_sec, ts_frac, incl_len, _ = record_header.unpack_from(
+            pcap_view, offset)
+        offset += PCAP_RECORD_HEADER_LENGTH
+        if incl_len > snaplen or offset + incl_len > end:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored the remaining data of the \"{}\" file, "
+                 "due to an invalid captured packet length of {} bytes"
+                 "".format(filepath, incl_len)))
+            return
+
+        # Packet Data field (variable)
+        yield ((ts_sec*tsresol + ts_frac) / tsresol,
+               pcap_view[offset:offset+incl_len])
+        offset += incl_len
+
+
+def map_pcap(filepath):
+    with open(filepath, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size < PCAP_GLOBAL_HEADER_LENGTH:
+            raise ValueError("The file \"{}\" is too short to be a pcap file"
+                             "".format(filepath))
+        pcap_map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    pcap_view = memoryview(pcap_map)
+
+    # Magic Number field (4 bytes)
+    magic_number = bytes(pcap_view[0:4])
+    if magic_number not in PCAP_MAGIC_NUMBERS.keys():
+        raise ValueError("Unknown magic number 0x{} in the \"{}\" file"
+                         "".format(magic_number.hex(), filepath))
+    byte_order, tsresol = PCAP_MAGIC_NUMBERS[magic_number]
+
+    # Version Number fields (4 bytes)
+    # Time Zone Offset field (4 bytes)
+    # Timestamp Accuracy field (4 bytes)
+    # Snapshot Length field (4 bytes)
+    # Data Link Type field (4 bytes)
+    snaplen, linktype = struct.unpack_from(
+        byte_order + "II", pcap_view, 16)
+    if snaplen == 0:
+        # Some capture tools leave the snapshot length unspecified
+        snaplen = 0xffffffff
+
+    return pcap_view, byte_order, tsresol, snaplen, linktype
+
+
+def pcap_reader(filepath, msg_queue, start=None, end=None):
+    """Return the data link type and an iterator over the pcap records.
+
+    The file is memory-mapped and each record is yielded as a tuple of
+    its timestamp and a read-only memoryview of its packet data. The
+    start and end offsets, if provided, must be aligned to records.
+    """
+    pcap_view, byte_order, tsresol, snaplen, linktype = map_pcap(filepath)
+    if start is None:
+        start = PCAP_GLOBAL_HEADER_LENGTH
+    if end is None:
+        end = len(pcap_view)
+
+    return linktype, pcap_records(pcap_view, byte_order, tsresol, snaplen,
+                                  start, end, filepath, msg_queue)
+
+
+def pcap_ranges(filepath, num_ranges):
+    """Split a pcap file into record-aligned byte ranges.
+
+    Each range is returned as a tuple of its start offset, its end
+    offset, and the number of packets that precede it in the file.
+    """
+    pcap_view, byte_order, _, snaplen, _ = map_pcap(filepath)
+    record_header = struct.Struct(byte_order + "IIII")
+    filesize = len(pcap_view)
+    range_size = (filesize - PCAP_GLOBAL_HEADER_LENGTH) / num_ranges
+
+    # Walk the record headers and start a new range at the first record
+    # that begins after each boundary
+    ranges = []
+    range_start = PCAP_GLOBAL_HEADER_LENGTH
+    range_pkts = 0
+    boundary = PCAP_GLOBAL_HEADER_LENGTH + range_size
+    offset = PCAP_GLOBAL_HEADER_LENGTH
+    pkt_counter = 0
+    while offset + PCAP_RECORD_HEADER_LENGTH <= filesize:
+        if offset >= boundary and len(ranges) < num_ranges - 1:
+            ranges.append((range_start, offset, range_pkts))
+            range_start = offset
+            range_pkts = pkt_counter
+            while boundary <= offset:
+                boundary += range_size
+        incl_len = record_header.unpack_from(pcap_view, offset)[2]
+        if incl_len > snaplen:
+            break
+        offset += PCAP_RECORD_HEADER_LENGTH + incl_len
+        pkt_counter += 1
+    ranges.append((range_start, filesize, range_pkts))
+    pcap_view.release()
+
+    return ranges
+
+
+def capture_records(fp, byte_order, tsresol, snaplen, linktype, filepath,
+                    msg_queue):
+    record_header = struct.Struct(byte_order + "IIII")
+    while True:
+        header = fp.read(PCAP_RECORD_HEADER_LENGTH)
+        if len(header) == 0:
+            return
+        elif len(header) < PCAP_RECORD_HEADER_LENGTH:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored a truncated record header at the end of "
+                 "the \"{}\" file".format(filepath)))
+            return
+        # Timestamp Seconds field (4 bytes)
+        # Timestamp Fraction field (4 bytes)
+        # Captured Packet Length field (4 bytes)
+        # Original Packet Length field (4 bytes)
+        ts_sec, ts_frac, incl_len, _ = record_header.unpack(header)
+        if incl_len > snaplen:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored the remaining data of the \"{}\" file, "
+                 "due to an invalid captured packet length of {} bytes"
+                 "".format(filepath, incl_len)))
+            return
+
+        # Packet Data field (variable)
+        data = fp.read(incl_len)
+        if len(data) < incl_len:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored a truncated record at the end of "
+                 "the \"{}\" file".format(filepath)))
+            return
+        yield linktype, (ts_sec*tsresol + ts_frac) / tsresol, data
+
+
+def pcapng_options(body, offset, byte_order):
+    # Return the value of each option of a block, keyed by its code
+    options = {}
+    option_header = struct.Struct(byte_order + "HH")
+    while offset + 4 <= len(body):
+        # Option Code field (2 bytes)
+        # Option Length field (2 bytes)
+        code, length = option_header.unpack_from(body, offset)
+        offset += 4
+        if code == PCAPNG_OPT_ENDOFOPT:
+            break
+
+        # Option Value field (variable)
+        options[code] = body[offset:offset+length]
+        offset += (length + 3) & ~3
+    return options
+
+
+def pcapng_interface(body, byte_order):
+    # LinkType field (2 bytes)
+    # Reserved field (2 bytes)
+    # SnapLen field (4 bytes)
+    linktype, _, snaplen = struct.unpack_from(byte_order + "HHI", body, 0)
+    if snaplen == 0:
+        snaplen = 0xffffffff
+
+    # Options field (variable)
+    options = pcapng_options(body, 8, byte_order)
+    tsresol = 1000000
+    if len(options.get(PCAPNG_OPT_IF_TSRESOL, b"")) == 1:
+        # The resolution is either a negative power of 10 or of 2
+        value = options[PCAPNG_OPT_IF_TSRESOL][0]
+        if value & 0x80:
+            tsresol = 2**(value & 0x7f)
+        else:
+            tsresol = 10**value
+    tsoffset = 0
+    if len(options.get(PCAPNG_OPT_IF_TSOFFSET, b"")) == 8:
+        tsoffset = struct.unpack(byte_order + "q",
+                                 options[PCAPNG_OPT_IF_TSOFFSET])[0]
+
+    return linktype, tsresol, tsoffset, snaplen
+
+
+def pcapng_records(fp, header, filepath, msg_queue):
+    byte_order = None
+    interfaces = []
+    pkt_time = 0.0
+    while True:
+        if len(header) == 0:
+            return
+        elif len(header) < PCAPNG_BLOCK_HEADER_LENGTH:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored a truncated block header at the end of "
+                 "the \"{}\" file".format(filepath)))
+            return
+
+        # Block Type field (4 bytes)
+        block_type = struct.unpack_from((byte_order or "<") + "I",
+                                        header, 0)[0]
+        if block_type == PCAPNG_SHB_TYPE:
+            # Each section defines its own byte order and interfaces
+            if header[8:12] not in PCAPNG_BYTE_ORDER_MAGICS.keys():
+                msg_queue.put(
+                    (config.WARNING_MSG,
+                     "Ignored the remaining data of the \"{}\" file, "
+                     "due to an unknown byte-order magic 0x{}"
+                     "".format(filepath, header[8:12].hex())))
+                return
+            byte_order = PCAPNG_BYTE_ORDER_MAGICS[header[8:12]]
+            interfaces = []
+
+        # Block Total Length field (4 bytes)
+        total_length = struct.unpack_from(byte_order + "I", header, 4)[0]
+        if (total_length % 4 != 0
+                or total_length - 12 < PCAPNG_MIN_BODY_LENGTHS.get(
+                    block_type, 0)):
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored the remaining data of the \"{}\" file, "
+                 "due to an invalid block length of {} bytes"
+                 "".format(filepath, total_length)))
+            return
+
+        # Block Body field (variable)
+        body = header[8:] + fp.read(total_length - PCAPNG_BLOCK_HEADER_LENGTH)
+        if len(body) < total_length - 8:
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored a truncated block at the end of "
+                 "the \"{}\" file".format(filepath)))
+            return
+        body = body[:-4]
+        header = fp.read(PCAPNG_BLOCK_HEADER_LENGTH)
+
+        if block_type == PCAPNG_IDB_TYPE:
+            interfaces.append(pcapng_interface(body, byte_order))
+            continue
+        elif block_type == PCAPNG_EPB_TYPE:
+            # Interface ID field (4 bytes)
+            # Timestamp (High) field (4 bytes)
+            # Timestamp (Low) field (4 bytes)
+            # Captured Packet Length field (4 bytes)
+            # Original Packet Length field (4 bytes)
+            interface_id, ts_high, ts_low, incl_len, _ = struct.unpack_from(
+                byte_order + "IIIII", body, 0)
+            offset = 20
+        elif block_type == PCAPNG_SPB_TYPE:
+            # Original Packet Length field (4 bytes)
+            interface_id, ts_high, ts_low = 0, None, None
+            incl_len = struct.unpack_from(byte_order + "I", body, 0)[0]
+            if len(interfaces) > 0:
+                incl_len = min(incl_len, interfaces[0][3])
+            offset = 4
+        elif block_type == PCAPNG_PB_TYPE:
+            # Interface ID field (2 bytes)
+            # Drops Count field (2 bytes)
+            # Timestamp (High) field (4 bytes)
+            # Timestamp (Low) field (4 bytes)
+            # Captured Packet Length field (4 bytes)
+            # Original Packet Length field (4 bytes)
+            interface_id, _, ts_high, ts_low, incl_len, _ = (
+                struct.unpack_from(byte_order + "HHIIII", body, 0)
+            )
+            offset = 20
+        else:
+            # Other blocks do not contain packets
+            continue
+
+        if interface_id >= len(interfaces):
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored a packet of the undefined interface {} in "
+                 "the \"{}\" file".format(interface_id, filepath)))
+            continue
+        linktype, tsresol, tsoffset, snaplen = interfaces[interface_id]
+        if incl_len > snaplen or offset + incl_len > len(body):
+            msg_queue.put(
+                (config.WARNING_MSG,
+                 "Ignored the remaining data of the \"{}\" file, "
+                 "due to an invalid captured packet length of {} bytes"
+                 "".format(filepath, incl_len)))
+            return
+
+        # Simple packet blocks inherit the timestamp of the previous packet
+        if ts_high is not None:
+            pkt_time = tsoffset + ((ts_high << 32) | ts_low) / tsresol
+
+        # Packet Data field (variable)
+        yield linktype, pkt_time, body[offset:offset+incl_len]
+
+
+def stream_records(fp, records, filepath, msg_queue):
+    # Decompression errors end the stream without discarding its packets
+    try:
+        for record in records:
+            yield record
+    except (OSError, EOFError, lzma.LZMAError) as err:
+        msg_queue.put(
+            (config.WARNING_MSG,
+             "Ignored the remaining data of the \"{}\" file, "
+             "due to a read error: {}".format(filepath, err)))
+    finally:
+        fp.close()
+
+
+def capture_stream(fp, filepath, msg_queue):
+    """Return an iterator over the records of a pcap or pcapng stream.
+
+    The records are read sequentially from a file object, which may
+    decompress the file or be a named pipe, as they become available.
+    Each record is yielded as a tuple of its data link type, its
+    timestamp, and its packet data, since the interfaces of a pcapng
+    stream may have different data link types.
+    """
+    try:
+        # Magic Number or Block Type field (4 bytes)
+        magic_number = fp.read(4)
+        if magic_number in PCAP_MAGIC_NUMBERS.keys():
+            header = magic_number + fp.read(PCAP_GLOBAL_HEADER_LENGTH - 4)
+        elif magic_number == PCAPNG_SHB_MAGIC:
+            header = magic_number + fp.read(PCAPNG_BLOCK_HEADER_LENGTH - 4)
+        elif len(magic_number) < 4:
+            raise ValueError("The file \"{}\" is too short to be a pcap file"
+                             "".format(filepath))
+        else:
+            raise ValueError("Unknown magic number 0x{} in the \"{}\" file"
+                             "".format(magic_number.hex(), filepath))
+    except (OSError, EOFError, lzma.LZMAError) as err:
+        raise ValueError("Unable to read the \"{}\" file: {}"
+                         "".format(filepath, err))
+
+    if magic_number == PCAPNG_SHB_MAGIC:
+        records = pcapng_records(fp, header, filepath, msg_queue)
+        return stream_records(fp, records, filepath, msg_queue)
+    elif len(header) < PCAP_GLOBAL_HEADER_LENGTH:
+        raise ValueError("The file \"{}\" is too short to be a pcap file"
+                         "".format(filepath))
+    byte_order, tsresol = PCAP_MAGIC_NUMBERS[magic_number]
+
+    # Version Number fields (4 bytes)
+    # Time Zone Offset field (4 bytes)
+    # Timestamp Accuracy field (4 bytes)
+    # Snapshot Length field (4 bytes)
+    # Data Link Type field (4 bytes)
+    snaplen, linktype = struct.unpack_from(byte_order + "II", header, 16)
+    if snaplen == 0:
+        snaplen = 0xffffffff
+
+    records = capture_records(fp, byte_order, tsresol, snaplen, linktype,
+                              filepath, msg_queue)
+    return stream_records(fp, records, filepath, msg_queue)
+
+
+def is_capture_file(filepath):
+    # Compressed capture files keep the extension of the capture file
+    filename = os.path.basename(filepath).lower()
+    root, ext = os.path.splitext(filename)
+    if ext in COMPRESSION_EXTENSIONS:
+        root, ext = os.path.splitext(root)
+    return ext in CAPTURE_EXTENSIONS and os.path.isfile(filepath)
+
+
+def xz_uncompressed_size(fp, filesize):
+    # Stream Footer field (12 bytes)
+    if filesize < 24:
+        return None
+    fp.seek(filesize - 12)
+    footer = fp.read(12)
+    if footer[10:12] != b"YZ":
+        return None
+    backward_size = (struct.unpack_from("<I", footer, 4)[0] + 1) * 4
+    if backward_size > filesize - 24:
+        return None
+
+    # Index field (variable)
+    fp.seek(filesize - 12 - backward_size)
+    index = fp.read(backward_size)
+    if index[0] != 0x00:
+        return None
+    values = []
+    value = 0
+    shift = 0
+    for byte in index[1:]:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value = 0
+            shift = 0
+        if len(values) > 0 and len(values) == 2*values[0] + 1:
+            break
+    else:
+        return None
+
+    # Each record consists of its unpadded size and its uncompressed size
+    return sum(values[2::2])
+
+
+def capture_size(filepath):
+    """Return the estimated number of bytes in a capture file.
+
+    The uncompressed size of gzip files and xz files is read from their
+    trailer and index respectively, while the size of other files is
+    their actual size.
+    """
+    filesize = os.path.getsize(filepath)
+    with open(filepath, "rb") as fp:
+        magic_number = fp.read(6)
+        if magic_number.startswith(b"\x1f\x8b") and filesize >= 18:
+            # ISIZE field (4 bytes) of the last member
+            fp.seek(filesize - 4)
+            isize = struct.unpack("<I", fp.read(4))[0]
+            return max(filesize, isize)
+        elif magic_number.startswith(b"\xfd7zXZ\x00"):
+            uncompressed_size = xz_uncompressed_size(fp, filesize)
+            if uncompressed_size is not None:
+                return max(filesize, uncompressed_size)
+    return filesize
+
+
+def open_capture(filepath):
+    # Compressed capture files are decompressed as they are read
+    fp = open(filepath, "rb")
+    magic_number = fp.read(6)
+    for compression_magic, opener in COMPRESSION_MAGIC_NUMBERS.items():
+        if magic_number.startswith(compression_magic):
+            fp.close()
+            return opener(filepath, "rb")
+    fp.seek(0)
+    return fp
+
+
+def capture_reader(filepath, msg_queue, start=None, end=None):
+    """Return an iterator over the records of a capture file.
+
+    Uncompressed pcap files are memory-mapped, so that they can be
+    split into byte ranges, while pcapng files and compressed capture
+    files are decoded as streams. Each record is yielded as a tuple of
+    its data link type, its timestamp, and its packet data.
+    """
+    with open(filepath, "rb") as fp:
+        magic_number = fp.read(4)
+    if magic_number in PCAP_MAGIC_NUMBERS.keys():
+        linktype, pcap_records = pcap_reader(filepath, msg_queue, start, end)
+        return ((linktype, pkt_time, raw) for pkt_time, raw in pcap_records)
+    elif start is not None or end is not None:
+        raise ValueError("Only uncompressed pcap files can be split into "
+                         "byte ranges, unlike the \"{}\" file"
+                         "".format(filepath))
+
+    fp = open_capture(filepath)
+    try:
+        return capture_stream(fp, filepath, msg_queue)
+    except ValueError:
+        fp.close()
+        raise
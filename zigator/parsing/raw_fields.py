@@ -0,0 +1,546 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import struct
+
+from scapy.all import ZigbeeAppCommandPayload
+from scapy.all import ZigbeeNWKCommandPayload
+
+from .. import config
+from .aps_fields import APS_AUX_SPEC
+from .aps_fields import APS_EXTHDR_SPEC
+from .aps_fields import APS_FCF_SPEC
+from .aps_fields import aps_command_payload
+from .aps_fields import aps_decryption
+from .aps_fields import lookup_aps_clustername
+from .aps_fields import lookup_aps_profilename
+from .layer_spec import decode_bits
+from .mac_fields import MAC_ASSOCREQ_SPEC
+from .mac_fields import MAC_ASSOCRSP_SPEC
+from .mac_fields import MAC_BEACON_SPEC
+from .mac_fields import MAC_COMMAND_SPEC
+from .mac_fields import MAC_DISASSOC_SPEC
+from .mac_fields import MAC_FCF_SPEC
+from .nwk_fields import NWK_AUX_SPEC
+from .nwk_fields import NWK_BEACON_SPEC
+from .nwk_fields import NWK_FCF_SPEC
+from .nwk_fields import nwk_command
+from .nwk_fields import nwk_decryption
+from .zcl_fields import ZCL_FCF_SPEC
+from .zcl_fields import ZCL_GLOBALCOMMAND_SPEC
+from .zcl_fields import get_zcl_clusterspecificcommand
+
+
+def init_fcs_table():
+    # Reflected CRC-16 lookup table for the polynomial x^16 + x^12 + x^5 + 1
+    fcs_table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0x8408
+            else:
+                crc >>= 1
+        fcs_table.append(crc)
+    return tuple(fcs_table)
+
+
+FCS_TABLE = init_fcs_table()
+
+
+def compute_fcs(data):
+    fcs = 0
+    for byte in data:
+        fcs = (fcs >> 8) ^ FCS_TABLE[(fcs ^ byte) & 0xff]
+    return fcs
+
+
+def raw_extendedaddr(raw, offset):
+    return raw[offset:offset+8][::-1].hex()
+
+
+def raw_shortaddr(raw, offset):
+    return "0x{:04x}".format(raw[offset] | (raw[offset+1] << 8))
+
+
+def raw_mac_addressing(raw, offset, end, fcf):
+    panidcomp = (fcf[0] >> 6) & 1
+    dstaddr_mode = (fcf[1] >> 2) & 3
+    srcaddr_mode = (fcf[1] >> 6) & 3
+
+    # Make sure that all the addressing fields are included
+    length = 0
+    if dstaddr_mode == 2:
+        length += 4
+    elif dstaddr_mode == 3:
+        length += 10
+    if srcaddr_mode != 0 and not panidcomp:
+        length += 2
+    if srcaddr_mode == 2:
+        length += 2
+    elif srcaddr_mode == 3:
+        length += 8
+    if offset + length > end:
+        return None
+
+    # Destination Addressing fields (0/4/10 bytes)
+    if dstaddr_mode == 2:
+        config.entry["mac_dstpanid"] = raw_shortaddr(raw, offset)
+        config.entry["mac_dstshortaddr"] = raw_shortaddr(raw, offset+2)
+        offset += 4
+    elif dstaddr_mode == 3:
+        config.entry["mac_dstpanid"] = raw_shortaddr(raw, offset)
+        config.entry["mac_dstextendedaddr"] = raw_extendedaddr(raw, offset+2)
+        offset += 10
+
+    # Source Addressing fields (0/2/4/8/10 bytes)
+    if srcaddr_mode != 0 and not panidcomp:
+        config.entry["mac_srcpanid"] = raw_shortaddr(raw, offset)
+        offset += 2
+    if srcaddr_mode == 2:
+        config.entry["mac_srcshortaddr"] = raw_shortaddr(raw, offset)
+        offset += 2
+    elif srcaddr_mode == 3:
+        config.entry["mac_srcextendedaddr"] = raw_extendedaddr(raw, offset)
+        offset += 8
+
+    return offset
+
+
+def raw_mac_command(raw, offset, end, fcf, msg_queue):
+    # Scapy always expects a destination PAN ID in MAC Commands
+    if (fcf[1] >> 2) & 3 == 0:
+        return False
+
+    # Addressing fields (variable)
+    offset = raw_mac_addressing(raw, offset, end, fcf)
+    if offset is None or offset >= end:
+        return False
+
+    # Command Frame Identifier field (1 byte)
+    cmd_id = raw[offset]
+    if cmd_id == 1 and offset + 2 <= end:
+        # Capability Information field (1 byte)
+        decode_bits(raw[offset+1], MAC_ASSOCREQ_SPEC)
+    elif cmd_id == 2 and offset + 4 <= end:
+        # Short Address field (2 bytes)
+        config.entry["mac_assocrsp_shortaddr"] = raw_shortaddr(raw, offset+1)
+
+        # Association Status field (1 byte)
+        decode_bits(raw[offset+3], MAC_ASSOCRSP_SPEC)
+    elif cmd_id == 3 and offset + 2 <= end:
+        # Disassociation Reason field (1 byte)
+        decode_bits(raw[offset+1], MAC_DISASSOC_SPEC)
+    elif cmd_id not in {4, 5, 6, 7}:
+        # Leave the remaining MAC Commands to Scapy
+        return False
+    decode_bits(cmd_id, MAC_COMMAND_SPEC)
+
+    # MAC Command Payload Length
+    config.entry["mac_cmd_payloadlength"] = end - offset - 1
+
+    return True
+
+
+def raw_nwk_beacon(raw, offset):
+    # Beacon Payload field (15 bytes)
+    config.entry["nwk_beacon_protocolid"] = raw[offset]
+    config.entry["nwk_beacon_stackprofile"] = raw[offset+1] & 0x0f
+    config.entry["nwk_beacon_devdepth"] = (raw[offset+2] >> 3) & 0x0f
+    decode_bits(raw[offset+1] | (raw[offset+2] << 8), NWK_BEACON_SPEC)
+    config.entry["nwk_beacon_epid"] = raw_extendedaddr(raw, offset+3)
+    config.entry["nwk_beacon_txoffset"] = int.from_bytes(
+        raw[offset+11:offset+14], "big")
+    config.entry["nwk_beacon_updateid"] = raw[offset+14]
+
+
+def raw_mac_beacon(raw, offset, end, fcf, msg_queue):
+    # Leave any malformed MAC Beacons to Scapy
+    if (fcf[0] >> 6) & 1 or (fcf[1] >> 2) & 3 != 0 or fcf[1] >> 6 == 0:
+        return False
+
+    # Addressing fields (4/10 bytes)
+    offset = raw_mac_addressing(raw, offset, end, fcf)
+    if offset is None or offset + 4 > end:
+        return False
+    superframe = raw[offset:offset+2]
+    gts_spec = raw[offset+2]
+    pa_spec = raw[offset+3]
+    num_short = pa_spec & 0x07
+    num_long = (pa_spec >> 4) & 0x07
+    payload_offset = offset + 4 + 2*num_short + 8*num_long
+    if gts_spec & 0x07 or payload_offset + 15 > end:
+        return False
+
+    # Superframe Specification field (2 bytes)
+    config.entry["mac_beacon_beaconorder"] = superframe[0] & 0x0f
+    config.entry["mac_beacon_sforder"] = superframe[0] >> 4
+    config.entry["mac_beacon_finalcap"] = superframe[1] & 0x0f
+    config.entry["mac_beacon_ble"] = (superframe[1] >> 4) & 1
+    decode_bits(superframe[0] | (superframe[1] << 8), MAC_BEACON_SPEC)
+
+    # GTS Specification field (1 byte)
+    config.entry["mac_beacon_gtsnum"] = 0
+    config.entry["mac_beacon_gtspermit"] = gts_spec >> 7
+
+    # Pending Address Specification field (1 byte)
+    config.entry["mac_beacon_nsap"] = num_short
+    config.entry["mac_beacon_neap"] = num_long
+
+    # Address List field (variable)
+    offset += 4
+    config.entry["mac_beacon_shortaddresses"] = ",".join(
+        raw_shortaddr(raw, offset + 2*i) for i in range(num_short))
+    offset += 2*num_short
+    config.entry["mac_beacon_extendedaddresses"] = ",".join(
+        raw_extendedaddr(raw, offset + 8*i) for i in range(num_long))
+
+    # Beacon Payload field (variable)
+    raw_nwk_beacon(raw, payload_offset)
+    return True
+
+
+def raw_zdp_fields(raw, offset, end):
+    # Transaction Sequence Number field (1 byte)
+    config.entry["zdp_seqnum"] = raw[offset]
+
+    return True
+
+
+def raw_zcl_fields(raw, offset, end):
+    framecontrol = raw[offset]
+    frametype = framecontrol & 3
+    manufspecific = (framecontrol >> 2) & 1
+    if frametype > 1 or offset + 3 + 2*manufspecific > end:
+        return False
+
+    # Frame Control field (1 byte)
+    decode_bits(framecontrol, ZCL_FCF_SPEC)
+
+    # Manufacturer Code field (0/2 bytes)
+    if manufspecific:
+        config.entry["zcl_manufcode"] = raw_shortaddr(raw, offset+1)
+        offset += 2
+
+    # Transaction Sequence Number field (1 byte)
+    config.entry["zcl_seqnum"] = raw[offset+1]
+
+    # Command Identifier field (1 byte)
+    if frametype == 0:
+        decode_bits(raw[offset+2], ZCL_GLOBALCOMMAND_SPEC)
+    else:
+        config.entry["zcl_cmd_id"] = get_zcl_clusterspecificcommand(
+            raw[offset+2])
+
+    return True
+
+
+def raw_aps_auxiliary(raw, header_offset, offset, end, msg_queue):
+    if offset + 5 > end:
+        return False
+    sec_control = raw[offset]
+    extnonce = (sec_control >> 5) & 1
+    keytype = (sec_control >> 3) & 3
+    data_offset = offset + 5 + 8*extnonce + (keytype == 1)
+    if data_offset > end:
+        return False
+
+    # Security Control field (1 byte)
+    decode_bits(sec_control, APS_AUX_SPEC)
+
+    # Frame Counter field (4 bytes)
+    config.entry["aps_aux_framecounter"] = struct.unpack_from(
+        "<I", raw, offset+1)[0]
+
+    # Source Address field (0/8 bytes)
+    if extnonce:
+        config.entry["aps_aux_srcaddr"] = raw_extendedaddr(raw, offset+5)
+
+    # Key Sequence Number field (0/1 byte)
+    if keytype == 1:
+        config.entry["aps_aux_keyseqnum"] = raw[data_offset-1]
+
+    # Attempt to decrypt the payload
+    data = bytes(raw[data_offset:end])
+    aps_decryption(bytes(raw[header_offset:offset]), sec_control,
+                   data[:-4], data[-4:], msg_queue)
+    return True
+
+
+def raw_aps_fields(raw, offset, end, msg_queue):
+    if offset + 2 > end:
+        return False
+    framecontrol = raw[offset]
+    frametype = framecontrol & 3
+    delmode = (framecontrol >> 2) & 3
+    ackformat = (framecontrol >> 4) & 1
+    security = (framecontrol >> 5) & 1
+    exthdr = framecontrol >> 7
+
+    # Determine the length of the APS Header fields
+    if frametype == 0:
+        if delmode == 1:
+            return False
+        length = 8 if delmode == 3 else 7
+    elif frametype == 1:
+        length = 1
+    elif frametype == 2:
+        length = 1 if ackformat else 7
+    else:
+        return False
+    if frametype != 1 and exthdr:
+        length += 1
+    header_end = offset + 1 + length
+    if header_end > end:
+        return False
+    if frametype != 1 and exthdr and raw[header_end-1] != 0:
+        # Leave fragmented APS frames to Scapy
+        return False
+
+    # Frame Control field (1 byte)
+    decode_bits(framecontrol, APS_FCF_SPEC)
+
+    index = offset + 1
+    if frametype == 0 or (frametype == 2 and not ackformat):
+        if delmode == 3 and frametype == 0:
+            # Group Address field (2 bytes)
+            config.entry["aps_groupaddr"] = raw_shortaddr(raw, index)
+            index += 2
+        else:
+            # Destination Endpoint field (1 byte)
+            config.entry["aps_dstendpoint"] = raw[index]
+            index += 1
+
+        # Cluster Identifier field (2 bytes)
+        cluster_id, profile_id = struct.unpack_from("<HH", raw, index)
+        config.entry["aps_clusterid"] = "0x{:04x}".format(cluster_id)
+        config.entry["aps_clustername"] = lookup_aps_clustername(
+            profile_id, cluster_id)
+
+        # Profile Identifier field (2 bytes)
+        config.entry["aps_profileid"] = "0x{:04x}".format(profile_id)
+        config.entry["aps_profilename"] = lookup_aps_profilename(profile_id)
+
+        # Source Endpoint field (1 byte)
+        config.entry["aps_srcendpoint"] = raw[index+4]
+        index += 5
+
+    # APS Counter field (1 byte)
+    config.entry["aps_counter"] = raw[index]
+
+    # Extended Header field (0/1 byte)
+    if frametype != 1 and exthdr:
+        decode_bits(raw[header_end-1], APS_EXTHDR_SPEC)
+
+    if security:
+        # APS Auxiliary Header field (5/6/13/14 bytes)
+        return raw_aps_auxiliary(raw, offset, header_end, end, msg_queue)
+    elif frametype == 2:
+        # APS Acknowledgments do not contain any other fields
+        return True
+
+    payload = bytes(raw[header_end:end])
+    if len(payload) == 0:
+        return False
+    elif frametype == 1:
+        # APS Command fields (variable)
+        try:
+            cmd_pkt = ZigbeeAppCommandPayload(payload)
+        except Exception:
+            return False
+        aps_command_payload(cmd_pkt, msg_queue)
+    elif config.entry["aps_profilename"] == "Zigbee Device Profile (ZDP)":
+        # ZDP fields (variable)
+        return raw_zdp_fields(raw, header_end, end)
+    elif config.entry["aps_profilename"].split()[0] != "Unknown":
+        # ZCL fields (variable)
+        return raw_zcl_fields(raw, header_end, end)
+    else:
+        config.entry["error_msg"] = (
+            "Unknown APS profile with ID {}"
+            "".format(config.entry["aps_profileid"])
+        )
+    return True
+
+
+def raw_nwk_auxiliary(raw, header_offset, offset, end, msg_queue):
+    if offset + 5 > end:
+        return False
+    sec_control = raw[offset]
+    extnonce = (sec_control >> 5) & 1
+    keytype = (sec_control >> 3) & 3
+    data_offset = offset + 5 + 8*extnonce + (keytype == 1)
+    if data_offset > end:
+        return False
+
+    # Security Control field (1 byte)
+    decode_bits(sec_control, NWK_AUX_SPEC)
+
+    # Frame Counter field (4 bytes)
+    config.entry["nwk_aux_framecounter"] = struct.unpack_from(
+        "<I", raw, offset+1)[0]
+
+    # Source Address field (0/8 bytes)
+    if extnonce:
+        config.entry["nwk_aux_srcaddr"] = raw_extendedaddr(raw, offset+5)
+
+    # Key Sequence Number field (0/1 byte)
+    if keytype == 1:
+        config.entry["nwk_aux_keyseqnum"] = raw[data_offset-1]
+
+    # Attempt to decrypt the payload
+    data = bytes(raw[data_offset:end])
+    nwk_decryption(bytes(raw[header_offset:offset]), sec_control,
+                   data[:-4], data[-4:], msg_queue)
+    return True
+
+
+def raw_nwk_fields(raw, offset, end, msg_queue):
+    if offset + 8 > end:
+        return False
+    frametype = raw[offset] & 3
+    flags = raw[offset+1]
+
+    # Leave NWK Inter-PAN frames and multicast frames to Scapy
+    if frametype > 1 or flags & 0x01:
+        return False
+
+    # Determine the length of the NWK Header fields
+    header_end = offset + 8
+    if flags & 0x08:
+        header_end += 8
+    if flags & 0x10:
+        header_end += 8
+    if flags & 0x04:
+        if header_end + 2 > end:
+            return False
+        relay_count = raw[header_end]
+        header_end += 2 + 2*relay_count
+    if header_end > end:
+        return False
+
+    # Frame Control field (2 bytes)
+    decode_bits(raw[offset] | (flags << 8), NWK_FCF_SPEC)
+
+    # Destination Short Address field (2 bytes)
+    config.entry["nwk_dstshortaddr"] = raw_shortaddr(raw, offset+2)
+
+    # Source Short Address field (2 bytes)
+    config.entry["nwk_srcshortaddr"] = raw_shortaddr(raw, offset+4)
+
+    # Radius field (1 byte)
+    config.entry["nwk_radius"] = raw[offset+6]
+
+    # Sequence Number field (1 byte)
+    config.entry["nwk_seqnum"] = raw[offset+7]
+
+    # Destination Extended Address field (0/8 bytes)
+    index = offset + 8
+    if flags & 0x08:
+        config.entry["nwk_dstextendedaddr"] = raw_extendedaddr(raw, index)
+        index += 8
+
+    # Source Extended Address field (0/8 bytes)
+    if flags & 0x10:
+        config.entry["nwk_srcextendedaddr"] = raw_extendedaddr(raw, index)
+        index += 8
+
+    # Source Route Subframe field (variable)
+    if flags & 0x04:
+        config.entry["nwk_srcroute_relaycount"] = raw[index]
+        config.entry["nwk_srcroute_relayindex"] = raw[index+1]
+        config.entry["nwk_srcroute_relaylist"] = ",".join(
+            raw_shortaddr(raw, index + 2 + 2*i)
+            for i in range(raw[index]))
+
+    if flags & 0x02:
+        # NWK Auxiliary Header field (6/14 bytes)
+        return raw_nwk_auxiliary(raw, offset, header_end, end, msg_queue)
+
+    # NWK Payload field (variable)
+    if header_end >= end:
+        return False
+    elif frametype == 1:
+        try:
+            cmd_pkt = ZigbeeNWKCommandPayload(bytes(raw[header_end:end]))
+        except Exception:
+            return False
+        nwk_command(cmd_pkt, msg_queue)
+        return True
+    else:
+        return raw_aps_fields(raw, header_end, end, msg_queue)
+
+
+def raw_mac_data(raw, offset, end, fcf, msg_queue):
+    # Scapy always expects a destination PAN ID in MAC Data frames
+    if (fcf[1] >> 2) & 3 == 0:
+        return False
+
+    # Addressing fields (variable)
+    offset = raw_mac_addressing(raw, offset, end, fcf)
+    if offset is None:
+        return False
+
+    # Data Payload field (variable)
+    return raw_nwk_fields(raw, offset, end, msg_queue)
+
+
+def raw_fields(raw, msg_queue):
+    """Parse IEEE 802.15.4 and Zigbee fields directly from raw bytes.
+
+    Returns False if the packet should be dissected with Scapy instead,
+    in which case no messages were sent and only the data entries of
+    the packet need to be reset.
+    """
+    if (len(raw) != 5 and len(raw) < 9) or len(raw) > 127:
+        return False
+
+    fcs = raw[-2] | (raw[-1] << 8)
+    if fcs != compute_fcs(raw[:-2]):
+        return False
+
+    # Leave MAC-layer security and unsupported frame formats to Scapy
+    fcf = raw[0:2]
+    frametype = fcf[0] & 0x07
+    if (fcf[0] & 0x08 or frametype > 3 or (fcf[1] >> 4) & 3 > 1
+            or (fcf[1] >> 2) & 3 == 1 or fcf[1] >> 6 == 1
+            or (frametype == 2) != (len(raw) == 5)
+            or (frametype == 2 and fcf[1] & 0xcc)):
+        return False
+
+    # Frame Length field (7 bits)
+    config.entry["phy_length"] = len(raw)
+
+    # Frame Check Sequence field (2 bytes)
+    config.entry["mac_fcs"] = "0x{:04x}".format(fcs)
+
+    # Frame Control field (2 bytes)
+    decode_bits(fcf[0] | (fcf[1] << 8), MAC_FCF_SPEC)
+
+    # Sequence Number field (1 byte)
+    config.entry["mac_seqnum"] = raw[2]
+
+    # MAC Payload field (variable)
+    end = len(raw) - 2
+    if frametype == 0:
+        return raw_mac_beacon(raw, 3, end, fcf, msg_queue)
+    elif frametype == 1:
+        return raw_mac_data(raw, 3, end, fcf, msg_queue)
+    elif frametype == 2:
+        # MAC Acknowledgments do not contain any other fields
+        return True
+    else:
+        return raw_mac_command(raw, 3, end, fcf, msg_queue)
@@ -0,0 +1,154 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import queue
+
+from scapy.all import conf
+
+from .. import config
+from .pcap_file import parse_pkt
+
+
+# Parsing warnings of packets that could not be decrypted, along with the
+# column of the short address that identifies the source of their payload,
+# which is mapped to its extended address in the PAN of the packet
+DECRYPTION_WARNINGS = {
+    "Unable to decrypt the NWK payload": "mac_srcshortaddr",
+    "Unable to decrypt the APS payload": "nwk_srcshortaddr",
+}
+
+# Columns that are required to parse a packet again
+STORED_COLUMNS = [
+    "pcap_directory",
+    "pcap_filename",
+    "pkt_num",
+    "pkt_time",
+    "pkt_bytes",
+    "pkt_linktype",
+    "pkt_show",
+]
+
+
+def fetch_undecrypted_pkts(dirfiles=None, mappings=None):
+    # Unless some pcap files are provided, all the undecrypted packets are
+    # fetched, otherwise only those of the provided pcap files and those
+    # whose source short address was mapped differently
+    undecrypted_pkts = []
+    for warning_msg, shortaddr_column in DECRYPTION_WARNINGS.items():
+        conditions = [("warning_msg", warning_msg)]
+        if dirfiles is None:
+            undecrypted_pkts.extend(
+                (stored_values, warning_msg)
+                for stored_values in config.db.fetch_values(
+                    STORED_COLUMNS, conditions, False))
+            continue
+        for pcap_directory, pcap_filename, pkt_num, shortaddr, panid in (
+                config.db.fetch_values(STORED_COLUMNS[:3]
+                                       + [shortaddr_column, "mac_dstpanid"],
+                                       conditions, False)):
+            if ((pcap_directory, pcap_filename) not in dirfiles
+                    and (shortaddr, panid) not in mappings):
+                continue
+            undecrypted_pkts.extend(
+                (stored_values, warning_msg)
+                for stored_values in config.db.fetch_values(
+                    STORED_COLUMNS,
+                    conditions + [("pcap_directory", pcap_directory),
+                                  ("pcap_filename", pcap_filename),
+                                  ("pkt_num", pkt_num)],
+                    False))
+    undecrypted_pkts.sort(key=lambda x: x[0][:3])
+    return undecrypted_pkts
+
+
+def log_msgs(msg_queue):
+    while not msg_queue.empty():
+        msg_type, msg_obj = msg_queue.get()
+        if msg_type is config.DEBUG_MSG:
+            logging.debug(msg_obj)
+        elif msg_type is config.INFO_MSG:
+            logging.info(msg_obj)
+        elif msg_type is config.WARNING_MSG:
+            logging.warning(msg_obj)
+        elif msg_type is config.ERROR_MSG:
+            logging.error(msg_obj)
+        elif msg_type is config.CRITICAL_MSG:
+            logging.critical(msg_obj)
+        else:
+            raise ValueError("Unexpected message type \"{}\""
+                             "".format(msg_type))
+
+
+def redecrypt_pkts(dirfiles=None, mappings=None):
+    """Retry the decryption of packets that could not be decrypted.
+
+    The stored raw bytes of these packets are parsed again with the
+    final keys and addresses, and their rows are updated in place.
+    If the directories and filenames of some pcap files are provided,
+    only their packets and the packets whose source short address is
+    in the provided mappings are retried. Another pass is made over all
+    the remaining packets whenever previously unknown keys are sniffed
+    from the decrypted payloads.
+    """
+    msg_queue = queue.Queue()
+    undecrypted_pkts = fetch_undecrypted_pkts(dirfiles, mappings)
+    if len(undecrypted_pkts) == 0:
+        return
+    num_decrypted_pkts = 0
+    while len(undecrypted_pkts) > 0:
+        logging.info("Retrying the decryption of {} packets"
+                     "".format(len(undecrypted_pkts)))
+        init_network_keys = config.network_keys.copy()
+        init_link_keys = config.link_keys.copy()
+        pkt_rows = []
+        remaining_pkts = []
+        for stored_values, warning_msg in undecrypted_pkts:
+            # Parse the packet again, starting from its stored raw bytes
+            config.reset_entries()
+            for column_name, value in zip(STORED_COLUMNS, stored_values):
+                config.entry[column_name] = value
+            linktype = config.entry["pkt_linktype"]
+            if linktype is None or config.entry["pkt_bytes"] is None:
+                continue
+            pkt_class = conf.l2types.get(linktype, conf.raw_layer)
+            parse_pkt(linktype, pkt_class, config.entry["pkt_bytes"], None,
+                      msg_queue)
+            log_msgs(msg_queue)
+
+            # Update only the packets whose decryption progressed
+            if config.entry["warning_msg"] in DECRYPTION_WARNINGS:
+                remaining_pkts.append(
+                    (stored_values, config.entry["warning_msg"]))
+            else:
+                num_decrypted_pkts += 1
+            if config.entry["warning_msg"] != warning_msg:
+                pkt_rows.append(config.entry_row())
+        config.db.update_pkts(pkt_rows)
+        config.reset_entries()
+
+        # Make another pass only if previously unknown keys were sniffed
+        if (config.network_keys == init_network_keys
+                and config.link_keys == init_link_keys):
+            break
+        elif dirfiles is None:
+            undecrypted_pkts = remaining_pkts
+        else:
+            undecrypted_pkts = fetch_undecrypted_pkts()
+            dirfiles = None
+
+    logging.info("Decrypted {} packets that could not be decrypted "
+                 "while parsing the pcap files".format(num_decrypted_pkts))
@@ -0,0 +1,145 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import marshal
+import multiprocessing as mp
+
+from .. import config
+
+
+# Number of slots in the ring buffer of each worker
+PKT_SLOTS = 8
+
+# Size of each slot of a ring buffer in bytes
+PKT_SLOT_SIZE = 1048576
+
+# Maximum number of packets in a batch
+PKT_BATCH_SIZE = 128
+
+# The state of the ring buffer or the shard database that the current
+# worker writes to
+shard_mode = False
+worker_index = None
+worker_view = None
+worker_semaphore = None
+slot_index = 0
+pkt_batch = []
+
+
+def init_ring(num_workers):
+    # Allocate a shared-memory ring buffer and a semaphore, which counts
+    # its free slots, for each worker
+    ring = mp.RawArray("B", num_workers*PKT_SLOTS*PKT_SLOT_SIZE)
+    slot_semaphores = [mp.Semaphore(PKT_SLOTS) for _ in range(num_workers)]
+    return ring, slot_semaphores
+
+
+def attach(ring, slot_semaphores, index):
+    global worker_index
+    global worker_view
+    global worker_semaphore
+    global slot_index
+    global pkt_batch
+
+    # Use the ring buffer of the specified worker for subsequent batches
+    start = index*PKT_SLOTS*PKT_SLOT_SIZE
+    worker_index = index
+    worker_view = memoryview(ring).cast("B")[
+        start:start+PKT_SLOTS*PKT_SLOT_SIZE]
+    worker_semaphore = slot_semaphores[index]
+    slot_index = 0
+    pkt_batch = []
+
+
+def attach_shard(shard_filepath):
+    global shard_mode
+    global pkt_batch
+
+    # Use a shard database of the current worker for subsequent batches
+    config.db.connect(shard_filepath)
+    config.db.create_table("packets")
+    config.db.commit()
+
+    # Shard databases are discarded if the parsing does not complete,
+    # so they do not need to be synchronized with the disk
+    config.db.begin_bulk_load("MEMORY")
+    shard_mode = True
+    pkt_batch = []
+
+
+def put_pkt(pkt_row, msg_queue):
+    """Send the table row of a parsed packet to the main process.
+
+    The table rows are sent in batches through the ring buffer of the
+    worker, or written in batches into the shard database of the worker,
+    if either one was attached.
+    """
+    if worker_view is None and not shard_mode:
+        msg_queue.put((config.PKT_MSG, pkt_row))
+        return
+
+    pkt_batch.append(pkt_row)
+    if len(pkt_batch) >= PKT_BATCH_SIZE:
+        send_batch(msg_queue)
+
+
+def send_batch(msg_queue):
+    global pkt_batch
+
+    if len(pkt_batch) == 0:
+        return
+    elif shard_mode:
+        config.db.insert_pkts(pkt_batch)
+    else:
+        write_batch(pkt_batch, msg_queue)
+    pkt_batch = []
+
+
+def flush_pkts(msg_queue):
+    if shard_mode:
+        send_batch(msg_queue)
+        config.db.commit()
+    elif worker_view is not None:
+        send_batch(msg_queue)
+
+
+def write_batch(pkt_rows, msg_queue):
+    global slot_index
+
+    data = marshal.dumps(pkt_rows)
+    if len(data) > PKT_SLOT_SIZE:
+        if len(pkt_rows) == 1:
+            # Send packets that do not fit in a slot through the queue
+            msg_queue.put((config.PKT_MSG, pkt_rows[0]))
+        else:
+            write_batch(pkt_rows[:len(pkt_rows)//2], msg_queue)
+            write_batch(pkt_rows[len(pkt_rows)//2:], msg_queue)
+        return
+
+    # Wait until the main process has read the next slot
+    worker_semaphore.acquire()
+    offset = slot_index*PKT_SLOT_SIZE
+    worker_view[offset:offset+len(data)] = data
+    msg_queue.put((config.PKTS_MSG, (worker_index, slot_index, len(data))))
+    slot_index = (slot_index + 1) % PKT_SLOTS
+
+
+def read_batch(ring_view, slot_semaphores, index, slot, length):
+    # Unpack a batch of packets and release the slot of the ring buffer
+    offset = (index*PKT_SLOTS + slot)*PKT_SLOT_SIZE
+    pkt_rows = marshal.loads(ring_view[offset:offset+length])
+    slot_semaphores[index].release()
+    return pkt_rows
@@ -0,0 +1,138 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import itertools
+import multiprocessing as mp
+
+from .. import config
+
+
+# The shared log of updates, its length, which serves as a version counter
+# that can be read without acquiring the lock, and the lock of the log
+update_log = None
+log_version = None
+log_lock = None
+
+# Number of updates that the current worker applied from the log and the
+# sizes of its dictionaries when it last published or applied updates,
+# while the entries that changed since then are tracked by the config module
+applied_version = 0
+published_sizes = None
+
+
+def init_store():
+    # The log is kept by a server process, while its version counter is
+    # kept in shared memory so that polling it is cheap
+    manager = mp.Manager()
+    store = (manager.list(), mp.Value("L", 0, lock=False), mp.Lock())
+    return manager, store
+
+
+def dict_sizes():
+    return (len(config.network_keys),
+            len(config.link_keys),
+            len(config.addresses),
+            len(config.devices))
+
+
+def attach(store):
+    global update_log
+    global log_version
+    global log_lock
+    global applied_version
+    global published_sizes
+
+    # The dictionaries of the worker initially match those of the others
+    update_log, log_version, log_lock = store
+    applied_version = 0
+    published_sizes = dict_sizes()
+    clear_changes()
+
+
+def clear_changes():
+    del config.address_changes[:]
+    del config.device_changes[:]
+
+
+def publish():
+    """Publish the keys, addresses, and devices that this worker learned.
+
+    The dictionaries only grow while parsing, so their entries beyond
+    the previously published sizes are the previously unknown ones.
+    The known addresses that became conflicting and the known devices
+    whose types changed are published too, so that the other workers
+    apply the same changes to their dictionaries.
+    """
+    global applied_version
+    global published_sizes
+
+    sizes = dict_sizes()
+    if update_log is None or (sizes == published_sizes
+                              and len(config.address_changes) == 0
+                              and len(config.device_changes) == 0):
+        return
+    updates = []
+    for key_name, key_bytes in itertools.islice(
+            config.network_keys.items(), published_sizes[0], None):
+        updates.append(("network", key_name, key_bytes))
+    for key_name, key_bytes in itertools.islice(
+            config.link_keys.items(), published_sizes[1], None):
+        updates.append(("link", key_name, key_bytes))
+    for (shortaddr, panid), extendedaddr in itertools.islice(
+            config.addresses.items(), published_sizes[2], None):
+        if extendedaddr != "Conflicting Data":
+            updates.append(("address", shortaddr, panid, extendedaddr))
+    for shortaddr, panid, extendedaddr in config.address_changes:
+        updates.append(("address", shortaddr, panid, extendedaddr))
+    for extendedaddr in itertools.chain(
+            itertools.islice(config.devices.keys(), published_sizes[3], None),
+            config.device_changes):
+        updates.append(("device",
+                        extendedaddr,
+                        config.devices[extendedaddr]["macdevtype"],
+                        config.devices[extendedaddr]["nwkdevtype"]))
+    published_sizes = sizes
+    clear_changes()
+
+    # The log is extended before its version counter is increased
+    with log_lock:
+        up_to_date = log_version.value == applied_version
+        update_log.extend(updates)
+        log_version.value += len(updates)
+        if up_to_date:
+            applied_version = log_version.value
+
+
+def poll():
+    """Apply the updates that other workers published to the log."""
+    global applied_version
+    global published_sizes
+
+    if log_version is None or log_version.value == applied_version:
+        return
+    version = log_version.value
+    for update in update_log[applied_version:version]:
+        if update[0] == "network" or update[0] == "link":
+            config.add_sniffed_key(update[2], update[0], update[1])
+        elif update[0] == "address":
+            config.map_addresses(update[1], update[2], update[3])
+        elif update[0] == "device":
+            config.update_devices(update[1], update[2], update[3])
+        else:
+            raise ValueError("Unknown update type \"{}\"".format(update[0]))
+    applied_version = version
+    published_sizes = dict_sizes()
+    clear_changes()
@@ -0,0 +1,133 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+
+from scapy.all import ZigbeeAppCommandPayload
+from scapy.all import ZigbeeAppDataPayload
+from scapy.all import ZigbeeClusterLibrary
+from scapy.all import ZigbeeDeviceProfile
+from scapy.all import ZigbeeNWKCommandPayload
+from scapy.all import conf
+
+from .. import config
+from .pcap_file import dissect_pkt
+
+
+# Columns that are required to regenerate the dissection of a packet
+SHOW_COLUMNS = [
+    "pcap_directory",
+    "pcap_filename",
+    "pkt_num",
+    "pkt_bytes",
+    "pkt_linktype",
+    "pkt_show",
+    "nwk_frametype",
+    "nwk_aux_decpayload",
+    "nwk_aux_decshow",
+    "aps_frametype",
+    "aps_profilename",
+    "aps_aux_decpayload",
+    "aps_aux_decshow",
+]
+
+
+def pkt_show(pkt_linktype, pkt_bytes):
+    pkt_class = conf.l2types.get(pkt_linktype, conf.raw_layer)
+    return dissect_pkt(pkt_class, pkt_bytes).show(dump=True)
+
+
+def nwk_decshow(nwk_frametype, nwk_aux_decpayload):
+    if nwk_frametype == "NWK Command":
+        return ZigbeeNWKCommandPayload(nwk_aux_decpayload).show(dump=True)
+    elif nwk_frametype == "NWK Data":
+        return ZigbeeAppDataPayload(nwk_aux_decpayload).show(dump=True)
+    else:
+        return None
+
+
+def aps_decshow(aps_frametype, aps_profilename, aps_aux_decpayload):
+    if aps_frametype == "APS Data":
+        if aps_profilename == "Zigbee Device Profile (ZDP)":
+            return ZigbeeDeviceProfile(aps_aux_decpayload).show(dump=True)
+        elif aps_profilename.split()[0] != "Unknown":
+            return ZigbeeClusterLibrary(aps_aux_decpayload).show(dump=True)
+        else:
+            return None
+    elif aps_frametype == "APS Command":
+        return ZigbeeAppCommandPayload(aps_aux_decpayload).show(dump=True)
+    else:
+        return None
+
+
+def fetch_shows(conditions):
+    """Return the dissections of the packets that match the conditions.
+
+    Dissections that were not stored in the database are regenerated
+    from the raw bytes and the decrypted payloads of the packets.
+    """
+    shows = []
+    for values in config.db.fetch_values(SHOW_COLUMNS, conditions, False):
+        row = dict(zip(SHOW_COLUMNS, values))
+        if row["pkt_show"] is None and row["pkt_bytes"] is not None:
+            row["pkt_show"] = pkt_show(row["pkt_linktype"], row["pkt_bytes"])
+        if (row["nwk_aux_decshow"] is None
+                and row["nwk_aux_decpayload"] is not None):
+            row["nwk_aux_decshow"] = nwk_decshow(
+                row["nwk_frametype"],
+                row["nwk_aux_decpayload"])
+        if (row["aps_aux_decshow"] is None
+                and row["aps_aux_decpayload"] is not None):
+            row["aps_aux_decshow"] = aps_decshow(
+                row["aps_frametype"],
+                row["aps_profilename"],
+                row["aps_aux_decpayload"])
+        shows.append((os.path.join(row["pcap_directory"],
+                                   row["pcap_filename"]),
+                      row["pkt_num"],
+                      row["pkt_show"],
+                      row["nwk_aux_decshow"],
+                      row["aps_aux_decshow"]))
+    shows.sort(key=lambda x: (x[0], x[1]))
+    return shows
+
+
+def show(db_filepath, pcap_filename, pkt_num):
+    """Print the dissection of the specified packets in a database."""
+    # Sanity check
+    if not os.path.isfile(db_filepath):
+        raise ValueError("The provided database file \"{}\" "
+                         "does not exist".format(db_filepath))
+
+    config.db.connect(db_filepath)
+    shows = fetch_shows([("pcap_filename", pcap_filename),
+                         ("pkt_num", pkt_num)])
+    config.db.disconnect()
+    if len(shows) == 0:
+        logging.warning("There is no packet #{} from a \"{}\" file "
+                        "in the database".format(pkt_num, pcap_filename))
+        return
+
+    for filepath, num, show_str, nwk_show_str, aps_show_str in shows:
+        print("Packet #{} in \"{}\":".format(num, filepath))
+        print(show_str)
+        if nwk_show_str is not None:
+            print("Decrypted NWK payload:")
+            print(nwk_show_str)
+        if aps_show_str is not None:
+            print("Decrypted APS payload:")
+            print(aps_show_str)
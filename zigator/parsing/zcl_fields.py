@@ -17,75 +17,81 @@
 from scapy.all import ZigbeeClusterLibrary
 
 from .. import config
-
-
-def get_zcl_frametype(pkt):
-    zcl_frame_types = {
-        0: "Global Command",
-        1: "Cluster-Specific Command"
-    }
-    frametype_id = pkt[ZigbeeClusterLibrary].zcl_frametype
-    return zcl_frame_types.get(frametype_id, "Unknown ZCL frame type")
-
-
-def get_zcl_manufspecific(pkt):
-    ms_states = {
-        0: "The command is not manufacturer-specific",
-        1: "The command is manufacturer-specific"
-    }
-    ms_state = pkt[ZigbeeClusterLibrary].manufacturer_specific
-    return ms_states.get(ms_state, "Unknown Manufacturer-Specific state")
-
-
-def get_zcl_direction(pkt):
-    direction_states = {
-        0: "From the client to the server",
-        1: "From the server to the client"
-    }
-    dir_state = pkt[ZigbeeClusterLibrary].direction
-    return direction_states.get(dir_state, "Unknown Direction state")
-
-
-def get_zcl_disdefrsp(pkt):
-    disdefrsp_states = {
-        0: "A Default Response will be returned",
-        1: "A Default Response will be returned only if there is an error"
-    }
-    ddr_state = pkt[ZigbeeClusterLibrary].disable_default_response
-    return disdefrsp_states.get(ddr_state, "Unknown Default Response state")
-
-
-def get_zcl_globalcommand(pkt):
-    zcl_globalcommands = {
-        0x00: "Read Attributes",
-        0x01: "Read Attributes Response",
-        0x02: "Write Attributes",
-        0x03: "Write Attributes Undivided",
-        0x04: "Write Attributes Response",
-        0x05: "Write Attributes No Response",
-        0x06: "Configure Reporting",
-        0x07: "Configure Reporting Response",
-        0x08: "Read Reporting Configuration",
-        0x09: "Read Reporting Configuration Response",
-        0x0a: "Report Attributes",
-        0x0b: "Default Response",
-        0x0c: "Discover Attributes",
-        0x0d: "Discover Attributes Response",
-        0x0e: "Read Attributes Structured",
-        0x0f: "Write Attributes Structured",
-        0x10: "Write Attributes Structured Response",
-        0x11: "Discover Commands Received",
-        0x12: "Discover Commands Received Response",
-        0x13: "Discover Commands Generated",
-        0x14: "Discover Commands Generated Response",
-        0x15: "Discover Commands Extended",
-        0x16: "Discover Commands Extended Response"
-    }
-    zcl_cmd_id = pkt[ZigbeeClusterLibrary].command_identifier
-    return zcl_globalcommands.get(zcl_cmd_id, "Unknown Global command")
-
-
-def get_zcl_clusterspecificcommand(pkt):
+from .layer_spec import compile_spec
+from .layer_spec import decode_layer
+
+
+ZCL_FRAMETYPE_NAMES = {
+    0: "Global Command",
+    1: "Cluster-Specific Command"
+}
+
+
+ZCL_MANUFSPECIFIC_NAMES = {
+    0: "The command is not manufacturer-specific",
+    1: "The command is manufacturer-specific"
+}
+
+
+ZCL_DIRECTION_NAMES = {
+    0: "From the client to the server",
+    1: "From the server to the client"
+}
+
+
+ZCL_DISDEFRSP_NAMES = {
+    0: "A Default Response will be returned",
+    1: "A Default Response will be returned only if there is an error"
+}
+
+
+ZCL_GLOBALCOMMAND_NAMES = {
+    0x00: "Read Attributes",
+    0x01: "Read Attributes Response",
+    0x02: "Write Attributes",
+    0x03: "Write Attributes Undivided",
+    0x04: "Write Attributes Response",
+    0x05: "Write Attributes No Response",
+    0x06: "Configure Reporting",
+    0x07: "Configure Reporting Response",
+    0x08: "Read Reporting Configuration",
+    0x09: "Read Reporting Configuration Response",
+    0x0a: "Report Attributes",
+    0x0b: "Default Response",
+    0x0c: "Discover Attributes",
+    0x0d: "Discover Attributes Response",
+    0x0e: "Read Attributes Structured",
+    0x0f: "Write Attributes Structured",
+    0x10: "Write Attributes Structured Response",
+    0x11: "Discover Commands Received",
+    0x12: "Discover Commands Received Response",
+    0x13: "Discover Commands Generated",
+    0x14: "Discover Commands Generated Response",
+    0x15: "Discover Commands Extended",
+    0x16: "Discover Commands Extended Response"
+}
+
+
+# Enumerated fields of the Frame Control field (1 byte)
+ZCL_FCF_SPEC = compile_spec((
+    ("zcl_frametype", "zcl_frametype", 0, 2,
+     ZCL_FRAMETYPE_NAMES, "Unknown ZCL frame type"),
+    ("zcl_manufspecific", "manufacturer_specific", 2, 1,
+     ZCL_MANUFSPECIFIC_NAMES, "Unknown Manufacturer-Specific state"),
+    ("zcl_direction", "command_direction", 3, 1,
+     ZCL_DIRECTION_NAMES, "Unknown Direction state"),
+    ("zcl_disdefrsp", "disable_default_response", 4, 1,
+     ZCL_DISDEFRSP_NAMES, "Unknown Default Response state"),
+))
+
+# Enumerated fields of the Command Identifier field of Global Commands
+ZCL_GLOBALCOMMAND_SPEC = compile_spec((
+    ("zcl_cmd_id", "command_identifier", 0, 8,
+     ZCL_GLOBALCOMMAND_NAMES, "Unknown Global command"),
+))
+
+
+def get_zcl_clusterspecificcommand(cmd_id):
     # TODO
     return "Unknown Cluster-Specific command"
 
@@ -93,10 +99,7 @@ def get_zcl_clusterspecificcommand(pkt):
 def zcl_fields(pkt):
     """Parse Zigbee Cluster Library fields."""
     # Frame Control field (1 byte)
-    config.entry["zcl_frametype"] = get_zcl_frametype(pkt)
-    config.entry["zcl_manufspecific"] = get_zcl_manufspecific(pkt)
-    config.entry["zcl_direction"] = get_zcl_direction(pkt)
-    config.entry["zcl_disdefrsp"] = get_zcl_disdefrsp(pkt)
+    decode_layer(pkt[ZigbeeClusterLibrary], ZCL_FCF_SPEC)
 
     if (config.entry["zcl_manufspecific"]
             == "The command is manufacturer-specific"):
@@ -115,9 +118,10 @@ def zcl_fields(pkt):
 
     # Command Identifier field (1 byte)
     if config.entry["zcl_frametype"] == "Global Command":
-        config.entry["zcl_cmd_id"] = get_zcl_globalcommand(pkt)
+        decode_layer(pkt[ZigbeeClusterLibrary], ZCL_GLOBALCOMMAND_SPEC)
     elif config.entry["zcl_frametype"] == "Cluster-Specific Command":
-        config.entry["zcl_cmd_id"] = get_zcl_clusterspecificcommand(pkt)
+        config.entry["zcl_cmd_id"] = get_zcl_clusterspecificcommand(
+            pkt[ZigbeeClusterLibrary].command_identifier)
     else:
         config.entry["error_msg"] = "Unknown ZCL frame type"
         return
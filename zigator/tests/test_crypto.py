@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+from zigator import crypto
+
+
+class TestCrypto(unittest.TestCase):
+    def test_batch_dec_ver(self):
+        """Test the batched decryption and verification of payloads."""
+        key = bytes.fromhex("11111111111111111111111111111111")
+        wrong_key = bytes.fromhex("22222222222222222222222222222222")
+        source_addr = 0x1122334455667788
+        wrong_source_addr = 0x8877665544332211
+        dec_payload = bytes.fromhex("0a0b0c0d0e0f101112131415161718191a")
+        for sec_control, key_seqnum in [(0x28, 0), (0x08, 0), (0x30, None)]:
+            enc_payload, mic = crypto.zigbee_enc_mic(
+                key, source_addr, 0x01020304, sec_control,
+                bytes.fromhex("4802000000001e05"), key_seqnum, dec_payload)
+            candidates = [
+                (wrong_source_addr, key),
+                (source_addr, wrong_key),
+                (source_addr, key),
+            ]
+            self.assertEqual(
+                crypto.zigbee_batch_dec_ver(
+                    candidates, 0x01020304, sec_control,
+                    bytes.fromhex("4802000000001e05"), key_seqnum,
+                    enc_payload, mic),
+                (source_addr, key, dec_payload))
+            self.assertIsNone(
+                crypto.zigbee_batch_dec_ver(
+                    candidates[:2], 0x01020304, sec_control,
+                    bytes.fromhex("4802000000001e05"), key_seqnum,
+                    enc_payload, mic))
+
+    def test_ecb_cipher_cache(self):
+        """Test the bounded reuse of AES contexts."""
+        crypto.clear_ecb_ciphers()
+        first_key = bytes(16)
+        first_cipher = crypto.zigbee_ecb_cipher(first_key)
+        for i in range(1, crypto.ECB_CIPHER_LIMIT + 1):
+            crypto.zigbee_ecb_cipher(i.to_bytes(16, "big"))
+            self.assertIs(crypto.zigbee_ecb_cipher(first_key), first_cipher)
+        self.assertEqual(len(crypto.ecb_ciphers), crypto.ECB_CIPHER_LIMIT)
+        self.assertNotIn((1).to_bytes(16, "big"), crypto.ecb_ciphers)
+        crypto.clear_ecb_ciphers()
+        self.assertEqual(len(crypto.ecb_ciphers), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
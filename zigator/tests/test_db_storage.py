@@ -0,0 +1,213 @@
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import zigator
+from zigator import db
+
+
+DIR_PATH = os.path.dirname(os.path.abspath(__file__))
+PCAP_FILENAMES = [
+    "00-wrong-data-link-type.pcap",
+    "01-phy-testing.pcap",
+    "02-mac-testing.pcap",
+]
+
+
+def pkt_row(pkt_num, mac_frametype, mac_dstpanid, error_msg):
+    row = [None] * len(db.PKT_COLUMN_NAMES)
+    values = {
+        "pcap_directory": "/captures",
+        "pcap_filename": "{:02d}.pcap".format(pkt_num % 3),
+        "pkt_num": pkt_num,
+        "pkt_time": float(pkt_num),
+        "pkt_bytes": bytes([pkt_num]),
+        "phy_length": pkt_num % 4,
+        "mac_frametype": mac_frametype,
+        "mac_dstpanid": mac_dstpanid,
+        "error_msg": error_msg,
+    }
+    for column_name, value in values.items():
+        row[db.PKT_COLUMN_NAMES.index(column_name)] = value
+    return tuple(row)
+
+
+class TestDBStorage(unittest.TestCase):
+    def test_converted_storage(self):
+        """Test the conversion and restoration of the packets table."""
+        pkt_rows = [
+            pkt_row(i,
+                    ["MAC Data", "MAC Beacon", "MAC Acknowledgment"][i % 3],
+                    [None, "0x99aa", "0x1234"][i % 3 - (i % 2)],
+                    "PE101: Invalid packet length" if i % 5 == 0 else None)
+            for i in range(1, 40)
+        ]
+        queries = [
+            lambda: db.grouped_count(["mac_frametype"], True),
+            lambda: db.grouped_count(["mac_dstpanid", "mac_frametype"],
+                                     False),
+            lambda: sorted(db.fetch_values(["mac_frametype", "phy_length"],
+                                           [("!mac_dstpanid", "0x1234"),
+                                            ("error_msg", None)],
+                                           True)),
+            lambda: db.fetch_values(["pkt_num"],
+                                    [("mac_frametype", "MAC Command")],
+                                    False),
+            lambda: db.matching_frequency([("mac_frametype", "MAC Data"),
+                                           ("!mac_dstpanid", None)]),
+            lambda: list(db.iterate_values(["pcap_filename", "pkt_num",
+                                            "mac_dstpanid"])),
+        ]
+
+        for encode_columns, partition_layers in [(True, False),
+                                                 (False, True),
+                                                 (True, True)]:
+            with tempfile.TemporaryDirectory() as tmp_dirpath:
+                db_filepath = os.path.join(tmp_dirpath, "storage.db")
+                db.connect(db_filepath)
+                db.create_table("packets")
+                db.insert_pkts(pkt_rows)
+                db.commit()
+                self.assertFalse(db.is_converted())
+                expected_results = [query() for query in queries]
+
+                db.convert_table(encode_columns, partition_layers)
+                db.create_indexes()
+                db.commit()
+                self.assertEqual(db.is_encoded(), encode_columns)
+                self.assertEqual(db.is_partitioned(), partition_layers)
+                self.assertEqual([query() for query in queries],
+                                 expected_results)
+                db.disconnect()
+
+                # The packets view presents the original values
+                connection = sqlite3.connect(db_filepath)
+                cursor = connection.cursor()
+                cursor.execute("SELECT * FROM packets ORDER BY pkt_num")
+                self.assertEqual(cursor.fetchall(), pkt_rows)
+                if encode_columns:
+                    cursor.execute("SELECT code, value "
+                                   "FROM mac_frametype_codes")
+                    self.assertEqual(cursor.fetchall(), [
+                        (1, "MAC Acknowledgment"),
+                        (2, "MAC Beacon"),
+                        (3, "MAC Data"),
+                    ])
+                if partition_layers:
+                    # Only the packets with a MAC layer value are stored
+                    cursor.execute("SELECT COUNT(*) FROM packets_frame")
+                    self.assertEqual(cursor.fetchall(), [(len(pkt_rows),)])
+                    cursor.execute("SELECT COUNT(*) FROM packets_mac")
+                    self.assertEqual(cursor.fetchall(), [(len(pkt_rows),)])
+                    cursor.execute("SELECT COUNT(*) FROM packets_nwk")
+                    self.assertEqual(cursor.fetchall(), [(0,)])
+                connection.close()
+
+                db.connect(db_filepath)
+                self.assertEqual(db.is_encoded(), encode_columns)
+                self.assertEqual(db.is_partitioned(), partition_layers)
+                self.assertEqual([query() for query in queries],
+                                 expected_results)
+                db.restore_table()
+                db.commit()
+                self.assertFalse(db.is_converted())
+                self.assertEqual([query() for query in queries],
+                                 expected_results)
+                self.assertTrue(db.table_exists("packets"))
+                self.assertFalse(db.table_exists("packets_encoded"))
+                self.assertFalse(db.table_exists("packets_frame"))
+                self.assertFalse(db.table_exists("mac_frametype_codes"))
+                db.disconnect()
+
+    def test_incremental_storage(self):
+        """Test the incremental parsing of converted databases."""
+        for storage_options in [["--encode_columns"],
+                                ["--partition_layers"],
+                                ["--encode_columns", "--partition_layers"]]:
+            with tempfile.TemporaryDirectory() as tmp_dirpath:
+                pcap_dirpath = os.path.join(tmp_dirpath, "data")
+                db_filepath = os.path.join(tmp_dirpath, "converted.db")
+                ref_filepath = os.path.join(tmp_dirpath, "reference.db")
+                os.mkdir(pcap_dirpath)
+                for pcap_filename in PCAP_FILENAMES[:2]:
+                    shutil.copy(os.path.join(DIR_PATH, "data", pcap_filename),
+                                pcap_dirpath)
+                with self.assertLogs(level="INFO"):
+                    zigator.main(["zigator", "parse", pcap_dirpath,
+                                  db_filepath] + storage_options)
+
+                # The packets of the new pcap file are appended to the
+                # stored packets without restoring the packets table
+                shutil.copy(os.path.join(DIR_PATH, "data", PCAP_FILENAMES[2]),
+                            pcap_dirpath)
+                with self.assertLogs(level="INFO") as cm:
+                    zigator.main(["zigator", "parse", pcap_dirpath,
+                                  db_filepath, "--incremental"])
+                self.assertFalse(any("Restoring" in line
+                                     for line in cm.output))
+                with self.assertLogs(level="INFO"):
+                    zigator.main(["zigator", "parse", pcap_dirpath,
+                                  ref_filepath])
+
+                connection = sqlite3.connect(db_filepath)
+                cursor = connection.cursor()
+                ref_connection = sqlite3.connect(ref_filepath)
+                ref_cursor = ref_connection.cursor()
+                for select_command in [
+                        "SELECT * FROM packets "
+                        "ORDER BY pcap_filename, pkt_num",
+                        "SELECT * FROM files ORDER BY pcap_filename"]:
+                    cursor.execute(select_command)
+                    ref_cursor.execute(select_command)
+                    self.assertEqual(cursor.fetchall(),
+                                     ref_cursor.fetchall())
+                cursor.execute("SELECT type FROM sqlite_master "
+                               "WHERE name=\"packets\"")
+                self.assertEqual(cursor.fetchall(), [("view",)])
+                if "--encode_columns" in storage_options:
+                    # The codes of the new values follow the existing ones
+                    cursor.execute("SELECT code, value "
+                                   "FROM pcap_filename_codes")
+                    self.assertEqual(cursor.fetchall(),
+                                     list(enumerate(PCAP_FILENAMES, start=1)))
+                ref_connection.close()
+                connection.close()
+
+    def test_failed_bulk_load(self):
+        """Test the restoration of the journal mode after a failure."""
+        with tempfile.TemporaryDirectory() as tmp_dirpath:
+            db_filepath = os.path.join(tmp_dirpath, "bulk.db")
+            with mock.patch.object(db, "update_packets",
+                                   side_effect=RuntimeError):
+                with self.assertLogs(level="INFO"):
+                    with self.assertRaises(RuntimeError):
+                        zigator.main(["zigator", "parse",
+                                      os.path.join(DIR_PATH, "data"),
+                                      db_filepath, "--bulk_load"])
+            db.disconnect()
+
+            connection = sqlite3.connect(db_filepath)
+            cursor = connection.cursor()
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchall(), [("delete",)])
+            connection.close()
+            self.assertFalse(os.path.exists(db_filepath + "-wal"))
@@ -21,9 +21,12 @@ import io
 import os
 import re
 import sqlite3
+import tempfile
 import unittest
 import zigator
 
+from zigator import db
+
 
 DIR_PATH = os.path.dirname(os.path.abspath(__file__))
 
@@ -145,18 +148,81 @@ class TestIntegration(unittest.TestCase):
             cursor.fetchall(), [
                 ("addresses",),
                 ("devices",),
+                ("files",),
                 ("networks",),
                 ("packets",),
-                ("pairs",)
+                ("pairs",),
+                ("sqlite_stat1",)
             ])
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type=\"index\" AND tbl_name=\"packets\" "
+            "ORDER BY name")
+        self.assertEqual(
+            cursor.fetchall(),
+            sorted((index_name,) for index_name, _ in db.PKT_INDEXES))
         self.assertAddressesTable(cursor)
         self.assertDevicesTable(cursor)
         self.assertNetworksTable(cursor)
         self.assertPacketsTable(cursor)
         self.assertPairsTable(cursor)
+        cursor.execute(
+            "SELECT pkt_bytes FROM packets_hex "
+            "WHERE pcap_filename=\"01-phy-testing.pcap\" AND pkt_num=1")
+        self.assertEqual(cursor.fetchall(), [("02008971ac",)])
+        cursor.execute("SELECT pcap_filename FROM files "
+                       "ORDER BY pcap_filename")
+        self.assertEqual(
+            cursor.fetchall(), [
+                ("00-wrong-data-link-type.pcap",),
+                ("01-phy-testing.pcap",),
+                ("02-mac-testing.pcap",),
+            ])
         cursor.close()
         connection.close()
 
+        with self.assertLogs(level="INFO") as cm:
+            zigator.main([
+                "zigator",
+                "parse",
+                "--incremental",
+                pcap_directory,
+                db_filepath,
+            ])
+        self.assertTrue(re.search(
+            r"^INFO:root:Detected 0 new and 0 modified pcap files, "
+            r"while 3 pcap files were not modified$",
+            cm.output[2]) is not None)
+
+        connection = sqlite3.connect(db_filepath)
+        connection.text_factory = str
+        cursor = connection.cursor()
+        self.assertAddressesTable(cursor)
+        self.assertDevicesTable(cursor)
+        self.assertNetworksTable(cursor)
+        self.assertPacketsTable(cursor)
+        self.assertPairsTable(cursor)
+        cursor.close()
+        connection.close()
+
+        tmp_stdout = io.StringIO()
+        with contextlib.redirect_stdout(tmp_stdout):
+            with self.assertLogs(level="INFO") as cm:
+                zigator.main([
+                    "zigator",
+                    "show",
+                    db_filepath,
+                    "02-mac-testing.pcap",
+                    "1",
+                ])
+        captured_output = tmp_stdout.getvalue().rstrip()
+        self.assertEqual(len(cm.output), 1)
+        show_lines = captured_output.split("\n")
+        self.assertTrue(re.search(
+            r"^Packet #1 in \".+02-mac-testing.pcap\":$",
+            show_lines[0]) is not None)
+        self.assertEqual(show_lines[1], "###[ 802.15.4 - FCS ]###")
+
         with self.assertLogs(level="INFO") as cm:
             zigator.main([
                 "zigator",
@@ -214,8 +280,82 @@ class TestIntegration(unittest.TestCase):
             r"^Configuration directory: \".+zigator\"$",
             config_list[3]) is not None)
 
+    def test_integration_old_schema(self):
+        """Test the incremental parsing of outdated databases."""
+        pcap_directory = os.path.join(DIR_PATH, "data")
+        with tempfile.TemporaryDirectory() as tmp_dirpath:
+            db_filepath = os.path.join(tmp_dirpath, "old-schema.db")
+
+            # Databases of older versions stored the packets without their
+            # data link type, with hex-encoded bytes, and without the
+            # fingerprints of their pcap files
+            connection = sqlite3.connect(db_filepath)
+            cursor = connection.cursor()
+            cursor.execute("CREATE TABLE packets({})".format(", ".join(
+                "{} {}".format(column_name,
+                               "TEXT" if column_type == "BLOB"
+                               else column_type)
+                for column_name, column_type in db.PKT_COLUMNS
+                if column_name != "pkt_linktype")))
+            cursor.execute("INSERT INTO packets(pcap_directory, "
+                           "pcap_filename, pkt_num, pkt_bytes) "
+                           "VALUES (?, ?, ?, ?)",
+                           (pcap_directory, "01-phy-testing.pcap", 1,
+                            "0102"))
+            connection.commit()
+            connection.close()
+
+            with self.assertLogs(level="INFO") as cm:
+                zigator.main([
+                    "zigator",
+                    "parse",
+                    "--incremental",
+                    pcap_directory,
+                    db_filepath,
+                ])
+            self.assertTrue(re.search(
+                r"^WARNING:root:The packets of the \".+old-schema.db\" "
+                r"database were stored with a different schema, so all "
+                r"the pcap files will be parsed again$",
+                cm.output[1]) is not None)
+
+            connection = sqlite3.connect(db_filepath)
+            connection.text_factory = str
+            cursor = connection.cursor()
+            self.assertPacketsTable(cursor)
+            cursor.execute("DROP TABLE files")
+            connection.commit()
+            connection.close()
+
+            # The stored packets are not appended again if the pcap files
+            # that they came from cannot be identified
+            with self.assertLogs(level="INFO") as cm:
+                zigator.main([
+                    "zigator",
+                    "parse",
+                    "--incremental",
+                    pcap_directory,
+                    db_filepath,
+                ])
+            self.assertTrue(re.search(
+                r"^WARNING:root:The \".+old-schema.db\" database does not "
+                r"identify the pcap files of its packets, so all the pcap "
+                r"files will be parsed again$",
+                cm.output[1]) is not None)
+
+            connection = sqlite3.connect(db_filepath)
+            connection.text_factory = str
+            cursor = connection.cursor()
+            self.assertAddressesTable(cursor)
+            self.assertDevicesTable(cursor)
+            self.assertNetworksTable(cursor)
+            self.assertPacketsTable(cursor)
+            self.assertPairsTable(cursor)
+            cursor.close()
+            connection.close()
+
     def assertLoggingOutput(self, cm):
-        self.assertEqual(len(cm.output), 24)
+        self.assertEqual(len(cm.output), 28)
 
         self.assertTrue(re.search(
             r"^INFO:root:Started Zigator version "
@@ -232,78 +372,87 @@ class TestIntegration(unittest.TestCase):
         self.assertTrue(any(re.search(
             r"^INFO:root:Reading packets from the "
             r"\".+00-wrong-data-link-type.pcap\" file...$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Parsed 1 packets from the "
             r"\".+00-wrong-data-link-type.pcap\" file$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Parsed 1 out of the 3 pcap files$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Reading packets from the "
             r"\".+01-phy-testing.pcap\" file...$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Parsed 4 packets from the "
             r"\".+01-phy-testing.pcap\" file$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Parsed 2 out of the 3 pcap files$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Reading packets from the "
             r"\".+02-mac-testing.pcap\" file...$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Parsed 10 packets from the "
             r"\".+02-mac-testing.pcap\" file$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
         self.assertTrue(any(re.search(
             r"^INFO:root:Parsed 3 out of the 3 pcap files$",
-            log_msg) is not None for log_msg in cm.output[3:12]))
+            log_msg) is not None for log_msg in cm.output[3:15]))
+        self.assertEqual(sum(re.search(
+            r"^INFO:root:Worker [0-9]+ parsed [0-9]+\.[0-9] packets/s and "
+            r"[0-9]+\.[0-9] bytes/s, with an ETA of [0-9]+\.[0-9] seconds "
+            r"for the remaining [0-9]+ bytes$",
+            log_msg) is not None for log_msg in cm.output[3:15]), 3)
 
         self.assertTrue(re.search(
             r"^INFO:root:All ([1-9]|[1-9][0-9]+) workers "
             r"completed their tasks$",
-            cm.output[12]) is not None)
+            cm.output[15]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Sniffed 0 previously unknown network keys$",
-            cm.output[13]) is not None)
+            cm.output[16]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Sniffed 0 previously unknown link keys$",
-            cm.output[14]) is not None)
+            cm.output[17]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Discovered the EPID of 1 networks$",
-            cm.output[15]) is not None)
+            cm.output[18]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Discovered the extended address of 5 devices$",
-            cm.output[16]) is not None)
+            cm.output[19]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Discovered the short-to-extended "
             r"address mapping of 4 devices$",
-            cm.output[17]) is not None)
+            cm.output[20]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Discovered 1 flows of MAC Data packets$",
-            cm.output[18]) is not None)
+            cm.output[21]) is not None)
+        self.assertTrue(re.search(
+            r"^INFO:root:The decryption key hints had 0 hits and "
+            r"0 misses, with 0 decryption attempts in total$",
+            cm.output[22]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Updating the database...$",
-            cm.output[19]) is not None)
+            cm.output[23]) is not None)
         self.assertTrue(re.search(
             r"^INFO:root:Finished updating the database$",
-            cm.output[20]) is not None)
+            cm.output[24]) is not None)
         self.assertTrue(re.search(
             r"^WARNING:root:Generated 2 \"PE101: "
             r"Invalid packet length\" parsing errors$",
-            cm.output[21]) is not None)
+            cm.output[25]) is not None)
         self.assertTrue(re.search(
             r"^WARNING:root:Generated 1 \"PE102: "
             r"There are no IEEE 802.15.4 MAC fields\" parsing errors$",
-            cm.output[22]) is not None)
+            cm.output[26]) is not None)
         self.assertTrue(re.search(
             r"^WARNING:root:Generated 1 \"PE202: "
             r"Incorrect frame check sequence \(FCS\)\" parsing errors$",
-            cm.output[23]) is not None)
+            cm.output[27]) is not None)
 
     def assertAddressesTable(self, cursor):
         cursor.execute("SELECT * FROM addresses ORDER BY extendedaddr")
@@ -375,6 +524,7 @@ class TestIntegration(unittest.TestCase):
                 "pkt_num",
                 "pkt_time",
                 "pkt_bytes",
+                "pkt_linktype",
                 "pkt_show",
                 "phy_length",
                 "mac_fcs",
@@ -609,13 +759,13 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "00-wrong-data-link-type.pcap"),
                 ("pkt_num", 1),
                 ("pkt_time", 1599995905.0),
-                ("pkt_bytes",
+                ("pkt_bytes", bytes.fromhex(
                     "00000000000000000000000008004500"
                     "003c41cd40004006faec7f0000017f00"
                     "0001d6461389bb32481a00000000a002"
                     "ffd7fe3000000204ffd70402080af3b8"
-                    "15e40000000001030307"),
-                ("pkt_show", None),
+                    "15e40000000001030307")),
+                ("pkt_linktype", 1),
                 ("phy_length", 74),
                 ("error_msg", "PE102: There are no IEEE 802.15.4 MAC fields"),
             ],
@@ -624,8 +774,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "01-phy-testing.pcap"),
                 ("pkt_num", 1),
                 ("pkt_time", 1599996161.0),
-                ("pkt_bytes", "02008971ac"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("02008971ac")),
+                ("pkt_linktype", 195),
                 ("phy_length", 5),
                 ("mac_fcs", "0xac71"),
                 ("mac_frametype", "MAC Acknowledgment"),
@@ -646,8 +796,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "01-phy-testing.pcap"),
                 ("pkt_num", 2),
                 ("pkt_time", 1599996162.0),
-                ("pkt_bytes", "0308cbffffffff076e03"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("0308cbffffffff076e03")),
+                ("pkt_linktype", 195),
                 ("phy_length", 10),
                 ("mac_fcs", "0x036e"),
                 ("mac_frametype", "MAC Command"),
@@ -675,8 +825,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "01-phy-testing.pcap"),
                 ("pkt_num", 3),
                 ("pkt_time", 1599996163.0),
-                ("pkt_bytes", "d5"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("d5")),
+                ("pkt_linktype", 195),
                 ("error_msg", "PE101: Invalid packet length")
             ],
             [
@@ -684,7 +834,7 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "01-phy-testing.pcap"),
                 ("pkt_num", 4),
                 ("pkt_time", 1599996164.0),
-                ("pkt_bytes",
+                ("pkt_bytes", bytes.fromhex(
                     "0102030405060708090a0b0c0d0e0f10"
                     "1112131415161718191a1b1c1d1e1f20"
                     "2122232425262728292a2b2c2d2e2f30"
@@ -692,8 +842,8 @@ class TestIntegration(unittest.TestCase):
                     "4142434445464748494a4b4c4d4e4f50"
                     "5152535455565758595a5b5c5d5e5f60"
                     "6162636465666768696a6b6c6d6e6f70"
-                    "7172737475767778797a7b7c7d7e7f80"),
-                ("pkt_show", None),
+                    "7172737475767778797a7b7c7d7e7f80")),
+                ("pkt_linktype", 195),
                 ("error_msg", "PE101: Invalid packet length")
             ],
             [
@@ -701,8 +851,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 1),
                 ("pkt_time", 1599996417.0),
-                ("pkt_bytes", "1200ea7978"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("1200ea7978")),
+                ("pkt_linktype", 195),
                 ("phy_length", 5),
                 ("mac_fcs", "0x7879"),
                 ("mac_frametype", "MAC Acknowledgment"),
@@ -723,9 +873,10 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 2),
                 ("pkt_time", 1599996418.0),
-                ("pkt_bytes", "23c864aa99d0d0ffff88776655443322"
-                              "11018e2c1c"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex(
+                    "23c864aa99d0d0ffff88776655443322"
+                    "11018e2c1c")),
+                ("pkt_linktype", 195),
                 ("phy_length", 21),
                 ("mac_fcs", "0x1c2c"),
                 ("mac_frametype", "MAC Command"),
@@ -766,9 +917,10 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 3),
                 ("pkt_time", 1599996419.0),
-                ("pkt_bytes", "63cc72aa9988776655443322110dd0ee"
-                              "ffc0cef10f02adde0009e7"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex(
+                    "63cc72aa9988776655443322110dd0ee"
+                    "ffc0cef10f02adde0009e7")),
+                ("pkt_linktype", 195),
                 ("phy_length", 27),
                 ("mac_fcs", "0xe709"),
                 ("mac_frametype", "MAC Command"),
@@ -798,8 +950,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 4),
                 ("pkt_time", 1599996420.0),
-                ("pkt_bytes", "638832ccbb00007afe041598"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("638832ccbb00007afe041598")),
+                ("pkt_linktype", 195),
                 ("phy_length", 12),
                 ("mac_fcs", "0x9815"),
                 ("mac_frametype", "MAC Command"),
@@ -833,9 +985,10 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 5),
                 ("pkt_time", 1599996421.0),
-                ("pkt_bytes", "03c820ffffffffffffeeffc0ced1ba0d"
-                              "d00608a2"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex(
+                    "03c820ffffffffffffeeffc0ced1ba0d"
+                    "d00608a2")),
+                ("pkt_linktype", 195),
                 ("phy_length", 20),
                 ("mac_fcs", "0xa208"),
                 ("mac_frametype", "MAC Command"),
@@ -865,8 +1018,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 6),
                 ("pkt_time", 1599996422.0),
-                ("pkt_bytes", "030800ffffffff073829"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("030800ffffffff073829")),
+                ("pkt_linktype", 195),
                 ("phy_length", 10),
                 ("mac_fcs", "0x2938"),
                 ("mac_frametype", "MAC Command"),
@@ -894,10 +1047,11 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 7),
                 ("pkt_time", 1599996423.0),
-                ("pkt_bytes", "03cc40ffffeeffc0ced1ba0dd0eeddce"
-                              "f10feda7109bb108eeddfa5014a7b02a"
-                              "74"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex(
+                    "03cc40ffffeeffc0ced1ba0dd0eeddce"
+                    "f10feda7109bb108eeddfa5014a7b02a"
+                    "74")),
+                ("pkt_linktype", 195),
                 ("phy_length", 33),
                 ("mac_fcs", "0x742a"),
                 ("mac_frametype", "MAC Command"),
@@ -928,9 +1082,10 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 8),
                 ("pkt_time", 1599996424.0),
-                ("pkt_bytes", "008089aa99addeff0f0000002294feca"
-                              "efbeedfecefaffffff00af74"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex(
+                    "008089aa99addeff0f0000002294feca"
+                    "efbeedfecefaffffff00af74")),
+                ("pkt_linktype", 195),
                 ("phy_length", 28),
                 ("mac_fcs", "0x74af"),
                 ("mac_frametype", "MAC Beacon"),
@@ -983,9 +1138,10 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 9),
                 ("pkt_time", 1599996425.0),
-                ("pkt_bytes", "618844eedd000001f00910000001f001"
-                              "5511223344443322110680e4f3"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex(
+                    "618844eedd000001f00910000001f001"
+                    "5511223344443322110680e4f3")),
+                ("pkt_linktype", 195),
                 ("phy_length", 29),
                 ("mac_fcs", "0xf3e4"),
                 ("mac_frametype", "MAC Data"),
@@ -1053,8 +1209,8 @@ class TestIntegration(unittest.TestCase):
                 ("pcap_filename", "02-mac-testing.pcap"),
                 ("pkt_num", 10),
                 ("pkt_time", 1599996426.0),
-                ("pkt_bytes", "1200ea7979"),
-                ("pkt_show", None),
+                ("pkt_bytes", bytes.fromhex("1200ea7979")),
+                ("pkt_linktype", 195),
                 ("phy_length", 5),
                 ("error_msg", "PE202: Incorrect frame check sequence (FCS)"),
             ],
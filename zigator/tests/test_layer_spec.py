@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import unittest
+
+from scapy.all import Dot15d4FCS
+from scapy.all import ZigbeeClusterLibrary
+
+from zigator import config
+from zigator.parsing.layer_spec import decode_bits
+from zigator.parsing.layer_spec import decode_layer
+from zigator.parsing.mac_fields import MAC_FCF_SPEC
+from zigator.parsing.zcl_fields import ZCL_FCF_SPEC
+
+
+class TestLayerSpec(unittest.TestCase):
+    def test_decoders(self):
+        """Test the decoding of enumerated fields from both parsers."""
+        for raw in [bytes.fromhex("0200015ec4"),
+                    bytes.fromhex("4188d7adde0000000048020000123f"),
+                    bytes.fromhex("03c8c5ffffffff0700b6c9")]:
+            config.reset_entries()
+            decode_layer(Dot15d4FCS(raw), MAC_FCF_SPEC)
+            scapy_entry = config.entry.copy()
+            config.reset_entries()
+            decode_bits(raw[0] | (raw[1] << 8), MAC_FCF_SPEC)
+            self.assertEqual(config.entry, scapy_entry)
+        for framecontrol in range(0, 32, 4):
+            raw = bytes([framecontrol, 0x00, 0x00, 0x00, 0x00, 0x00])
+            config.reset_entries()
+            decode_layer(ZigbeeClusterLibrary(raw), ZCL_FCF_SPEC)
+            scapy_entry = config.entry.copy()
+            config.reset_entries()
+            decode_bits(framecontrol, ZCL_FCF_SPEC)
+            self.assertEqual(config.entry, scapy_entry)
+        config.reset_entries()
+        decode_layer(ZigbeeClusterLibrary(bytes.fromhex("0801000a")),
+                     ZCL_FCF_SPEC)
+        self.assertEqual(config.entry["zcl_frametype"], "Global Command")
+        self.assertEqual(config.entry["zcl_direction"],
+                         "From the server to the client")
+        config.reset_entries()
+
+
+if __name__ == "__main__":
+    unittest.main()
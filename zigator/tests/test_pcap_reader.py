@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import gzip
+import lzma
+import os
+import queue
+import struct
+import tempfile
+import unittest
+
+from zigator.parsing import pcap_reader
+
+
+def pcapng_block(byte_order, block_type, body):
+    body += bytes(-len(body) % 4)
+    total_length = len(body) + 12
+    return (struct.pack(byte_order + "II", block_type, total_length)
+            + body
+            + struct.pack(byte_order + "I", total_length))
+
+
+class TestPcapReader(unittest.TestCase):
+    def test_capture_reader(self):
+        """Test the reading of pcapng files and compressed pcap files."""
+        pkt_a = bytes.fromhex("0200015ec4")
+        pkt_b = bytes.fromhex("ffffffffffff")
+        pcapng_data = b"".join([
+            # Little-endian section with two interfaces
+            pcapng_block("<", 0x0a0d0d0a,
+                         struct.pack("<IHHq", 0x1a2b3c4d, 1, 0, -1)),
+            pcapng_block("<", 1, struct.pack("<HHI", 195, 0, 0)),
+            pcapng_block("<", 1, struct.pack("<HHIHHB3xHH",
+                                             1, 0, 0, 9, 1, 9, 0, 0)),
+            pcapng_block("<", 6, struct.pack("<IIIII", 0, 0, 1500000,
+                                             len(pkt_a), len(pkt_a)) + pkt_a),
+            pcapng_block("<", 6, struct.pack("<IIIII", 1, 0, 2500000000,
+                                             len(pkt_b), len(pkt_b)) + pkt_b),
+            # Big-endian section that redefines the interfaces
+            pcapng_block(">", 0x0a0d0d0a,
+                         struct.pack(">IHHq", 0x1a2b3c4d, 1, 0, -1)),
+            pcapng_block(">", 1, struct.pack(">HHIHHB3xHH",
+                                             195, 0, 0, 9, 1, 0x81, 0, 0)),
+            pcapng_block(">", 6, struct.pack(">IIIII", 0, 0, 7,
+                                             len(pkt_a), len(pkt_a)) + pkt_a),
+            pcapng_block(">", 3, struct.pack(">I", len(pkt_a)) + pkt_a),
+        ])
+        pcap_data = (struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 0, 195)
+                     + struct.pack("<IIII", 3, 250000, len(pkt_a), len(pkt_a))
+                     + pkt_a)
+        with tempfile.TemporaryDirectory() as tmp_dirpath:
+            for filename, data in [
+                    ("a.pcapng", pcapng_data),
+                    ("b.pcapng.gz", gzip.compress(pcapng_data)),
+                    ("c.pcap.xz", lzma.compress(pcap_data))]:
+                filepath = os.path.join(tmp_dirpath, filename)
+                with open(filepath, "wb") as fp:
+                    fp.write(data)
+                self.assertTrue(pcap_reader.is_capture_file(filepath))
+                msg_queue = queue.Queue()
+                records = [
+                    (linktype, pkt_time, bytes(raw))
+                    for linktype, pkt_time, raw
+                    in pcap_reader.capture_reader(filepath, msg_queue)]
+                self.assertTrue(msg_queue.empty())
+                if filename.startswith("c"):
+                    self.assertEqual(records, [(195, 3.25, pkt_a)])
+                else:
+                    self.assertEqual(records, [
+                        (195, 1.5, pkt_a),
+                        (1, 2.5, pkt_b),
+                        (195, 3.5, pkt_a),
+                        (195, 3.5, pkt_a),
+                    ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+import queue
+import unittest
+
+from scapy.all import Dot15d4Beacon
+from scapy.all import Dot15d4Cmd
+from scapy.all import Dot15d4CmdAssocReq
+from scapy.all import Dot15d4Data
+from scapy.all import Dot15d4FCS
+from scapy.all import ZigBeeBeacon
+from scapy.all import ZigbeeAppCommandPayload
+from scapy.all import ZigbeeAppDataPayload
+from scapy.all import ZigbeeClusterLibrary
+from scapy.all import ZigbeeNWK
+from scapy.all import ZigbeeNWKCommandPayload
+
+from zigator import config
+from zigator import crypto
+from zigator.parsing.phy_fields import phy_fields
+from zigator.parsing.raw_fields import compute_fcs
+from zigator.parsing.raw_fields import raw_fields
+
+
+NETWORK_KEY = bytes.fromhex("11223344556677889900aabbccddeeff")
+LINK_KEY = bytes.fromhex("5a6967426565416c6c69616e63653039")
+SOURCE_ADDR = 0x0011223344556677
+
+
+def mac_data(payload, security=False):
+    return bytes(
+        Dot15d4FCS(fcf_frametype=1, fcf_security=security,
+                   fcf_destaddrmode=2, fcf_srcaddrmode=2,
+                   fcf_panidcompress=1, seqnum=7)
+        / Dot15d4Data(dest_panid=0x99aa, dest_addr=0x0000, src_addr=0x1234)
+        / payload)
+
+
+def nwk_header(frametype, flags):
+    return bytes(ZigbeeNWK(frametype=frametype, flags=flags,
+                           proto_version=2, discover_route=1,
+                           destination=0x0000, source=0x1234, radius=30,
+                           seqnum=5, ext_src=SOURCE_ADDR))
+
+
+def secured(header, sec_control, frame_counter, source_addr, key_seqnum,
+            payload, key):
+    # The extended nonce is included only if the security control says so
+    enc_payload, mic = crypto.zigbee_enc_mic(
+        key, source_addr, frame_counter, sec_control, header, key_seqnum,
+        payload)
+    aux_header = bytes([sec_control]) + frame_counter.to_bytes(4, "little")
+    if sec_control & 0x20:
+        aux_header += source_addr.to_bytes(8, "little")
+    if key_seqnum is not None:
+        aux_header += bytes([key_seqnum])
+    return header + aux_header + enc_payload + mic
+
+
+def aps_data(profile, cluster, delivery_mode=0, frametype=0):
+    return bytes(ZigbeeAppDataPayload(
+        aps_frametype=frametype, delivery_mode=delivery_mode,
+        frame_control=0, dst_endpoint=1, group_addr=0x0002,
+        cluster=cluster, profile=profile, src_endpoint=1, counter=3))
+
+
+ZCL_PAYLOAD = bytes(ZigbeeClusterLibrary(zcl_frametype=1,
+                                         transaction_sequence=5,
+                                         command_identifier=1))
+ZCL_APS_PAYLOAD = aps_data(0x0104, 0x0006) + ZCL_PAYLOAD
+LEAVE_PAYLOAD = bytes(ZigbeeNWKCommandPayload(cmd_identifier=4, request=0,
+                                              rejoin=0, remove_children=0))
+TRANSPORTKEY_PAYLOAD = bytes(ZigbeeAppCommandPayload(
+    cmd_identifier=5, key_type=1, key=NETWORK_KEY, key_seqnum=0,
+    dest_addr=SOURCE_ADDR, src_addr=0x8877665544332211))
+
+# Frames that both parsers should dissect in the same way
+PARSED_FRAMES = [
+    ("MAC Acknowledgment", bytes(Dot15d4FCS(fcf_frametype=2, seqnum=9))),
+    ("MAC Beacon", bytes(
+        Dot15d4FCS(fcf_frametype=0, fcf_destaddrmode=0, fcf_srcaddrmode=2,
+                   seqnum=1)
+        / Dot15d4Beacon(src_panid=0x99aa, src_addr=0x0000,
+                        sf_beaconorder=15, sf_sforder=15,
+                        sf_finalcapslot=15, sf_pancoord=1, sf_assocpermit=1)
+        / ZigBeeBeacon(proto_id=0, stack_profile=2, nwkc_protocol_version=2,
+                       router_capacity=1, device_depth=0,
+                       end_device_capacity=1, extended_pan_id=SOURCE_ADDR,
+                       tx_offset=0xffffff, update_id=0))),
+    ("MAC Command", bytes(
+        Dot15d4FCS(fcf_frametype=3, fcf_destaddrmode=2, fcf_srcaddrmode=3,
+                   seqnum=2)
+        / Dot15d4Cmd(dest_panid=0xffff, dest_addr=0x0000,
+                     src_panid=0xffff, src_addr=SOURCE_ADDR, cmd_id=1)
+        / Dot15d4CmdAssocReq(allocate_address=1, receiver_on_when_idle=1,
+                             device_type=1, power_source=1))),
+    ("NWK Command", mac_data(nwk_header(1, 0x10) + LEAVE_PAYLOAD)),
+    ("ZCL", mac_data(nwk_header(0, 0x00) + ZCL_APS_PAYLOAD)),
+    ("ZDP", mac_data(nwk_header(0, 0x00) + aps_data(0x0000, 0x0013)
+                     + bytes.fromhex("07341277665544332211008e"))),
+    ("APS Group", mac_data(nwk_header(0, 0x00)
+                           + aps_data(0x0104, 0x0006, delivery_mode=3)
+                           + ZCL_PAYLOAD)),
+    ("APS Acknowledgment", mac_data(nwk_header(0, 0x00)
+                                    + aps_data(0x0104, 0x0006,
+                                               frametype=2))),
+    ("APS Command Acknowledgment", mac_data(nwk_header(0, 0x00)
+                                            + bytes.fromhex("1203"))),
+    ("APS Command", mac_data(nwk_header(0, 0x00) + secured(
+        bytes.fromhex("2105"), 0x30, 1, 0x8877665544332211, None,
+        TRANSPORTKEY_PAYLOAD, crypto.zigbee_hmac(b"\x00", LINK_KEY)))),
+    ("APS Data", mac_data(nwk_header(0, 0x00) + secured(
+        bytes([ZCL_APS_PAYLOAD[0] | 0x20]) + ZCL_APS_PAYLOAD[1:8], 0x20, 7,
+        SOURCE_ADDR, None, ZCL_APS_PAYLOAD[8:], LINK_KEY))),
+    ("NWK Extended Nonce", mac_data(secured(
+        nwk_header(0, 0x12), 0x28, 1000, SOURCE_ADDR, 0, ZCL_APS_PAYLOAD,
+        NETWORK_KEY))),
+    ("NWK Short Nonce", mac_data(secured(
+        nwk_header(0, 0x02), 0x08, 1001, SOURCE_ADDR, 0, ZCL_APS_PAYLOAD,
+        NETWORK_KEY))),
+    ("Secured NWK Command", mac_data(secured(
+        nwk_header(1, 0x12), 0x28, 1002, SOURCE_ADDR, 0, LEAVE_PAYLOAD,
+        NETWORK_KEY))),
+]
+
+# Frames that the raw parser should leave to Scapy
+SCAPY_FRAMES = [
+    ("Incorrect FCS", mac_data(nwk_header(0, 0x00) + ZCL_APS_PAYLOAD)[:-1]
+     + b"\x00"),
+    ("MAC Security", mac_data(nwk_header(0, 0x00) + ZCL_APS_PAYLOAD,
+                              security=True)),
+    ("NWK Inter-PAN", mac_data(bytes.fromhex("0b00") + ZCL_APS_PAYLOAD)),
+    ("APS Fragment", mac_data(nwk_header(0, 0x00)
+                              + bytes([ZCL_APS_PAYLOAD[0] | 0x80])
+                              + ZCL_APS_PAYLOAD[1:8] + bytes.fromhex("0102")
+                              + ZCL_PAYLOAD)),
+]
+
+
+class TestRawFields(unittest.TestCase):
+    def setUp(self):
+        self.saved_state = copy.deepcopy(
+            (config.network_keys, config.link_keys, config.networks,
+             config.devices, config.addresses, config.address_history,
+             config.pan_addresses, config.pairs))
+        config.network_keys = {"test_network_key": NETWORK_KEY}
+        config.link_keys = {"test_link_key": LINK_KEY}
+        config.invalidate_derived_keys()
+        config.addresses = {("0x1234", "0x99aa"): format(SOURCE_ADDR, "016x")}
+
+    def tearDown(self):
+        (config.network_keys, config.link_keys, config.networks,
+         config.devices, config.addresses, config.address_history,
+         config.pan_addresses, config.pairs) = self.saved_state
+        config.invalidate_derived_keys()
+        config.reset_entries()
+
+    def parse_frame(self, parser, frame):
+        config.reset_entries()
+        config.entry["pcap_directory"] = "/captures"
+        config.entry["pcap_filename"] = "test.pcap"
+        config.entry["pkt_num"] = 1
+        msg_queue = queue.Queue()
+        result = parser(frame, msg_queue)
+        msgs = []
+        while not msg_queue.empty():
+            msgs.append(msg_queue.get())
+        return result, config.entry.copy(), msgs
+
+    def test_parsed_frames(self):
+        """Test that the raw parser agrees with the Scapy parser."""
+        for name, frame in PARSED_FRAMES:
+            with self.subTest(frame=name):
+                self.assertEqual(compute_fcs(frame[:-2]),
+                                 frame[-2] | (frame[-1] << 8))
+                parsed, raw_entry, raw_msgs = self.parse_frame(raw_fields,
+                                                               frame)
+                self.assertTrue(parsed)
+                _, scapy_entry, scapy_msgs = self.parse_frame(
+                    lambda raw, msg_queue: phy_fields(Dot15d4FCS(raw),
+                                                      msg_queue),
+                    frame)
+                self.assertEqual(raw_entry, scapy_entry)
+                self.assertEqual(raw_msgs, scapy_msgs)
+                self.assertIsNone(raw_entry["error_msg"])
+                if name in {"NWK Extended Nonce", "NWK Short Nonce",
+                            "Secured NWK Command"}:
+                    self.assertIsNotNone(raw_entry["nwk_aux_decpayload"])
+                elif name in {"APS Command", "APS Data"}:
+                    self.assertIsNotNone(raw_entry["aps_aux_decpayload"])
+
+    def test_scapy_frames(self):
+        """Test the fall back from the raw parser to the Scapy parser."""
+        for name, frame in SCAPY_FRAMES:
+            with self.subTest(frame=name):
+                parsed, _, raw_msgs = self.parse_frame(raw_fields, frame)
+                self.assertFalse(parsed)
+                self.assertEqual(raw_msgs, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2020 Dimitrios-Georgios Akestoridis
+#
+# This file is part of Zigator.
+#
+# Zigator is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 only,
+# as published by the Free Software Foundation.
+#
+# Zigator is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zigator. If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+import unittest
+
+from zigator import config
+from zigator.parsing import shared_store
+
+
+class TestSharedStore(unittest.TestCase):
+    def setUp(self):
+        self.saved_state = copy.deepcopy(
+            (config.devices, config.addresses, config.address_history,
+             config.pan_addresses))
+
+    def tearDown(self):
+        (config.devices, config.addresses, config.address_history,
+         config.pan_addresses) = self.saved_state
+        shared_store.update_log = None
+        shared_store.log_version = None
+        shared_store.log_lock = None
+
+    def clear_dicts(self):
+        config.devices = {}
+        config.addresses = {}
+        config.address_history = {}
+        config.pan_addresses = {}
+
+    def test_changed_entries(self):
+        """Test the publication of entries that changed in place."""
+        manager, store = shared_store.init_store()
+        try:
+            self.clear_dicts()
+            shared_store.attach(store)
+            config.map_addresses("0x0001", "0x1234", "00000000000000aa")
+            config.update_devices("00000000000000aa", None, None)
+            shared_store.publish()
+            config.map_addresses("0x0001", "0x1234", "00000000000000bb")
+            config.update_devices("00000000000000aa", None, "Zigbee Router")
+            shared_store.publish()
+            self.assertEqual(len(store[0]), 4)
+
+            # Another worker applies both the new and the changed entries
+            self.clear_dicts()
+            shared_store.attach(store)
+            shared_store.poll()
+            self.assertEqual(config.addresses,
+                             {("0x0001", "0x1234"): "Conflicting Data"})
+            self.assertEqual(config.devices, {
+                "00000000000000aa": {
+                    "macdevtype": None,
+                    "nwkdevtype": "Zigbee Router",
+                },
+            })
+            self.assertEqual(config.address_changes, [])
+            self.assertEqual(config.device_changes, [])
+        finally:
+            manager.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()